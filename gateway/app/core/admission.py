@@ -0,0 +1,191 @@
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from app.core.config import settings
+
+# Priority classes, lower is served first
+CRITICAL = 0
+HIGH = 1
+NORMAL = 2
+LOW = 3
+
+PRIORITY_NAMES = {CRITICAL: "critical", HIGH: "high", NORMAL: "normal", LOW: "low"}
+
+
+# ==============================================================
+# Per-route priority
+# ==============================================================
+@dataclass(frozen=True)
+class PriorityRule:
+    prefix: str
+    priority: int
+    methods: Tuple[str, ...] = ()  # empty = any method
+    exact: bool = False  # match the path itself only, not what follows the prefix
+
+    def matches(self, method: str, path: str) -> bool:
+        path_matches = path == self.prefix if self.exact else path.startswith(self.prefix)
+        return path_matches and (not self.methods or method in self.methods)
+
+
+# First matching rule wins; anything else is NORMAL
+PRIORITY_RULES: List[PriorityRule] = [
+    PriorityRule("/gateway/auth/login", CRITICAL),
+    PriorityRule("/gateway/auth/refresh", CRITICAL),
+    PriorityRule("/gateway/auth/", HIGH),
+    PriorityRule("/gateway/users/batch-get", LOW),
+    PriorityRule("/gateway/users/bulk", LOW),
+    PriorityRule("/gateway/users/", LOW, ("GET",), exact=True),  # paginated listing
+]
+
+
+def priority_for(method: str, path: str) -> int:
+    for rule in PRIORITY_RULES:
+        if rule.matches(method, path):
+            return rule.priority
+    return NORMAL
+
+
+class Overloaded(Exception):
+    """No capacity for the request; the caller should answer 503 with Retry-After."""
+
+
+# ==============================================================
+# Adaptive limit
+# ==============================================================
+class AdaptiveLimit:
+    """
+    AIMD concurrency limit driven by upstream latency. A slow call (above
+    ADMISSION_LATENCY_TOLERANCE times the long-term average latency, and
+    above ADMISSION_SLOW_CALL_FLOOR) or a failed call cuts the limit by
+    ADMISSION_BACKOFF_RATIO, at most once per average latency; successful
+    calls made while the limit is actually used grow it by about one per
+    limit's worth of calls.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.value = float(initial)
+        self.avg_latency: Optional[float] = None
+        self._last_decrease = 0.0
+
+    def __int__(self) -> int:
+        return int(self.value)
+
+    def record(self, latency: float, ok: bool, inflight: int) -> None:
+        if self.avg_latency is None:
+            self.avg_latency = latency
+        threshold = max(self.avg_latency * settings.ADMISSION_LATENCY_TOLERANCE, settings.ADMISSION_SLOW_CALL_FLOOR)
+        overloaded = not ok or latency > threshold
+        # Slow samples barely move the baseline, so a latency rise is not mistaken for the new normal
+        weight = 0.01 if overloaded else 0.05
+        self.avg_latency += weight * (latency - self.avg_latency)
+
+        now = time.monotonic()
+        if overloaded:
+            if now - self._last_decrease >= max(self.avg_latency, settings.ADMISSION_SLOW_CALL_FLOOR):
+                self.value = max(self.minimum, self.value * settings.ADMISSION_BACKOFF_RATIO)
+                self._last_decrease = now
+        elif inflight * 2 >= self.value:
+            self.value = min(self.maximum, self.value + 1 / self.value)
+
+
+# ==============================================================
+# Admission
+# ==============================================================
+class AdmissionController:
+    """
+    Caps the requests in flight to one upstream at its adaptive limit.
+    Requests over the limit wait in a short priority queue (at most
+    ADMISSION_QUEUE_SIZE, for ADMISSION_QUEUE_TIMEOUT seconds); when the
+    queue is full a new request only gets in by evicting a waiter of a
+    lower priority. Whatever cannot be served in time is shed with
+    Overloaded instead of queueing without bound.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.limit = AdaptiveLimit(
+            settings.ADMISSION_INITIAL_LIMIT, settings.ADMISSION_MIN_LIMIT, settings.ADMISSION_MAX_LIMIT
+        )
+        self.inflight = 0
+        self.admitted = 0
+        self.shed = {name: 0 for name in PRIORITY_NAMES.values()}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+
+    def _has_capacity(self) -> bool:
+        return self.inflight < int(self.limit)
+
+    def _reject(self, priority: int) -> None:
+        self.shed[PRIORITY_NAMES[priority]] += 1
+        raise Overloaded(f"Upstream '{self.name}' is at capacity")
+
+    async def acquire(self, priority: int) -> None:
+        """Wait for a slot; pair with release(). Raises Overloaded when the request is shed."""
+        if self._has_capacity() and not self._waiters:
+            self.inflight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= settings.ADMISSION_QUEUE_SIZE:
+            worst = max(self._waiters)
+            if worst[0] <= priority:
+                self._reject(priority)
+            self._waiters.remove(worst)
+            heapq.heapify(self._waiters)
+            worst[2].set_exception(Overloaded(f"Upstream '{self.name}' is at capacity"))
+            self.shed[PRIORITY_NAMES[worst[0]]] += 1
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._counter), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), settings.ADMISSION_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            if future.done() and not future.exception():
+                # Admitted just as the deadline passed
+                return
+            self._discard(entry)
+            self._reject(priority)
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and not future.exception():
+                # The slot was already handed over: give it back
+                self.release(None, None)
+            self._discard(entry)
+            raise
+
+    def _discard(self, entry) -> None:
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def release(self, latency: Optional[float], ok: Optional[bool]) -> None:
+        """``latency=None``: no upstream answer was observed (e.g. the call was cancelled)."""
+        self.inflight -= 1
+        if latency is not None:
+            self.limit.record(latency, bool(ok), self.inflight + 1)
+        while self._waiters and self._has_capacity():
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                self.inflight += 1
+                self.admitted += 1
+                future.set_result(None)
+
+    def retry_after(self) -> int:
+        """Seconds a shed client is asked to wait before trying again."""
+        return max(1, round(self.limit.avg_latency or 0))
+
+    def snapshot(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "inflight": self.inflight,
+            "queued": len(self._waiters),
+            "avg_latency_ms": round(self.limit.avg_latency * 1000, 1) if self.limit.avg_latency else None,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+        }
@@ -0,0 +1,129 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import httpx
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.core.registry import service_registry
+
+# Paths reachable without a token (login/registration, probes, docs)
+PUBLIC_PATH_PREFIXES = ("/gateway/auth/", "/health", "/metrics", "/docs", "/redoc", "/openapi.json")
+
+# Identity headers set by the gateway; never trusted when sent by a client
+IDENTITY_HEADERS = (b"x-user-sub", b"x-user-id", b"x-user-email", b"x-token-exp")
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def is_public_path(path: str) -> bool:
+    return path.startswith(PUBLIC_PATH_PREFIXES)
+
+
+class JwksCache:
+    """
+    Public keys published by AuthService, cached for JWKS_CACHE_TTL.
+    An unknown kid (key rotation) triggers a refresh, throttled to one per
+    JWKS_MIN_REFRESH_INTERVAL; if AuthService is unreachable the last known
+    keys keep being used.
+    """
+
+    def __init__(self):
+        self._keys: Dict[str, dict] = {}
+        self._fetched_at = 0.0
+        self._attempted_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self, kid: Optional[str]) -> dict:
+        expired = time.monotonic() - self._fetched_at > settings.JWKS_CACHE_TTL
+        if kid not in self._keys or expired:
+            async with self._lock:
+                now = time.monotonic()
+                expired = now - self._fetched_at > settings.JWKS_CACHE_TTL
+                throttled = now - self._attempted_at < settings.JWKS_MIN_REFRESH_INTERVAL
+                if (kid not in self._keys or expired) and not throttled:
+                    await self._refresh()
+        if kid not in self._keys:
+            raise InvalidToken("Unknown signing key")
+        return self._keys[kid]
+
+    async def _refresh(self) -> None:
+        self._attempted_at = time.monotonic()
+        try:
+            response = await service_registry.pool("auth").request("GET", settings.JWKS_PATH)
+            response.raise_for_status()
+            self._keys = {key["kid"]: key for key in response.json()["keys"] if "kid" in key}
+            self._fetched_at = self._attempted_at
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            print(f"JWKS refresh failed, keeping {len(self._keys)} cached keys: {e}")
+
+
+class TokenVerifier:
+    """
+    Verifies AuthService access tokens locally (signature + exp), without a
+    call to AuthService. HS* tokens are checked with the shared secret,
+    RS*/ES* tokens against the cached JWKS. Decoded claims are cached per
+    worker, keyed by the SHA-256 of the token, until the token expires.
+    """
+
+    def __init__(self, max_entries: int = settings.AUTH_CLAIMS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.jwks = JwksCache()
+        self._claims: "OrderedDict[str, dict]" = OrderedDict()
+
+    async def _decode(self, token: str) -> dict:
+        try:
+            if settings.JWT_ALGORITHM.upper().startswith("HS"):
+                key = settings.JWT_SECRET_KEY
+            else:
+                key = await self.jwks.get(jwt.get_unverified_header(token).get("kid"))
+            claims = jwt.decode(token, key, algorithms=[settings.JWT_ALGORITHM])
+        except JWTError as e:
+            raise InvalidToken(str(e))
+        if "sub" not in claims or "exp" not in claims:
+            raise InvalidToken("Token is missing required claims")
+        if claims.get("type") == "refresh":
+            raise InvalidToken("Refresh tokens cannot be used as access tokens")
+        return claims
+
+    async def verify(self, token: str) -> dict:
+        digest = hashlib.sha256(token.encode()).hexdigest()
+        claims: Optional[dict] = self._claims.get(digest)
+        if claims is not None:
+            if claims["exp"] > time.time():
+                self._claims.move_to_end(digest)
+                return claims
+            del self._claims[digest]
+            raise InvalidToken("Signature has expired.")
+
+        claims = await self._decode(token)
+        self._claims[digest] = claims
+        if len(self._claims) > self.max_entries:
+            self._claims.popitem(last=False)
+        return claims
+
+
+def bearer_token(authorization: Optional[str]) -> Optional[str]:
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token.strip():
+        return None
+    return token.strip()
+
+
+def identity_headers(claims: dict) -> list:
+    headers = [(b"x-user-sub", str(claims["sub"]).encode()), (b"x-token-exp", str(int(claims["exp"])).encode())]
+    if claims.get("uid"):
+        headers.append((b"x-user-id", str(claims["uid"]).encode()))
+    if claims.get("email"):
+        headers.append((b"x-user-email", str(claims["email"]).encode()))
+    return headers
+
+
+token_verifier = TokenVerifier()
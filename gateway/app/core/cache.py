@@ -0,0 +1,363 @@
+import asyncio
+import hashlib
+import json
+import secrets
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.local_cache import LocalCache
+from app.core.redis_client import redis_client
+
+
+# ==============================================================
+# Per-route policy
+# ==============================================================
+@dataclass(frozen=True)
+class CachePolicy:
+    prefix: str
+    ttl: int  # seconds the entry is fresh; 0 disables caching
+    stale_while_revalidate: int = 0  # extra seconds a stale entry may be served while refreshing
+
+
+# First matching prefix wins
+CACHE_POLICIES: List[CachePolicy] = [
+    CachePolicy("/health", ttl=0),
+    CachePolicy("/metrics", ttl=0),
+    CachePolicy("/gateway/auth/", ttl=0),  # credentials and tokens are never cached
+    CachePolicy("/gateway/users/", ttl=30, stale_while_revalidate=30),
+    CachePolicy("/", ttl=settings.CACHE_DEFAULT_TTL, stale_while_revalidate=settings.CACHE_STALE_WHILE_REVALIDATE),
+]
+
+
+def policy_for(path: str) -> Optional[CachePolicy]:
+    for policy in CACHE_POLICIES:
+        if path.startswith(policy.prefix):
+            return policy if policy.ttl > 0 else None
+    return None
+
+
+# ==============================================================
+# Cached entry
+# ==============================================================
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: List[Tuple[str, str]]
+    body: bytes
+    etag: Optional[str] = None
+    stored_at: float = 0.0
+    ttl: int = 0
+    stale_ttl: int = 0
+
+    @property
+    def age(self) -> float:
+        return max(0.0, time.time() - self.stored_at)
+
+    def is_fresh(self) -> bool:
+        return self.age < self.ttl
+
+    def is_usable(self) -> bool:
+        return self.age < self.ttl + self.stale_ttl
+
+    def header(self, name: str) -> Optional[str]:
+        name = name.lower()
+        return next((value for key, value in self.headers if key.lower() == name), None)
+
+    def dumps(self) -> bytes:
+        # Compact JSON metadata line followed by the raw body: no base64/JSON round-trip on the payload
+        meta = {
+            "s": self.status_code,
+            "h": self.headers,
+            "e": self.etag,
+            "t": self.stored_at,
+            "ttl": self.ttl,
+            "swr": self.stale_ttl,
+        }
+        return json.dumps(meta, separators=(",", ":")).encode() + b"\n" + self.body
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "CachedResponse":
+        meta, _, body = raw.partition(b"\n")
+        data = json.loads(meta)
+        return cls(
+            status_code=data["s"],
+            headers=[tuple(h) for h in data["h"]],
+            body=body,
+            etag=data["e"],
+            stored_at=data["t"],
+            ttl=data["ttl"],
+            stale_ttl=data["swr"],
+        )
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    directives: Dict[str, Optional[str]] = {}
+    for part in (value or "").split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip('"') or None
+    return directives
+
+
+def compute_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Weak comparison as required for If-None-Match (RFC 9110 §13.1.2)."""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == bare for tag in if_none_match.split(","))
+
+
+# ==============================================================
+# Keys
+# ==============================================================
+def auth_scope(headers) -> str:
+    """Responses fetched with credentials are only ever shared with the same credentials."""
+    authorization = headers.get("authorization")
+    if not authorization:
+        return "public"
+    return hashlib.sha256(authorization.encode()).hexdigest()[:32]
+
+
+def base_key(path: str, query: str, headers) -> str:
+    return f"cache:{path}?{query}|{auth_scope(headers)}"
+
+
+def variant_key(key: str, vary: List[str], headers) -> str:
+    values = "\n".join(f"{name}:{headers.get(name, '')}" for name in vary)
+    return f"{key}|{hashlib.sha1(values.encode()).hexdigest()[:16]}"
+
+
+def index_key(path: str) -> str:
+    """Keys stored for exactly this path."""
+    return f"cache:idx:{resource_path(path)}"
+
+
+def tree_key(path: str) -> str:
+    """Keys stored for this path and every path below it."""
+    return f"cache:tree:{resource_path(path)}"
+
+
+# ==============================================================
+# Invalidation scope
+# ==============================================================
+def resource_path(path: str) -> str:
+    """/gateway/users/ and /gateway/users name the same collection."""
+    return path.rstrip("/") or "/"
+
+
+def ancestor_paths(path: str) -> List[str]:
+    """The resource, then every collection above it: /a/b/c -> [/a/b/c, /a/b, /a]."""
+    parts = resource_path(path).split("/")
+    return ["/".join(parts[:i]) or "/" for i in range(len(parts), 1, -1)]
+
+
+def affected_by_write(path: str) -> Callable[[str], bool]:
+    """
+    Which cached paths a successful write to ``path`` makes stale: the
+    resource itself, its sub-resources and the collection it belongs to
+    (a PATCH /users/1 changes /users/1/status and the /users/ listing).
+    """
+    paths = ancestor_paths(path)
+    target = paths[0]
+    parent = paths[1] if len(paths) > 1 else None
+    subtree = target.rstrip("/") + "/"
+
+    def affected(other: str) -> bool:
+        other = resource_path(other)
+        return other == target or other == parent or other.startswith(subtree)
+
+    return affected
+
+
+# ==============================================================
+# Two-tier store (in-process LRU + Redis) with single-flight fetches
+# ==============================================================
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class ResponseCache:
+    """
+    Shared HTTP response cache.
+    Fresh entries are first looked up in a per-worker LRU (app.core.local_cache)
+    and only then in Redis. In Redis, a response varying on request headers is
+    stored under a variant key and the list of Vary headers under
+    ``<key>|vary``, so a lookup costs one MGET (two round-trips only for Vary
+    responses). Every key written for a path is tracked in an index of that
+    path and in a tree index of the path and each of its ancestors, so a
+    write can drop the resource, its sub-resources and its collection; the
+    invalidation is then published so every worker also drops its
+    in-process copies.
+    """
+
+    def __init__(self, client=redis_client, local: Optional[LocalCache] = None):
+        self.redis = client
+        self.local = local or LocalCache(settings.CACHE_LOCAL_MAX_BYTES)
+        self._release_lock = client.register_script(_RELEASE_LOCK)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: set = set()
+        self._listener: Optional[asyncio.Task] = None
+
+    async def lookup(self, key: str, headers) -> Optional[CachedResponse]:
+        vary = self.local.get_vary(key)
+        entry = self.local.get(variant_key(key, vary, headers) if vary else key)
+        if entry is not None:
+            return entry
+
+        raw, vary = await self.redis.mget(key, f"{key}|vary")
+        target = key
+        if vary:
+            vary = vary.decode().split(",")
+            target = variant_key(key, vary, headers)
+            raw = await self.redis.get(target)
+        if not raw:
+            return None
+        entry = CachedResponse.loads(raw)
+        if entry.is_fresh():
+            if vary:
+                self.local.set_vary(key, vary)
+            self.local.set(target, entry)
+        return entry
+
+    async def store(self, key: str, path: str, headers, entry: CachedResponse) -> None:
+        expire = max(1, int(entry.ttl + entry.stale_ttl))
+        vary = [name.strip().lower() for name in (entry.header("vary") or "").split(",") if name.strip()]
+        pipe = self.redis.pipeline(transaction=False)
+        if vary:
+            target = variant_key(key, vary, headers)
+            pipe.set(f"{key}|vary", ",".join(vary), ex=expire)
+            written = [f"{key}|vary", target]
+            self.local.set_vary(key, vary)
+        else:
+            target = key
+            written = [key]
+        pipe.set(target, entry.dumps(), ex=expire)
+        # Index sets are sorted by expiry time, so expired keys are pruned on every write
+        now = time.time()
+        members = {name: now + expire for name in written}
+        for index in [index_key(path)] + [tree_key(ancestor) for ancestor in ancestor_paths(path)]:
+            pipe.zadd(index, members)
+            pipe.zremrangebyscore(index, "-inf", now)
+            pipe.expire(index, expire)
+        self.local.set(target, entry)
+        await pipe.execute()
+
+    async def invalidate(self, path: str) -> None:
+        """Drop what a write to ``path`` made stale (see affected_by_write), in Redis and in every worker."""
+        self.local.invalidate(affected_by_write(path))
+        paths = ancestor_paths(path)
+        indexes = [tree_key(paths[0]), index_key(paths[0])] + [index_key(parent) for parent in paths[1:2]]
+        pipe = self.redis.pipeline(transaction=False)
+        for index in indexes:
+            pipe.zrange(index, 0, -1)
+        keys = {key for members in await pipe.execute() for key in members}
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(*indexes, *keys)
+        pipe.publish(settings.CACHE_INVALIDATION_CHANNEL, path)
+        await pipe.execute()
+
+    # ----- Invalidation fan-out -----
+    async def _listen(self) -> None:
+        backoff = 0.5
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.CACHE_INVALIDATION_CHANNEL)
+                # Messages may have been missed while disconnected
+                self.local.clear()
+                backoff = 0.5
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.local.invalidate(affected_by_write(message["data"].decode()))
+            except RedisError:
+                self.local.clear()
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+    def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    async def single_flight(
+        self, key: str, fetch: Callable[[], Awaitable[Optional[CachedResponse]]], headers
+    ) -> Optional[CachedResponse]:
+        """
+        Run ``fetch`` at most once per key: concurrent callers in this worker
+        share the in-flight future, other workers wait on a Redis lock and
+        pick up the entry the leader stored. None (a response too large to
+        be kept) is shared like any other result.
+        """
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        # Mark the exception as retrieved when nobody else was waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            result = await self._fetch_locked(key, fetch, headers)
+            future.set_result(result)
+            return result
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    async def _fetch_locked(self, key: str, fetch, headers) -> Optional[CachedResponse]:
+        lock_key = f"lock:{key}"
+        token = secrets.token_hex(8)
+        if not await self.redis.set(lock_key, token, nx=True, px=int(settings.CACHE_LOCK_TIMEOUT * 1000)):
+            # Another worker is already fetching: wait for its result, but only
+            # while it holds the lock (it releases it without storing anything
+            # when the response is not cacheable)
+            deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+                entry = await self.lookup(key, headers)
+                if entry is not None and entry.is_fresh():
+                    return entry
+                if not await self.redis.exists(lock_key):
+                    break
+            return await fetch()
+        try:
+            return await fetch()
+        finally:
+            await self._release_lock(keys=[lock_key], args=[token])
+
+    def revalidate_in_background(self, key: str, fetch, headers) -> None:
+        if key in self._inflight:
+            return
+        task = asyncio.create_task(self.single_flight(key, fetch, headers))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+response_cache = ResponseCache()
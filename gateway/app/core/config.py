@@ -10,13 +10,97 @@ class Settings(BaseSettings):
     APP_NAME: str = os.getenv("APP_NAME", "GatewayService")
     APP_PORT: int = os.getenv("APP_PORT", 8080)
     AUTH_SERVICE_URL: str = os.getenv("AUTH_SERVICE_URL", "http://authservice:5001")
+    # Comma-separated replica URLs of each upstream pool
+    AUTH_SERVICE_URLS: str = os.getenv("AUTH_SERVICE_URLS", AUTH_SERVICE_URL)
+    USER_SERVICE_URLS: str = os.getenv("USER_SERVICE_URLS", "http://userservice:5002")
     REDIS_HOST: str = os.getenv("REDIS_HOST", "redis")
     REDIS_PORT: int = os.getenv("REDIS_PORT", 6379)
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379")
     REDIS_DB: int = os.getenv("REDIS_DB", 0)
-    RATE_LIMIT: str = os.getenv("RATE_LIMIT", "10/minute")  # 10 req/minute par IP
+    REDIS_POOL_SIZE: int = os.getenv("REDIS_POOL_SIZE", 50)  # shared by cache and rate limiter
+    REDIS_POOL_TIMEOUT: float = os.getenv("REDIS_POOL_TIMEOUT", 1.0)  # wait for a free connection
+    REDIS_SOCKET_TIMEOUT: float = os.getenv("REDIS_SOCKET_TIMEOUT", 0.5)
+    REDIS_HEALTH_CHECK_INTERVAL: int = os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30)  # seconds
+    CACHE_DEFAULT_TTL: int = os.getenv("CACHE_DEFAULT_TTL", 60)  # seconds a GET stays fresh
+    CACHE_STALE_WHILE_REVALIDATE: int = os.getenv("CACHE_STALE_WHILE_REVALIDATE", 30)
+    CACHE_MAX_BODY_BYTES: int = os.getenv("CACHE_MAX_BODY_BYTES", 1024 * 1024)
+    CACHE_LOCAL_MAX_BYTES: int = os.getenv("CACHE_LOCAL_MAX_BYTES", 64 * 1024 * 1024)  # in-process tier, per worker
+    CACHE_INVALIDATION_CHANNEL: str = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache:invalidate")
+    CACHE_LOCK_TIMEOUT: float = os.getenv("CACHE_LOCK_TIMEOUT", 5.0)  # single-flight lock lifetime
+    CACHE_LOCK_WAIT: float = os.getenv("CACHE_LOCK_WAIT", 2.0)  # how long followers wait for the leader
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT: str = os.getenv("RATE_LIMIT", "10/minute")  # 10 req/minute par IP, other /gateway/auth/* calls
+    RATE_LIMIT_LOGIN: str = os.getenv("RATE_LIMIT_LOGIN", "5/minute")  # per IP
+    RATE_LIMIT_REGISTER: str = os.getenv("RATE_LIMIT_REGISTER", "10/hour")  # per IP
+    RATE_LIMIT_READS: str = os.getenv("RATE_LIMIT_READS", "300/minute")  # per user (IP when anonymous)
+    RATE_LIMIT_WRITES: str = os.getenv("RATE_LIMIT_WRITES", "60/minute")  # per user (IP when anonymous)
+    RATE_LIMIT_LOCAL_MAX_KEYS: int = os.getenv("RATE_LIMIT_LOCAL_MAX_KEYS", 10000)  # local buckets kept per worker
     ENV: str = os.getenv("ENV", "development")
 
+    # JWT verification (same secret/algorithm as AuthService)
+    JWT_SECRET_KEY: str = os.getenv("JWT_SECRET_KEY", "dev-secret-key")  # HS* only
+    JWT_ALGORITHM: str = os.getenv("JWT_ALGORITHM", "HS256")
+    JWKS_PATH: str = os.getenv("JWKS_PATH", "/.well-known/jwks.json")  # on AuthService, for RS*/ES*
+    JWKS_CACHE_TTL: int = os.getenv("JWKS_CACHE_TTL", 300)
+    JWKS_MIN_REFRESH_INTERVAL: int = os.getenv("JWKS_MIN_REFRESH_INTERVAL", 10)  # throttle refetches on unknown kid
+    REVOCATION_CHANNEL: str = os.getenv("REVOCATION_CHANNEL", "auth:revoked")  # published by AuthService on logout
+    AUTH_CLAIMS_CACHE_SIZE: int = os.getenv("AUTH_CLAIMS_CACHE_SIZE", 10000)  # decoded tokens kept per worker
+
+    # Upstream HTTP client pool (shared by every proxied request)
+    UPSTREAM_HTTP2: bool = os.getenv("UPSTREAM_HTTP2", "false").lower() == "true"
+    UPSTREAM_MAX_CONNECTIONS: int = os.getenv("UPSTREAM_MAX_CONNECTIONS", 100)
+    UPSTREAM_MAX_KEEPALIVE_CONNECTIONS: int = os.getenv("UPSTREAM_MAX_KEEPALIVE_CONNECTIONS", 20)
+    UPSTREAM_KEEPALIVE_EXPIRY: float = os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", 30.0)  # seconds
+    UPSTREAM_CONNECT_TIMEOUT: float = os.getenv("UPSTREAM_CONNECT_TIMEOUT", 2.0)
+    UPSTREAM_READ_TIMEOUT: float = os.getenv("UPSTREAM_READ_TIMEOUT", 10.0)
+    UPSTREAM_WRITE_TIMEOUT: float = os.getenv("UPSTREAM_WRITE_TIMEOUT", 10.0)
+    UPSTREAM_POOL_TIMEOUT: float = os.getenv("UPSTREAM_POOL_TIMEOUT", 2.0)  # wait for a free connection
+
+    # Upstream replica health
+    HEALTH_CHECK_PATH: str = os.getenv("HEALTH_CHECK_PATH", "/health")
+    HEALTH_CHECK_INTERVAL: float = os.getenv("HEALTH_CHECK_INTERVAL", 5.0)  # seconds between active checks
+    HEALTH_CHECK_TIMEOUT: float = os.getenv("HEALTH_CHECK_TIMEOUT", 1.0)
+    HEALTH_CHECK_UNHEALTHY_THRESHOLD: int = os.getenv("HEALTH_CHECK_UNHEALTHY_THRESHOLD", 2)  # failed checks to mark down
+    HEALTH_CHECK_HEALTHY_THRESHOLD: int = os.getenv("HEALTH_CHECK_HEALTHY_THRESHOLD", 2)  # passed checks to mark up
+    EJECT_CONSECUTIVE_FAILURES: int = os.getenv("EJECT_CONSECUTIVE_FAILURES", 5)  # proxied errors before ejection
+    EJECT_BASE_SECONDS: float = os.getenv("EJECT_BASE_SECONDS", 30.0)  # doubled on each repeated ejection
+    EJECT_MAX_SECONDS: float = os.getenv("EJECT_MAX_SECONDS", 300.0)
+
+    # Circuit breaker, per upstream pool
+    BREAKER_WINDOW: int = os.getenv("BREAKER_WINDOW", 10)  # seconds of outcomes considered
+    BREAKER_MIN_REQUESTS: int = os.getenv("BREAKER_MIN_REQUESTS", 20)  # calls in the window before it may open
+    BREAKER_ERROR_RATE: float = os.getenv("BREAKER_ERROR_RATE", 0.5)
+    BREAKER_SLOW_CALL_SECONDS: float = os.getenv("BREAKER_SLOW_CALL_SECONDS", 2.0)
+    BREAKER_SLOW_CALL_RATE: float = os.getenv("BREAKER_SLOW_CALL_RATE", 0.8)
+    BREAKER_OPEN_SECONDS: float = os.getenv("BREAKER_OPEN_SECONDS", 15.0)  # fail fast before probing again
+    BREAKER_HALF_OPEN_REQUESTS: int = os.getenv("BREAKER_HALF_OPEN_REQUESTS", 3)
+
+    # Retries and hedging (GET/HEAD only)
+    RETRY_MAX_ATTEMPTS: int = os.getenv("RETRY_MAX_ATTEMPTS", 2)  # retries after the first attempt
+    RETRY_BASE_BACKOFF: float = os.getenv("RETRY_BASE_BACKOFF", 0.05)  # seconds, doubled per retry, full jitter
+    RETRY_MAX_BACKOFF: float = os.getenv("RETRY_MAX_BACKOFF", 0.5)
+    RETRY_BUDGET_RATIO: float = os.getenv("RETRY_BUDGET_RATIO", 0.2)  # retries + hedges per regular request
+    HEDGE_ENABLED: bool = os.getenv("HEDGE_ENABLED", "false").lower() == "true"
+    HEDGE_MIN_SAMPLES: int = os.getenv("HEDGE_MIN_SAMPLES", 100)  # latencies needed before hedging
+    HEDGE_MIN_DELAY: float = os.getenv("HEDGE_MIN_DELAY", 0.01)  # floor of the p95 hedge delay
+
+    # Admission control, per upstream pool
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_INITIAL_LIMIT: int = os.getenv("ADMISSION_INITIAL_LIMIT", 50)  # requests in flight
+    ADMISSION_MIN_LIMIT: int = os.getenv("ADMISSION_MIN_LIMIT", 5)
+    ADMISSION_MAX_LIMIT: int = os.getenv("ADMISSION_MAX_LIMIT", 500)
+    ADMISSION_LATENCY_TOLERANCE: float = os.getenv("ADMISSION_LATENCY_TOLERANCE", 2.0)  # x average latency = slow
+    ADMISSION_SLOW_CALL_FLOOR: float = os.getenv("ADMISSION_SLOW_CALL_FLOOR", 0.05)  # seconds, never slow below
+    ADMISSION_BACKOFF_RATIO: float = os.getenv("ADMISSION_BACKOFF_RATIO", 0.9)  # limit cut on a slow/failed call
+    ADMISSION_QUEUE_SIZE: int = os.getenv("ADMISSION_QUEUE_SIZE", 100)  # waiters per upstream
+    ADMISSION_QUEUE_TIMEOUT: float = os.getenv("ADMISSION_QUEUE_TIMEOUT", 0.5)  # seconds before shedding
+
+    # Tracing: spans exported to "console", "file" (JSON lines in TRACE_FILE_PATH) or nowhere ("none").
+    # The gateway decides sampling for the whole call chain: new traces are kept with TRACE_SAMPLE_RATIO.
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "none")
+    TRACE_FILE_PATH: str = os.getenv("TRACE_FILE_PATH", "./traces.log")
+    TRACE_SAMPLE_RATIO: float = os.getenv("TRACE_SAMPLE_RATIO", 1.0)
+
     class Config:
         env_file = ".env"
         extra = "ignore"  # ignore unlisted variables instead of failing
@@ -0,0 +1,76 @@
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+@dataclass
+class UpstreamConfig:
+    """Connection settings for one upstream replica (defaults come from Settings)."""
+    base_url: str
+    max_connections: int = settings.UPSTREAM_MAX_CONNECTIONS
+    max_keepalive_connections: int = settings.UPSTREAM_MAX_KEEPALIVE_CONNECTIONS
+    keepalive_expiry: float = settings.UPSTREAM_KEEPALIVE_EXPIRY
+    http2: bool = settings.UPSTREAM_HTTP2
+    connect_timeout: float = settings.UPSTREAM_CONNECT_TIMEOUT
+    read_timeout: float = settings.UPSTREAM_READ_TIMEOUT
+    write_timeout: float = settings.UPSTREAM_WRITE_TIMEOUT
+    pool_timeout: float = settings.UPSTREAM_POOL_TIMEOUT
+
+
+class UpstreamClientRegistry:
+    """
+    One long-lived httpx.AsyncClient per upstream replica.
+    Clients are opened at application startup and closed at shutdown so
+    proxied requests reuse pooled keep-alive connections instead of paying
+    a new TCP/TLS handshake each time.
+    """
+
+    def __init__(self):
+        self._configs: Dict[str, UpstreamConfig] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+    def register(self, name: str, config: UpstreamConfig) -> None:
+        self._configs[name] = config
+
+    def _build_client(self, config: UpstreamConfig) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=config.base_url.rstrip("/"),
+            http2=config.http2,
+            limits=httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(
+                connect=config.connect_timeout,
+                read=config.read_timeout,
+                write=config.write_timeout,
+                pool=config.pool_timeout,
+            ),
+        )
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        client: Optional[httpx.AsyncClient] = self._clients.get(name)
+        if client is None or client.is_closed:
+            # Lazily opened when startup hooks did not run (e.g. TestClient without lifespan)
+            if name not in self._configs:
+                raise KeyError(f"Unknown upstream '{name}'")
+            client = self._build_client(self._configs[name])
+            self._clients[name] = client
+        return client
+
+    async def startup(self) -> None:
+        for name in self._configs:
+            self.get(name)
+
+    async def shutdown(self) -> None:
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+# Replicas are registered by app.core.registry, one client per replica URL
+upstream_clients = UpstreamClientRegistry()
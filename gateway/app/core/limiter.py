@@ -1,8 +1,253 @@
-from slowapi import Limiter
-from slowapi.util import get_remote_address
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from limits import parse
+from redis.exceptions import RedisError
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.metrics import RATE_LIMIT_REJECTIONS
 from app.core.redis_client import redis_client
 
-limiter = Limiter(
-    key_func=get_remote_address,
-    storage_uri=f"redis://{redis_client.connection_pool.connection_kwargs['host']}:6379"
-)
+
+# ==============================================================
+# Per-route policy
+# ==============================================================
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    name: str
+    prefix: str
+    limit: str  # "10/minute", "300 per hour", ...
+    methods: Tuple[str, ...] = ()  # empty = any method
+    by: str = "identity"  # "identity" = user when authenticated, else IP; "ip" = always the client IP
+    burst: Optional[int] = None  # requests accepted at once; defaults to the limit amount
+
+    def matches(self, method: str, path: str) -> bool:
+        return path.startswith(self.prefix) and (not self.methods or method in self.methods)
+
+
+# First matching policy wins; paths matching none are not limited
+RATE_LIMIT_POLICIES: List[RateLimitPolicy] = [
+    RateLimitPolicy("login", "/gateway/auth/login", settings.RATE_LIMIT_LOGIN, ("POST",), by="ip"),
+    RateLimitPolicy("register", "/gateway/auth/register", settings.RATE_LIMIT_REGISTER, ("POST",), by="ip"),
+    RateLimitPolicy("auth", "/gateway/auth/", settings.RATE_LIMIT, by="ip"),
+    RateLimitPolicy("reads", "/gateway/", settings.RATE_LIMIT_READS, ("GET", "HEAD")),
+    RateLimitPolicy("writes", "/gateway/", settings.RATE_LIMIT_WRITES),
+]
+
+
+def policy_for(method: str, path: str) -> Optional[RateLimitPolicy]:
+    for policy in RATE_LIMIT_POLICIES:
+        if policy.matches(method, path):
+            return policy
+    return None
+
+
+def get_remote_address(request: Request) -> str:
+    return request.client.host if request.client else "127.0.0.1"
+
+
+def identity_for(request: Request, policy: RateLimitPolicy) -> str:
+    user = request.scope.get("state", {}).get("user") if policy.by == "identity" else None
+    if user and user.get("sub"):
+        return f"user:{user['sub']}"
+    return f"ip:{get_remote_address(request)}"
+
+
+# ==============================================================
+# Decision
+# ==============================================================
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: float  # seconds until the full quota is available again
+    retry_after: float  # seconds until the next request would be accepted (0 when allowed)
+    window: int
+
+    def headers(self) -> List[Tuple[str, str]]:
+        """RateLimit-* fields (draft-ietf-httpapi-ratelimit-headers), plus Retry-After on a 429."""
+        headers = [
+            ("RateLimit-Limit", str(self.limit)),
+            ("RateLimit-Remaining", str(self.remaining)),
+            ("RateLimit-Reset", str(math.ceil(self.reset_after))),
+            ("RateLimit-Policy", f"{self.limit};w={self.window}"),
+        ]
+        if not self.allowed:
+            headers.append(("Retry-After", str(max(1, math.ceil(self.retry_after)))))
+        return headers
+
+
+@dataclass(frozen=True)
+class Quota:
+    limit: int
+    window: int  # seconds
+    burst: int
+
+    @property
+    def interval(self) -> float:
+        """Seconds between two requests at the sustained rate."""
+        return self.window / self.limit
+
+    @classmethod
+    def from_policy(cls, policy: RateLimitPolicy) -> "Quota":
+        item = parse(policy.limit)
+        return cls(limit=item.amount, window=item.get_expiry(), burst=policy.burst or item.amount)
+
+
+# ==============================================================
+# Local pre-check
+# ==============================================================
+class TokenBucket:
+    """
+    Per-worker mirror of a GCRA quota. It only ever sees this worker's
+    requests, so when it is empty the shared quota is exhausted too and the
+    request can be refused without asking Redis.
+    """
+
+    __slots__ = ("tokens", "updated_at", "blocked_until")
+
+    def __init__(self, capacity: int, now: float):
+        self.tokens = float(capacity)
+        self.updated_at = now
+        self.blocked_until = 0.0
+
+    def take(self, quota: Quota, now: float) -> bool:
+        if now < self.blocked_until:
+            return False
+        self.tokens = min(quota.burst, self.tokens + (now - self.updated_at) / quota.interval)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def retry_after(self, quota: Quota, now: float) -> float:
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        return (1 - self.tokens) * quota.interval
+
+    def reset_after(self, quota: Quota, now: float) -> float:
+        return max(self.blocked_until - now, (quota.burst - self.tokens) * quota.interval)
+
+
+class LocalBuckets:
+    """Bounded LRU of token buckets, one per (policy, identity)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def get(self, key: str, quota: Quota, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(quota.burst, now)
+            if len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+# ==============================================================
+# Shared limit (Redis)
+# ==============================================================
+# GCRA: the key holds the theoretical arrival time (TAT, ms) of the next
+# request. Redis' own clock is used so every gateway worker agrees on "now".
+# KEYS[1] = key, ARGV[1] = emission interval (ms), ARGV[2] = burst
+# Returns {allowed, slack_ms, reset_after_ms, retry_after_ms}; slack / interval = requests still allowed
+_GCRA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = tonumber(ARGV[1])
+local tolerance = interval * tonumber(ARGV[2])
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - tolerance
+if now < allow_at then
+    return {0, 0, tat - now, allow_at - now}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', new_tat - now)
+return {1, now - allow_at, new_tat - now, 0}
+"""
+
+
+class RateLimiter:
+    """
+    Distributed GCRA rate limiter. Each check is a single EVALSHA of an
+    atomic Lua script, so the limit holds across every gateway worker and
+    replica. A per-worker token bucket answers first: bursts beyond the
+    limit (and clients already refused) are rejected locally without a
+    Redis round-trip. When Redis is unavailable the limiter fails open to
+    the local buckets.
+    """
+
+    KEY_PREFIX = "ratelimit:"
+
+    def __init__(self, client=redis_client, local_max_entries: int = settings.RATE_LIMIT_LOCAL_MAX_KEYS):
+        self.redis = client
+        self.script = client.register_script(_GCRA)
+        self.local = LocalBuckets(local_max_entries)
+        self.enabled = settings.RATE_LIMIT_ENABLED
+        self._quotas = {}
+
+    def quota(self, policy: RateLimitPolicy) -> Quota:
+        quota = self._quotas.get(policy)
+        if quota is None:
+            quota = self._quotas[policy] = Quota.from_policy(policy)
+        return quota
+
+    async def hit(self, policy: RateLimitPolicy, identity: str) -> RateLimitDecision:
+        quota = self.quota(policy)
+        key = f"{self.KEY_PREFIX}{policy.name}:{identity}"
+        now = time.monotonic()
+        bucket = self.local.get(key, quota, now)
+
+        if not bucket.take(quota, now):
+            RATE_LIMIT_REJECTIONS.labels(policy.name, "local").inc()
+            return RateLimitDecision(
+                False, quota.limit, 0, bucket.reset_after(quota, now), bucket.retry_after(quota, now), quota.window
+            )
+
+        interval_ms = max(1, round(quota.interval * 1000))
+        try:
+            allowed, slack_ms, reset_ms, retry_ms = await self.script(keys=[key], args=[interval_ms, quota.burst])
+        except RedisError:
+            # Fail open: a Redis outage must not take the whole gateway down
+            return RateLimitDecision(
+                True, quota.limit, int(bucket.tokens), bucket.reset_after(quota, now), 0, quota.window
+            )
+
+        if not allowed:
+            RATE_LIMIT_REJECTIONS.labels(policy.name, "redis").inc()
+            # Other workers used the quota: skip Redis for this identity until it frees up
+            bucket.blocked_until = now + retry_ms / 1000
+        else:
+            # Align the local view with the shared one
+            bucket.tokens = min(bucket.tokens, slack_ms / interval_ms)
+        return RateLimitDecision(
+            bool(allowed), quota.limit, slack_ms // interval_ms, reset_ms / 1000, retry_ms / 1000, quota.window
+        )
+
+    async def check(self, request: Request) -> Optional[RateLimitDecision]:
+        """Decision for the request, or None when no policy applies."""
+        if not self.enabled:
+            return None
+        policy = policy_for(request.method, request.url.path)
+        if policy is None:
+            return None
+        return await self.hit(policy, identity_for(request, policy))
+
+
+limiter = RateLimiter()
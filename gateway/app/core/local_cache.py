@@ -0,0 +1,90 @@
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, List, Optional, Union
+
+if TYPE_CHECKING:
+    from app.core.cache import CachedResponse
+
+# Rough per-entry bookkeeping cost (dict slot, objects, tuples) on top of the payload
+ENTRY_OVERHEAD_BYTES = 256
+
+
+def entry_size(key: str, value) -> int:
+    if isinstance(value, list):
+        return ENTRY_OVERHEAD_BYTES + len(key) + sum(len(name) for name in value)
+    headers = sum(len(k) + len(v) for k, v in value.headers)
+    return ENTRY_OVERHEAD_BYTES + len(key) + headers + len(value.body)
+
+
+def key_path(key: str) -> str:
+    """Request path of a cache key (``cache:<path>?<query>|...``, see app.core.cache)."""
+    return key[len("cache:"):].partition("?")[0]
+
+
+class LocalCache:
+    """
+    Size-bounded in-process LRU in front of Redis.
+    Entries are kept as decoded CachedResponse objects, so a hit costs a dict
+    lookup instead of a network round-trip plus deserialization. Memory is
+    accounted per entry and the least recently used entries are evicted once
+    ``max_bytes`` is exceeded; expired entries are dropped on access.
+    The Vary header names of a base key are kept in the same LRU as a list.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Union[CachedResponse, List[str]]]" = OrderedDict()
+        self._sizes: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional["CachedResponse"]:
+        entry = self._entries.get(key)
+        if entry is None or isinstance(entry, list) or not entry.is_fresh():
+            if entry is not None and not isinstance(entry, list) and not entry.is_usable():
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def get_vary(self, key: str) -> Optional[List[str]]:
+        vary = self._entries.get(f"{key}|vary")
+        return vary if isinstance(vary, list) else None
+
+    def set(self, key: str, entry: "CachedResponse") -> None:
+        self._put(key, entry)
+
+    def set_vary(self, key: str, vary: List[str]) -> None:
+        self._put(f"{key}|vary", list(vary))
+
+    def invalidate(self, affected: Callable[[str], bool]) -> None:
+        """Drop every entry (and Vary list) whose request path ``affected(path)`` accepts."""
+        for key in [k for k in self._entries if affected(key_path(k))]:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._sizes.clear()
+        self.size = 0
+
+    def _put(self, key: str, value) -> None:
+        size = entry_size(key, value)
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = value
+        self._sizes[key] = size
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest, _ = self._entries.popitem(last=False)
+            self.size -= self._sizes.pop(oldest)
+
+    def _remove(self, key: str) -> None:
+        if key in self._entries:
+            del self._entries[key]
+            self.size -= self._sizes.pop(key)
@@ -0,0 +1,119 @@
+from typing import Callable, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from starlette.responses import Response
+
+# Label values only come from fixed sets (route templates rather than raw
+# paths, known methods, status codes, configured upstreams and policies),
+# so the number of series stays bounded whatever clients send.
+KNOWN_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+# ==============================================================
+# Metrics
+# ==============================================================
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled by the gateway", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request, body included", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_REQUEST_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Time to response headers of one upstream call",
+    ["upstream", "outcome"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_RETRIES = Counter("upstream_retries_total", "Retried upstream calls", ["upstream"])
+UPSTREAM_HEDGES = Counter("upstream_hedges_total", "Hedged upstream calls", ["upstream"])
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "GET requests seen by the response cache", ["result"]
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "rate_limit_rejections_total", "Requests refused by the rate limiter", ["policy", "source"]
+)
+REDIS_POOL_WAIT = Histogram(
+    "redis_pool_wait_seconds", "Time spent waiting for a Redis connection", buckets=WAIT_BUCKETS
+)
+
+
+def route_label(scope, fallback: Callable[[str], Optional[str]]) -> str:
+    """Route template of a request; ``fallback`` maps paths the router never saw (cache hits)."""
+    route = scope.get("route")
+    template = getattr(route, "path", None) or fallback(scope["path"])
+    return template or "unmatched"
+
+
+def method_label(method: str) -> str:
+    return method if method in KNOWN_METHODS else "OTHER"
+
+
+def outcome_label(status_code: Optional[int]) -> str:
+    """Status class of an upstream answer, or "error" when none came back."""
+    return f"{status_code // 100}xx" if status_code is not None else "error"
+
+
+def observe_request(method: str, route: str, status_code: int, duration: float) -> None:
+    method = method_label(method)
+    HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+    HTTP_REQUEST_DURATION.labels(method, route).observe(duration)
+
+
+# ==============================================================
+# Upstream state
+# ==============================================================
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class UpstreamCollector:
+    """
+    Publishes the registry snapshot (replica health, circuit state,
+    admission limit and queue, shed requests) at scrape time, so the
+    request path does not pay for these gauges.
+    """
+
+    def __init__(self, snapshot: Callable[[], dict]):
+        self.snapshot = snapshot
+
+    def collect(self):
+        up = GaugeMetricFamily("upstream_replica_up", "Replica healthy and not ejected", labels=["upstream", "replica"])
+        outstanding = GaugeMetricFamily(
+            "upstream_replica_outstanding", "Requests in flight on a replica", labels=["upstream", "replica"]
+        )
+        breaker = GaugeMetricFamily(
+            "upstream_circuit_state", "Circuit state (0 closed, 1 half open, 2 open)", labels=["upstream"]
+        )
+        limit = GaugeMetricFamily("upstream_admission_limit", "Adaptive concurrency limit", labels=["upstream"])
+        inflight = GaugeMetricFamily("upstream_admission_inflight", "Admitted requests in flight", labels=["upstream"])
+        queued = GaugeMetricFamily("upstream_admission_queued", "Requests waiting for admission", labels=["upstream"])
+        shed = CounterMetricFamily(
+            "upstream_admission_shed", "Requests shed by admission control", labels=["upstream", "priority"]
+        )
+
+        for name, pool in self.snapshot().items():
+            for replica in pool["replicas"]:
+                available = replica["healthy"] and not replica["ejected_for"]
+                up.add_metric([name, replica["url"]], int(available))
+                outstanding.add_metric([name, replica["url"]], replica["outstanding"])
+            breaker.add_metric([name], BREAKER_STATES[pool["breaker"]["state"]])
+            admission = pool["admission"]
+            limit.add_metric([name], admission["limit"])
+            inflight.add_metric([name], admission["inflight"])
+            queued.add_metric([name], admission["queued"])
+            for priority, count in admission["shed"].items():
+                shed.add_metric([name, priority], count)
+
+        yield from (up, outstanding, breaker, limit, inflight, queued, shed)
+
+
+def register_upstreams(snapshot: Callable[[], dict]) -> None:
+    REGISTRY.register(UpstreamCollector(snapshot))
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
@@ -1,10 +1,46 @@
-import redis
+import time
+
+import redis.asyncio as redis
 
 from app.core.config import settings
+from app.core.metrics import REDIS_POOL_WAIT
+
+
+class InstrumentedConnectionPool(redis.BlockingConnectionPool):
+    """Records how long each command waited for a ready connection."""
+
+    async def get_connection(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await super().get_connection(*args, **kwargs)
+        finally:
+            REDIS_POOL_WAIT.observe(time.perf_counter() - started)
+
 
-redis_client = redis.Redis(
+# One pool per worker, shared by the cache middleware and the rate limiter.
+# BlockingConnectionPool waits up to REDIS_POOL_TIMEOUT for a free connection
+# instead of failing as soon as the pool is exhausted.
+redis_pool = InstrumentedConnectionPool(
     host=settings.REDIS_HOST,
     port=settings.REDIS_PORT,
     db=settings.REDIS_DB,
-    decode_responses=True
+    max_connections=settings.REDIS_POOL_SIZE,
+    timeout=settings.REDIS_POOL_TIMEOUT,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
 )
+
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+
+async def redis_healthy() -> bool:
+    try:
+        return bool(await redis_client.ping())
+    except redis.RedisError:
+        return False
+
+
+async def close_redis() -> None:
+    await redis_client.aclose()
+    await redis_pool.disconnect()
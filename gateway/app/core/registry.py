@@ -0,0 +1,240 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import Collection, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core.admission import AdmissionController
+from app.core.config import settings
+from app.core.http_client import UpstreamConfig, upstream_clients
+from app.core.metrics import register_upstreams
+from app.core.resilience import CircuitBreaker, LatencyTracker, RetryBudget, is_overload
+
+
+# ==============================================================
+# Route table
+# ==============================================================
+@dataclass(frozen=True)
+class Route:
+    prefix: str  # gateway path prefix
+    upstream: str  # pool the requests are sent to
+    upstream_prefix: str  # replaces ``prefix`` in the upstream path
+
+    @property
+    def template(self) -> str:
+        """Path template of the catch-all gateway route."""
+        return f"{self.prefix}{{path:path}}"
+
+
+# First matching prefix wins
+ROUTES: List[Route] = [
+    Route("/gateway/auth/", "auth", "/auth/"),
+    Route("/gateway/users/", "users", "/users/"),
+]
+
+UPSTREAMS: Dict[str, str] = {
+    "auth": settings.AUTH_SERVICE_URLS,
+    "users": settings.USER_SERVICE_URLS,
+}
+
+
+# ==============================================================
+# Replicas
+# ==============================================================
+class Replica:
+    """
+    One instance of an upstream service. It leaves the rotation when active
+    health checks fail HEALTH_CHECK_UNHEALTHY_THRESHOLD times in a row, or
+    when EJECT_CONSECUTIVE_FAILURES proxied requests fail in a row (passive
+    ejection, for EJECT_BASE_SECONDS doubled on each repeated ejection).
+    """
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        self.check_failures = 0
+        self.check_successes = 0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.failures = 0
+
+    def available(self, now: float) -> bool:
+        return self.healthy and now >= self.ejected_until
+
+    def record(self, ok: bool) -> None:
+        self.requests += 1
+        if ok:
+            self.consecutive_failures = 0
+            if time.monotonic() >= self.ejected_until:
+                self.ejections = 0
+            return
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= settings.EJECT_CONSECUTIVE_FAILURES:
+            duration = min(settings.EJECT_BASE_SECONDS * 2 ** self.ejections, settings.EJECT_MAX_SECONDS)
+            self.ejected_until = time.monotonic() + duration
+            self.ejections += 1
+            self.consecutive_failures = 0
+            print(f"Upstream {self.url} ejected for {duration:.0f}s after repeated failures")
+
+    def record_check(self, ok: bool) -> None:
+        if ok:
+            self.check_failures = 0
+            self.check_successes += 1
+            if not self.healthy and self.check_successes >= settings.HEALTH_CHECK_HEALTHY_THRESHOLD:
+                self.healthy = True
+                print(f"Upstream {self.url} is healthy again")
+        else:
+            self.check_successes = 0
+            self.check_failures += 1
+            if self.healthy and self.check_failures >= settings.HEALTH_CHECK_UNHEALTHY_THRESHOLD:
+                self.healthy = False
+                print(f"Upstream {self.url} failed {self.check_failures} health checks, marked down")
+
+    def snapshot(self) -> dict:
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "ejected_for": max(0.0, round(self.ejected_until - time.monotonic(), 1)),
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+        }
+
+
+class UpstreamPool:
+    """
+    Replicas of one service, balanced with the power of two choices: two
+    available replicas are drawn at random and the one with fewer requests
+    in flight wins. When no replica is available every replica is tried
+    (panic mode) rather than failing all traffic on a bad health signal.
+    The pool also owns the service's admission controller, circuit breaker,
+    retry budget and latency samples (see app.services.proxy).
+    """
+
+    def __init__(self, name: str, urls: List[str]):
+        if not urls:
+            raise ValueError(f"Upstream '{name}' has no replica")
+        self.name = name
+        self.replicas = [Replica(url) for url in urls]
+        self.admission = AdmissionController(name)
+        self.breaker = CircuitBreaker(name)
+        self.retry_budget = RetryBudget(settings.RETRY_BUDGET_RATIO)
+        self.latencies = LatencyTracker()
+        for replica in self.replicas:
+            upstream_clients.register(replica.url, UpstreamConfig(base_url=replica.url))
+
+    def choose(self, exclude: Collection[Replica] = ()) -> Replica:
+        """Pick a replica, avoiding ``exclude`` (replicas already tried) when another one is available."""
+        now = time.monotonic()
+        available = [replica for replica in self.replicas if replica.available(now)] or self.replicas
+        candidates = [replica for replica in available if replica not in exclude] or available
+        if len(candidates) == 1:
+            return candidates[0]
+        first, second = random.sample(candidates, 2)
+        return first if first.outstanding <= second.outstanding else second
+
+    def acquire(self, exclude: Collection[Replica] = ()) -> Tuple[Replica, httpx.AsyncClient]:
+        """Pick a replica and count the request as in flight; pair with release()."""
+        replica = self.choose(exclude)
+        replica.outstanding += 1
+        return replica, upstream_clients.get(replica.url)
+
+    @staticmethod
+    def release(replica: Replica, ok: Optional[bool]) -> None:
+        """``ok=None``: the call was abandoned and says nothing about the replica."""
+        replica.outstanding -= 1
+        if ok is not None:
+            replica.record(ok)
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        """Buffered request to one replica (for the gateway's own calls, e.g. JWKS)."""
+        replica, client = self.acquire()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.TransportError:
+            self.release(replica, ok=False)
+            raise
+        self.release(replica, ok=None if is_overload(response) else response.status_code < 500)
+        return response
+
+    async def check(self) -> None:
+        async def probe(replica: Replica) -> None:
+            try:
+                response = await upstream_clients.get(replica.url).get(
+                    settings.HEALTH_CHECK_PATH, timeout=settings.HEALTH_CHECK_TIMEOUT
+                )
+                replica.record_check(response.status_code == 200)
+            except httpx.HTTPError:
+                replica.record_check(False)
+
+        await asyncio.gather(*(probe(replica) for replica in self.replicas))
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        p95 = self.latencies.p95()
+        return {
+            "available": sum(replica.available(now) for replica in self.replicas),
+            "admission": self.admission.snapshot(),
+            "breaker": self.breaker.snapshot(),
+            "latency_p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+            "replicas": [replica.snapshot() for replica in self.replicas],
+        }
+
+
+# ==============================================================
+# Registry
+# ==============================================================
+class ServiceRegistry:
+    """Maps gateway paths to upstream pools and runs their active health checks."""
+
+    def __init__(self, routes: List[Route], upstreams: Dict[str, str]):
+        self.routes = routes
+        self.pools = {
+            name: UpstreamPool(name, [url.strip() for url in urls.split(",") if url.strip()])
+            for name, urls in upstreams.items()
+        }
+        self._checker: Optional[asyncio.Task] = None
+
+    def pool(self, name: str) -> UpstreamPool:
+        return self.pools[name]
+
+    def template_for(self, path: str) -> Optional[str]:
+        """Route template a path falls under, for requests that never reach the router."""
+        for route in self.routes:
+            if path.startswith(route.prefix):
+                return route.template
+        return None
+
+    async def _check_forever(self) -> None:
+        while True:
+            try:
+                await asyncio.gather(*(pool.check() for pool in self.pools.values()))
+            except Exception as e:
+                print(f"Upstream health checks failed: {e}")
+            await asyncio.sleep(settings.HEALTH_CHECK_INTERVAL)
+
+    def start(self) -> None:
+        if self._checker is None or self._checker.done():
+            self._checker = asyncio.create_task(self._check_forever())
+
+    async def stop(self) -> None:
+        if self._checker is not None:
+            self._checker.cancel()
+            try:
+                await self._checker
+            except asyncio.CancelledError:
+                pass
+            self._checker = None
+
+    def snapshot(self) -> dict:
+        return {name: pool.snapshot() for name, pool in self.pools.items()}
+
+
+service_registry = ServiceRegistry(ROUTES, UPSTREAMS)
+register_upstreams(service_registry.snapshot)
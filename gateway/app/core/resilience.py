@@ -0,0 +1,190 @@
+import random
+import time
+from collections import deque
+from typing import Deque, List, Optional
+
+import httpx
+
+from app.core.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+# ==============================================================
+# Circuit breaker
+# ==============================================================
+class CircuitBreaker:
+    """
+    Per-upstream breaker. Outcomes are counted in one-second buckets over
+    BREAKER_WINDOW seconds; once BREAKER_MIN_REQUESTS calls were seen and
+    either the error rate or the rate of calls slower than
+    BREAKER_SLOW_CALL_SECONDS crosses its threshold, the breaker opens and
+    calls fail fast for BREAKER_OPEN_SECONDS. It then lets
+    BREAKER_HALF_OPEN_REQUESTS probes through: all succeed and it closes,
+    any failure opens it again.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._window = settings.BREAKER_WINDOW
+        # [second, calls, failures, slow calls]
+        self._buckets: Deque[List[int]] = deque()
+        self._probes = 0
+        self._probe_successes = 0
+
+    def _bucket(self, now: float) -> List[int]:
+        second = int(now)
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0, 0])
+        while self._buckets[0][0] <= second - self._window:
+            self._buckets.popleft()
+        return self._buckets[-1]
+
+    def _totals(self, now: float):
+        self._bucket(now)
+        calls = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        slow = sum(bucket[3] for bucket in self._buckets)
+        return calls, failures, slow
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + settings.BREAKER_OPEN_SECONDS - time.monotonic())
+
+    def allow(self) -> bool:
+        """Whether a call may be sent now; every allowed call must end with record() or abandon()."""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+        if self.state == HALF_OPEN:
+            if self._probes >= settings.BREAKER_HALF_OPEN_REQUESTS:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        return True
+
+    def abandon(self) -> None:
+        """A call allowed by allow() ended saying nothing about health (cancelled, or shed by the upstream)."""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record(self, ok: bool, duration: float) -> None:
+        slow = duration >= settings.BREAKER_SLOW_CALL_SECONDS
+        now = time.monotonic()
+        bucket = self._bucket(now)
+        bucket[1] += 1
+        bucket[2] += not ok
+        bucket[3] += slow
+
+        if self.state == HALF_OPEN:
+            if not ok or slow:
+                self._open(now, "probe failed")
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= settings.BREAKER_HALF_OPEN_REQUESTS:
+                self.state = CLOSED
+                self._buckets.clear()
+                print(f"Circuit for upstream '{self.name}' closed")
+            return
+
+        if self.state == CLOSED:
+            calls, failures, slow_calls = self._totals(now)
+            if calls < settings.BREAKER_MIN_REQUESTS:
+                return
+            if failures / calls >= settings.BREAKER_ERROR_RATE:
+                self._open(now, f"{failures}/{calls} calls failed")
+            elif slow_calls / calls >= settings.BREAKER_SLOW_CALL_RATE:
+                self._open(now, f"{slow_calls}/{calls} calls slower than {settings.BREAKER_SLOW_CALL_SECONDS}s")
+
+    def _open(self, now: float, reason: str) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.times_opened += 1
+        print(f"Circuit for upstream '{self.name}' opened: {reason}")
+
+    def snapshot(self) -> dict:
+        calls, failures, slow = self._totals(time.monotonic())
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failures": failures,
+            "slow_calls": slow,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 1) if self.state == OPEN else 0.0,
+        }
+
+
+# ==============================================================
+# Retries
+# ==============================================================
+class RetryBudget:
+    """
+    Caps retries and hedged requests to a fraction of the regular traffic
+    (RETRY_BUDGET_RATIO), so a degraded upstream is not hit by a retry storm.
+    """
+
+    def __init__(self, ratio: float, min_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = min_tokens
+        self.tokens = min_tokens
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+def is_overload(response: httpx.Response) -> bool:
+    """
+    A 503 carrying Retry-After is the upstream shedding load on purpose: it
+    says nothing about the replica's health and retrying it only adds load.
+    """
+    return response.status_code == 503 and "retry-after" in response.headers
+
+
+def retry_backoff(attempt: int) -> float:
+    """Full-jitter exponential backoff before retry number ``attempt`` (1-based)."""
+    return random.uniform(0, min(settings.RETRY_MAX_BACKOFF, settings.RETRY_BASE_BACKOFF * 2 ** (attempt - 1)))
+
+
+# ==============================================================
+# Latency
+# ==============================================================
+class LatencyTracker:
+    """Time to response headers of the last ``size`` successful calls."""
+
+    def __init__(self, size: int = 512):
+        self._samples: Deque[float] = deque(maxlen=size)
+        self._p95: Optional[float] = None
+        self._since_computed = 0
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def add(self, duration: float) -> None:
+        self._samples.append(duration)
+        self._since_computed += 1
+
+    def p95(self) -> Optional[float]:
+        if len(self._samples) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        # Sorting a few hundred floats is cheap, but not on every request
+        if self._p95 is None or self._since_computed >= 50:
+            ordered = sorted(self._samples)
+            self._p95 = ordered[int(len(ordered) * 0.95) - 1]
+            self._since_computed = 0
+        return self._p95
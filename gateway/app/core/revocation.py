@@ -0,0 +1,90 @@
+import asyncio
+import time
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis_client import redis_client
+
+# Written by AuthService: auth:revoked:<sid> = expiry timestamp (EX = access token lifetime)
+REVOKED_PREFIX = "auth:revoked:"
+
+
+class RevocationList:
+    """
+    In-memory copy of AuthService's session denylist, so checking a token
+    costs a dict lookup. It is loaded with SCAN when the subscription to
+    REVOCATION_CHANNEL is (re)established and kept current from the
+    ``<sid>:<expires_at>`` messages published on every revocation.
+    """
+
+    def __init__(self, client=redis_client):
+        self.redis = client
+        self._revoked: Dict[str, float] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def is_revoked(self, sid: Optional[str]) -> bool:
+        if not sid:
+            return False
+        expires_at = self._revoked.get(sid)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del self._revoked[sid]
+            return False
+        return True
+
+    def add(self, sid: str, expires_at: float) -> None:
+        self._revoked[sid] = expires_at
+        if len(self._revoked) % 1024 == 0:
+            now = time.time()
+            self._revoked = {s: exp for s, exp in self._revoked.items() if exp > now}
+
+    async def load(self) -> None:
+        revoked: Dict[str, float] = {}
+        keys = [key async for key in self.redis.scan_iter(match=f"{REVOKED_PREFIX}*", count=500)]
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            for key, value in zip(batch, await self.redis.mget(batch)):
+                if value is not None:
+                    revoked[key.decode()[len(REVOKED_PREFIX):]] = float(value)
+        self._revoked = revoked
+
+    async def _listen(self) -> None:
+        backoff = 0.5
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.REVOCATION_CHANNEL)
+                # Subscribe first, then load: nothing published in between is lost
+                await self.load()
+                backoff = 0.5
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        sid, _, expires_at = message["data"].decode().rpartition(":")
+                        self.add(sid, float(expires_at))
+            except RedisError:
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+            finally:
+                await pubsub.aclose()
+
+    def start(self) -> None:
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+revocation_list = RevocationList()
@@ -0,0 +1,16 @@
+from app.core.config import settings
+from app.core.spans import ConsoleExporter, FileExporter, Tracer, valid_request_id
+
+
+def get_span_exporter():
+    """Exporter named by TRACE_EXPORTER; anything with an ``export(span)`` method can be plugged in."""
+    if settings.TRACE_EXPORTER == "file":
+        return FileExporter(settings.APP_NAME, settings.TRACE_FILE_PATH)
+    if settings.TRACE_EXPORTER == "console":
+        return ConsoleExporter(settings.APP_NAME)
+    return None
+
+
+# The gateway decides sampling for the whole call chain, so trace context is
+# created even without an exporter
+tracer = Tracer(get_span_exporter(), settings.TRACE_SAMPLE_RATIO, propagate=True)
@@ -1,16 +1,29 @@
 from fastapi import FastAPI
-from slowapi.errors import RateLimitExceeded
 from starlette.middleware.cors import CORSMiddleware
 
+from app.core.cache import response_cache
 from app.core.config import settings
-from app.core.limiter import limiter
+from app.core.http_client import upstream_clients
+from app.core.redis_client import close_redis, redis_healthy
+from app.core.registry import service_registry
+from app.core.revocation import revocation_list
+from app.core.tracing import tracer
 from app.routes.gateway_routes import gateway_router
-from app.middleware import CacheMiddleware
+from app.core.metrics import metrics_response
+from app.middleware import AuthMiddleware, CacheMiddleware, MetricsMiddleware, RateLimitMiddleware, TracingMiddleware
 
 app = FastAPI(title="Gateway Service")
 
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, lambda r, e: e.response)
+app.add_middleware(CacheMiddleware)
+# Runs after authentication so limits are per user, and before the cache so hits count too
+app.add_middleware(RateLimitMiddleware)
+# Runs before the limiter and the cache: the cache never answers an unauthenticated request
+app.add_middleware(AuthMiddleware)
+# Around authentication, so rejected requests (401, 429) and cache hits are measured too
+app.add_middleware(MetricsMiddleware)
+# Around metrics, so every response (401, 429, cache hits) carries its X-Request-ID
+app.add_middleware(TracingMiddleware)
+# Outermost: every response, 401 and 429 included, carries the CORS headers the browser needs to read it
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:4200"],
@@ -18,12 +31,41 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-app.add_middleware(CacheMiddleware)
 app.include_router(gateway_router)
 
 
 @app.on_event("startup")
 async def startup_event():
+    await upstream_clients.startup()
+    service_registry.start()
+    response_cache.start()
+    revocation_list.start()
     print(f" {settings.APP_NAME} running on port {settings.APP_PORT}")
     print(f" Redis: {settings.REDIS_HOST}:{settings.REDIS_PORT}")
-    print(f" Auth Service: {settings.AUTH_SERVICE_URL}")
+    for name, pool in service_registry.pools.items():
+        print(f" Upstream {name}: {', '.join(replica.url for replica in pool.replicas)}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await service_registry.stop()
+    await upstream_clients.shutdown()
+    await response_cache.stop()
+    await revocation_list.stop()
+    await close_redis()
+    tracer.flush()
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "redis": "ok" if await redis_healthy() else "unavailable"}
+
+
+@app.get("/health/upstreams")
+async def upstreams_health():
+    return service_registry.snapshot()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return metrics_response()
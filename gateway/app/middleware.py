@@ -1,21 +1,412 @@
-from starlette.middleware.base import BaseHTTPMiddleware
+import asyncio
+import time
+import uuid
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.requests import Request
-from fastapi.responses import JSONResponse
-from app.core.redis_client import redis_client
-import json
-
-class CacheMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if request.method != "GET":
-            return await call_next(request)
-
-        cache_key = f"cache:{request.url.path}?{request.url.query}"
-        cached = redis_client.get(cache_key)
-        if cached:
-            return JSONResponse(content=json.loads(cached))
-
-        response = await call_next(request)
-        if response.status_code == 200:
-            body = await response.body()
-            redis_client.setex(cache_key, 60, body.decode())
+from fastapi.responses import JSONResponse, Response
+from redis.exceptions import RedisError
+
+from app.core.auth import (
+    IDENTITY_HEADERS,
+    InvalidToken,
+    bearer_token,
+    identity_headers,
+    is_public_path,
+    token_verifier,
+)
+from app.core.cache import (
+    CachedResponse,
+    base_key,
+    compute_etag,
+    etag_matches,
+    parse_cache_control,
+    policy_for,
+    response_cache,
+)
+from app.core.config import settings
+from app.core.limiter import limiter
+from app.core.metrics import CACHE_REQUESTS, observe_request, route_label
+from app.core.registry import service_registry
+from app.core.revocation import revocation_list
+from app.core.tracing import tracer, valid_request_id
+from app.services.proxy import HOP_BY_HOP_HEADERS
+
+UNSAFE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+CONDITIONAL_HEADERS = {b"if-none-match", b"if-modified-since"}
+# Headers repeated on a 304 (RFC 9110 §15.4.5)
+NOT_MODIFIED_HEADERS = {"cache-control", "content-location", "date", "etag", "expires", "vary"}
+
+# The middlewares below are plain ASGI callables: requests and response
+# bodies go through untouched (no extra task or memory stream per request,
+# streamed responses stay streamed). Only "http.response.start" messages
+# are rewritten where a middleware adds headers.
+
+
+class TracingMiddleware:
+    """
+    Opens the root span of every request, continuing the client's trace
+    when it sent a valid traceparent, and makes sure the request carries an
+    X-Request-ID (the client's, or a new one) that is forwarded upstream
+    and returned on the response. Upstream calls send their own span as
+    the traceparent (see app.services.proxy).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        request_id = valid_request_id(headers.get("x-request-id")) or uuid.uuid4().hex
+        scope["headers"] = [(k, v) for k, v in scope["headers"] if k != b"x-request-id"]
+        scope["headers"].append((b"x-request-id", request_id.encode("latin-1")))
+        method = scope["method"]
+        span = tracer.start_trace(
+            method, headers.get("traceparent"), request_id,
+            **{"http.method": method, "http.path": scope["path"]},
+        )
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                span.attributes["http.status_code"] = message["status"]
+                # Replaces the ID an upstream (or a cached response) may have returned
+                MutableHeaders(scope=message)["x-request-id"] = request_id
+            await send(message)
+
+        with tracer.activate(span):
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                route = route_label(scope, service_registry.template_for)
+                span.name = f"{method} {route}"
+                span.attributes["http.route"] = route
+
+
+class MetricsMiddleware:
+    """
+    Counts and times every request per route template (see app.core.metrics).
+    Cache hits never reach the router, so their template comes from the
+    registry's route table instead.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = route_label(scope, service_registry.template_for)
+            observe_request(scope["method"], route, status_code, time.perf_counter() - started)
+
+
+class AuthMiddleware:
+    """
+    Verifies the Bearer token of every non-public request locally and passes
+    the identity downstream as X-User-* headers. Client-supplied identity
+    headers are always stripped so they cannot be spoofed.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        scope["headers"] = [(k, v) for k, v in scope["headers"] if k not in IDENTITY_HEADERS]
+        if scope["method"] == "OPTIONS" or is_public_path(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        token = bearer_token(Headers(scope=scope).get("authorization"))
+        if token is None:
+            await self._unauthorized("Not authenticated")(scope, receive, send)
+            return
+        try:
+            with tracer.span("auth.verify_token"):
+                claims = await token_verifier.verify(token)
+        except InvalidToken:
+            await self._unauthorized("Invalid or expired token")(scope, receive, send)
+            return
+        if revocation_list.is_revoked(claims.get("sid")):
+            await self._unauthorized("Session has been revoked")(scope, receive, send)
+            return
+
+        scope["headers"].extend(identity_headers(claims))
+        scope.setdefault("state", {})["user"] = claims
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _unauthorized(detail: str) -> JSONResponse:
+        return JSONResponse(
+            status_code=401,
+            content={"detail": detail},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+class RateLimitMiddleware:
+    """
+    Applies the per-route policies of app.core.limiter, keyed by user once
+    AuthMiddleware has run (client IP otherwise). Every limited response
+    carries RateLimit-* headers; refused requests get 429 and Retry-After.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        decision = await limiter.check(Request(scope))
+        if decision is None:
+            await self.app(scope, receive, send)
+            return
+        if not decision.allowed:
+            response = JSONResponse(
+                status_code=429,
+                content={"detail": f"Rate limit exceeded: {decision.limit} per {decision.window} seconds"},
+                headers=dict(decision.headers()),
+            )
+            await response(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for key, value in decision.headers():
+                    headers[key] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+class CacheMiddleware:
+    """
+    HTTP response cache for GET requests, driven by the per-route policies
+    in app.core.cache. Keys are scoped by Authorization and Vary, entries
+    keep status/headers/body, ETags answer If-None-Match with 304, stale
+    entries are served while being refreshed, and a miss on a hot key only
+    sends one request upstream. Bodies larger than CACHE_MAX_BODY_BYTES are
+    never held in memory: they are streamed through to the client.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        method = scope["method"]
+        if method != "GET":
+            if method not in UNSAFE_METHODS:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_after_invalidation(message):
+                # Invalidate before the client sees the response, so its next GET is not stale
+                if message["type"] == "http.response.start" and message["status"] < 400:
+                    try:
+                        await response_cache.invalidate(path)
+                    except RedisError:
+                        pass
+                await send(message)
+
+            await self.app(scope, receive, send_after_invalidation)
+            return
+
+        policy = policy_for(path)
+        headers = Headers(scope=scope)
+        request_cc = parse_cache_control(headers.get("cache-control"))
+        if policy is None or "no-store" in request_cc:
+            CACHE_REQUESTS.labels("bypass").inc()
+            await self.app(scope, receive, send)
+            return
+
+        key = base_key(path, scope["query_string"].decode("latin-1"), headers)
+        started = False
+
+        async def send_through(message):
+            nonlocal started
+            started = True
+            await send(message)
+
+        async def fetch() -> Optional[CachedResponse]:
+            return await self._fetch_and_store(scope, key, policy, send_through)
+
+        async def refresh() -> Optional[CachedResponse]:
+            # The client already has its (stale) answer: nothing to stream to
+            return await self._fetch_and_store(scope, key, policy)
+
+        try:
+            entry = None if "no-cache" in request_cc else await response_cache.lookup(key, headers)
+            if entry is not None and entry.is_fresh():
+                cache_status = "HIT"
+            elif entry is not None and entry.is_usable():
+                response_cache.revalidate_in_background(key, refresh, headers)
+                cache_status = "STALE"
+            else:
+                entry = await response_cache.single_flight(key, fetch, headers)
+                cache_status = "MISS"
+        except RedisError:
+            # Cache is best effort: serve from upstream when Redis is unavailable
+            CACHE_REQUESTS.labels("error").inc()
+            if not started:
+                await self.app(scope, receive, send)
+            return
+        if entry is None:
+            # Too large to cache: already streamed to this client, or to the
+            # client whose fetch this request was waiting on
+            CACHE_REQUESTS.labels("miss").inc()
+            if not started:
+                await self.app(scope, receive, send)
+            return
+        await self._to_response(entry, headers, cache_status)(scope, receive, send)
+
+    async def _fetch(self, scope, client_send=None) -> Optional[CachedResponse]:
+        """
+        Run the downstream app directly and collect the full response. Once
+        the body is known to exceed CACHE_MAX_BODY_BYTES (from Content-Length,
+        or while reading it) the rest goes straight to ``client_send``
+        (dropped without one) and None is returned.
+        """
+        # Always ask for a full body, whatever conditional headers the client sent
+        scope = dict(scope)
+        scope["headers"] = [(k, v) for k, v in scope["headers"] if k not in CONDITIONAL_HEADERS]
+        disconnected = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        limit = settings.CACHE_MAX_BODY_BYTES
+        status_code = 500
+        raw_headers = []
+        chunks = []
+        size = 0
+        passthrough = False
+
+        async def forward(message):
+            if client_send is not None:
+                await client_send(message)
+
+        async def send(message):
+            nonlocal status_code, raw_headers, size, passthrough
+            if passthrough:
+                await forward(message)
+            elif message["type"] == "http.response.start":
+                status_code = message["status"]
+                raw_headers = message.get("headers", [])
+                length = Headers(raw=raw_headers).get("content-length", "")
+                if length.isdigit() and int(length) > limit:
+                    passthrough = True
+                    await forward(message)
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                size += len(body)
+                if size <= limit:
+                    chunks.append(body)
+                    return
+                passthrough = True
+                await forward({"type": "http.response.start", "status": status_code, "headers": raw_headers})
+                await forward({
+                    "type": "http.response.body",
+                    "body": b"".join(chunks) + body,
+                    "more_body": message.get("more_body", False),
+                })
+                chunks.clear()
+
+        await self.app(scope, receive, send)
+        if passthrough:
+            return None
+        headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in raw_headers]
+        return CachedResponse(status_code=status_code, headers=headers, body=b"".join(chunks))
+
+    async def _fetch_and_store(self, scope, key, policy, client_send=None) -> Optional[CachedResponse]:
+        entry = await self._fetch(scope, client_send)
+        if entry is None:
+            return None
+        response_cc = parse_cache_control(entry.header("cache-control"))
+        request_headers = Headers(scope=scope)
+
+        entry.etag = entry.header("etag")
+        if entry.etag is None and entry.status_code == 200:
+            entry.etag = compute_etag(entry.body)
+            entry.headers.append(("etag", entry.etag))
+
+        ttl = policy.ttl
+        for directive in ("s-maxage", "max-age"):
+            if response_cc.get(directive) and response_cc[directive].isdigit():
+                ttl = int(response_cc[directive])
+                break
+
+        storable = (
+            entry.status_code == 200
+            and ttl > 0
+            and entry.header("set-cookie") is None
+            and (entry.header("vary") or "").strip() != "*"
+            and not {"no-store", "no-cache"} & response_cc.keys()
+            # "private" responses are only kept under a per-credential key
+            and ("private" not in response_cc or "authorization" in request_headers)
+        )
+        if storable:
+            entry.stored_at = time.time()
+            entry.ttl = ttl
+            entry.stale_ttl = policy.stale_while_revalidate
+            entry.headers = [
+                (k, v) for k, v in entry.headers if k.lower() not in HOP_BY_HOP_HEADERS
+            ]
+            try:
+                await response_cache.store(key, scope["path"], request_headers, entry)
+            except RedisError:
+                pass
+        return entry
+
+    @staticmethod
+    def _to_response(entry: CachedResponse, request_headers: Headers, cache_status: str) -> Response:
+        CACHE_REQUESTS.labels(cache_status.lower()).inc()
+        extra = [("x-cache", cache_status)]
+        if entry.stored_at:
+            extra.append(("age", str(int(entry.age))))
+
+        if entry.status_code == 200 and etag_matches(request_headers.get("if-none-match"), entry.etag):
+            response = Response(status_code=304)
+            headers = [(k, v) for k, v in entry.headers if k.lower() in NOT_MODIFIED_HEADERS]
+        else:
+            response = Response(content=entry.body, status_code=entry.status_code)
+            headers = [(k, v) for k, v in entry.headers if k.lower() != "content-length"]
+            headers.append(("content-length", str(len(entry.body))))
+        response.raw_headers = [
+            (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers + extra
+        ]
         return response
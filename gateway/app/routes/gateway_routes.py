@@ -1,32 +1,23 @@
-from fastapi import APIRouter, Request, Response
-from app.core.config import settings
-from app.services.auth_service import proxy_to_auth
-from app.core.limiter import limiter
+from fastapi import APIRouter, Request
+from app.core.registry import Route, UpstreamPool, service_registry
+from app.services.proxy import proxy_request
 
-gateway_router = APIRouter(prefix="/gateway", tags=["Gateway"])
+gateway_router = APIRouter(tags=["Gateway"])
 
-@gateway_router.api_route("/auth/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
-@limiter.limit(settings.RATE_LIMIT)
-async def proxy_auth_request(path: str, request: Request):
-    # Read body if needed
-    if request.method in ("POST", "PUT", "PATCH"):
-        body = await request.body()
-    else:
-        body = None
 
-    # Clean headers (avoid content-length mismatch)
-    headers = {k: v for k, v in request.headers.items() if k.lower() != "content-length"}
+def _proxy_endpoint(route: Route, pool: UpstreamPool):
+    async def proxy(path: str, request: Request):
+        # Relay status, headers and body chunk by chunk
+        return await proxy_request(request, route, pool, path)
 
-    # Proxy to AuthService
-    response = await proxy_to_auth(f"/auth/{path}", request.method, body, headers)
+    return proxy
 
-    # Read content
-    content = await response.aread()
 
-    # Return full response with status code and headers
-    return Response(
-        content=content,
-        status_code=response.status_code,
-        headers=dict(response.headers),
-        media_type=response.headers.get("content-type")
+# One catch-all route per entry of the route table
+for _route in service_registry.routes:
+    gateway_router.add_api_route(
+        _route.template,
+        _proxy_endpoint(_route, service_registry.pool(_route.upstream)),
+        methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
+        name=f"proxy_{_route.upstream}",
     )
@@ -0,0 +1,301 @@
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+import httpx
+from starlette.background import BackgroundTask
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+
+from app.core.admission import Overloaded, priority_for
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_HEDGES, UPSTREAM_REQUEST_DURATION, UPSTREAM_RETRIES, outcome_label
+from app.core.registry import Replica, Route, UpstreamPool
+from app.core.resilience import CLOSED, is_overload, retry_backoff
+from app.core.tracing import tracer
+
+# Headers that only apply to a single transport hop (RFC 7230 §6.1) and must
+# not be forwarded by a proxy. "host" is rewritten by the upstream client.
+HOP_BY_HOP_HEADERS = frozenset({
+    "connection",
+    "keep-alive",
+    "proxy-authenticate",
+    "proxy-authorization",
+    "proxy-connection",
+    "te",
+    "trailer",
+    "trailers",
+    "transfer-encoding",
+    "upgrade",
+    "host",
+})
+
+
+def filter_headers(items: Iterable[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Drop hop-by-hop headers, including any listed in the Connection header."""
+    items = list(items)
+    dropped = set(HOP_BY_HOP_HEADERS)
+    for key, value in items:
+        if key.lower() == "connection":
+            dropped.update(token.strip().lower() for token in value.split(",") if token.strip())
+    return [(key, value) for key, value in items if key.lower() not in dropped]
+
+
+# Upstream answers that count as failures (passive ejection, circuit breaker, retries),
+# except a 503 with Retry-After (see is_overload), which is relayed as is
+FAILURE_STATUSES = frozenset({502, 503, 504})
+
+# Safe to send twice; bodies are streamed, so only bodiless methods are retried or hedged
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD"})
+
+
+def stream_response(upstream: httpx.Response, on_close: Optional[Callable[[], None]] = None) -> StreamingResponse:
+    """
+    Relay an upstream response opened with stream=True chunk by chunk.
+    Raw (still encoded) bytes are forwarded, so Content-Encoding and
+    Content-Length stay valid; the upstream connection is released once
+    the body has been sent, then ``on_close`` is called. Both also happen
+    when the client disconnects or the upstream fails mid-body.
+    """
+    closed = False
+
+    async def close():
+        nonlocal closed
+        if closed:
+            return
+        closed = True
+        try:
+            await upstream.aclose()
+        finally:
+            if on_close is not None:
+                on_close()
+
+    async def body():
+        # Starlette skips background tasks when the client goes away mid-stream
+        try:
+            async for chunk in upstream.aiter_raw():
+                yield chunk
+        finally:
+            await close()
+
+    response = StreamingResponse(
+        body(),
+        status_code=upstream.status_code,
+        background=BackgroundTask(close),
+    )
+    # Keep repeated headers such as Set-Cookie intact
+    response.raw_headers = [
+        (key.lower().encode("latin-1"), value.encode("latin-1"))
+        for key, value in filter_headers(upstream.headers.multi_items())
+    ]
+    return response
+
+
+@dataclass
+class Attempt:
+    """Outcome of one call to one replica: an open streamed response, or the transport error."""
+    replica: Replica
+    response: Optional[httpx.Response] = None
+    error: Optional[httpx.TransportError] = None
+    duration: float = 0.0  # seconds until the response headers (or the error)
+
+    @property
+    def overloaded(self) -> bool:
+        return self.response is not None and is_overload(self.response)
+
+    @property
+    def ok(self) -> bool:
+        return self.response is not None and self.response.status_code not in FAILURE_STATUSES
+
+    @property
+    def health(self) -> Optional[bool]:
+        """What the call says about the replica; None for a deliberate overload answer."""
+        return None if self.overloaded else self.ok
+
+
+async def _attempt(pool: UpstreamPool, build: Callable[[httpx.AsyncClient], httpx.Request],
+                   tried: Set[Replica]) -> Attempt:
+    """
+    Send one call, preferably to a replica not tried yet. The breaker must
+    have allowed it. The call gets its own span, sent upstream as the
+    traceparent, so the services' spans hang under the attempt that
+    reached them.
+    """
+    replica, client = pool.acquire(exclude=tried)
+    tried.add(replica)
+    span = tracer.start_span(f"upstream {pool.name}", **{"upstream.replica": replica.url})
+    request = build(client)
+    if span is not None:
+        request.headers["traceparent"] = span.traceparent
+    started = time.monotonic()
+    try:
+        response = await client.send(request, stream=True)
+    except httpx.TransportError as e:
+        duration = time.monotonic() - started
+        pool.breaker.record(False, duration)
+        pool.release(replica, ok=False)
+        UPSTREAM_REQUEST_DURATION.labels(pool.name, outcome_label(None)).observe(duration)
+        tracer.end_span(span, e)
+        return Attempt(replica, error=e, duration=duration)
+    except asyncio.CancelledError as e:
+        # Lost a hedging race: the outcome says nothing about the replica
+        pool.breaker.abandon()
+        pool.release(replica, ok=None)
+        tracer.end_span(span, e)
+        raise
+    duration = time.monotonic() - started
+    if span is not None:
+        span.attributes["http.status_code"] = response.status_code
+    tracer.end_span(span)
+    attempt = Attempt(replica, response=response, duration=duration)
+    if attempt.overloaded:
+        pool.breaker.abandon()
+    else:
+        pool.breaker.record(attempt.ok, duration)
+    UPSTREAM_REQUEST_DURATION.labels(pool.name, outcome_label(response.status_code)).observe(duration)
+    if attempt.ok:
+        pool.latencies.add(duration)
+    return attempt
+
+
+async def _discard(pool: UpstreamPool, attempt: Attempt) -> None:
+    """Drop an attempt whose response will not be relayed."""
+    if attempt.response is not None:
+        await attempt.response.aclose()
+        pool.release(attempt.replica, ok=attempt.health)
+
+
+async def _hedged_attempt(pool: UpstreamPool, build, tried: Set[Replica]) -> Attempt:
+    """
+    Like _attempt, but when no response headers arrived after the pool's p95
+    latency a second call goes to another replica and the first good answer
+    wins. Hedges spend the retry budget and are only sent while the breaker
+    is closed.
+    """
+    delay = pool.latencies.p95()
+    first = asyncio.create_task(_attempt(pool, build, tried))
+    if delay is None:
+        return await first
+    done, _ = await asyncio.wait({first}, timeout=max(delay, settings.HEDGE_MIN_DELAY))
+    if done or pool.breaker.state != CLOSED or not pool.breaker.allow():
+        return await first
+    # Only spend a budget token on a hedge the breaker lets through
+    if not pool.retry_budget.withdraw():
+        pool.breaker.abandon()
+        return await first
+
+    UPSTREAM_HEDGES.labels(pool.name).inc()
+    pending = {first, asyncio.create_task(_attempt(pool, build, tried))}
+    result: Optional[Attempt] = None
+    try:
+        while pending and (result is None or not result.ok):
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                attempt = task.result()
+                if result is None or (attempt.ok and not result.ok):
+                    result, attempt = attempt, result
+                if attempt is not None:
+                    await _discard(pool, attempt)
+    finally:
+        for task in pending:
+            task.cancel()
+        # A call may have completed before it could be cancelled
+        for outcome in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(outcome, Attempt):
+                await _discard(pool, outcome)
+    return result
+
+
+def _unavailable(pool: UpstreamPool, retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=503,
+        content={"detail": f"Upstream '{pool.name}' unavailable"},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+async def _send(request: Request, route: Route, pool: UpstreamPool, path: str) -> Optional[Attempt]:
+    """
+    Call the pool with retries (and hedging) for GET/HEAD. Returns the
+    final attempt, or None when the circuit is open.
+    """
+    idempotent = request.method in IDEMPOTENT_METHODS
+    # Forward the body as it arrives instead of buffering it
+    content = request.stream() if request.method in ("POST", "PUT", "PATCH") else None
+    # Strip hop-by-hop headers; Content-Length is kept so upstream is not sent chunked bodies
+    headers = filter_headers(request.headers.items())
+    url = f"{route.upstream_prefix}{path}"
+    params = request.query_params.multi_items()
+
+    def build(client: httpx.AsyncClient) -> httpx.Request:
+        return client.build_request(request.method, url, params=params, content=content, headers=headers)
+
+    send = _hedged_attempt if idempotent and settings.HEDGE_ENABLED else _attempt
+    retries = settings.RETRY_MAX_ATTEMPTS if idempotent else 0
+    pool.retry_budget.deposit()
+    tried: Set[Replica] = set()
+    attempt: Optional[Attempt] = None
+    for number in range(retries + 1):
+        if attempt is not None:
+            if not pool.retry_budget.withdraw():
+                break
+            await _discard(pool, attempt)
+            attempt = None
+            UPSTREAM_RETRIES.labels(pool.name).inc()
+            await asyncio.sleep(retry_backoff(number))
+        if not pool.breaker.allow():
+            return None
+        attempt = await send(pool, build, tried)
+        if attempt.ok or attempt.overloaded:
+            break
+    return attempt
+
+
+async def proxy_request(request: Request, route: Route, pool: UpstreamPool, path: str) -> Response:
+    """
+    Send the request to a replica of ``pool`` without buffering either body.
+
+    - Admission: requests beyond the pool's adaptive concurrency limit wait
+      briefly by priority, then are shed with 503 and Retry-After.
+    - Calls fail fast with 503 while the pool's circuit is open.
+    - GET and HEAD requests that fail (connection error, timeout,
+      502/503/504) are retried on another replica after a jittered backoff,
+      within the retry budget, and may be hedged (HEDGE_ENABLED).
+    - A 503 with Retry-After (the upstream shedding load) is relayed to the
+      client untouched: no retry, no breaker or ejection penalty.
+
+    The request holds its admission slot, and counts as in flight on its
+    replica, until the response body has been relayed.
+    """
+    admission = pool.admission if settings.ADMISSION_ENABLED else None
+    if admission is not None:
+        try:
+            with tracer.span("admission"):
+                await admission.acquire(priority_for(request.method, request.url.path))
+        except Overloaded:
+            return _unavailable(pool, admission.retry_after())
+
+    try:
+        attempt = await _send(request, route, pool, path)
+    except BaseException:
+        if admission is not None:
+            admission.release(None, None)
+        raise
+
+    if attempt is None or attempt.response is None:
+        if admission is not None:
+            admission.release(attempt.duration if attempt else None, False)
+        if attempt is None:
+            return _unavailable(pool, pool.breaker.retry_after())
+        if isinstance(attempt.error, httpx.TimeoutException):
+            return JSONResponse(status_code=504, content={"detail": f"Upstream '{pool.name}' timed out"})
+        return JSONResponse(status_code=502, content={"detail": f"Upstream '{pool.name}' unavailable"})
+
+    def on_close() -> None:
+        pool.release(attempt.replica, attempt.health)
+        if admission is not None:
+            admission.release(attempt.duration, attempt.ok)
+
+    return stream_response(attempt.response, on_close=on_close)
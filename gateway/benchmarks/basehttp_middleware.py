@@ -0,0 +1,296 @@
+"""
+The gateway middlewares as they were before the plain ASGI rewrite, as
+BaseHTTPMiddleware subclasses, kept as the baseline of
+middleware_overhead.py. Same logic and order as app.middleware; only the
+way they sit in the ASGI chain differs (each layer runs the rest of the
+stack in a task and hands the response back through a memory stream).
+Not used by the gateway itself.
+"""
+import asyncio
+import time
+import uuid
+
+from starlette.datastructures import Headers
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from fastapi.responses import JSONResponse, Response
+from redis.exceptions import RedisError
+
+from app.core.auth import (
+    IDENTITY_HEADERS,
+    InvalidToken,
+    bearer_token,
+    identity_headers,
+    is_public_path,
+    token_verifier,
+)
+from app.core.cache import (
+    CachedResponse,
+    base_key,
+    compute_etag,
+    etag_matches,
+    parse_cache_control,
+    policy_for,
+    response_cache,
+)
+from app.core.config import settings
+from app.core.limiter import limiter
+from app.core.metrics import CACHE_REQUESTS, observe_request, route_label
+from app.core.registry import service_registry
+from app.core.revocation import revocation_list
+from app.core.tracing import tracer, valid_request_id
+from app.middleware import CONDITIONAL_HEADERS, NOT_MODIFIED_HEADERS, UNSAFE_METHODS
+from app.services.proxy import HOP_BY_HOP_HEADERS
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    Opens the root span of every request, continuing the client's trace
+    when it sent a valid traceparent, and makes sure the request carries an
+    X-Request-ID (the client's, or a new one) that is forwarded upstream
+    and returned on the response. Upstream calls send their own span as
+    the traceparent (see app.services.proxy).
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        scope = request.scope
+        request_id = valid_request_id(request.headers.get("x-request-id")) or uuid.uuid4().hex
+        scope["headers"] = [(k, v) for k, v in scope["headers"] if k != b"x-request-id"]
+        scope["headers"].append((b"x-request-id", request_id.encode("latin-1")))
+        span = tracer.start_trace(
+            request.method, request.headers.get("traceparent"), request_id,
+            **{"http.method": request.method, "http.path": request.url.path},
+        )
+
+        with tracer.activate(span):
+            try:
+                response = await call_next(request)
+                span.attributes["http.status_code"] = response.status_code
+            finally:
+                route = route_label(scope, service_registry.template_for)
+                span.name = f"{request.method} {route}"
+                span.attributes["http.route"] = route
+        # Replaces the ID an upstream (or a cached response) may have returned
+        response.headers["x-request-id"] = request_id
+        return response
+
+
+class MetricsMiddleware(BaseHTTPMiddleware):
+    """
+    Counts and times every request per route template (see app.core.metrics).
+    Cache hits never reach the router, so their template comes from the
+    registry's route table instead.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        started = time.perf_counter()
+        status_code = 500
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+            return response
+        finally:
+            route = route_label(request.scope, service_registry.template_for)
+            observe_request(request.method, route, status_code, time.perf_counter() - started)
+
+
+class AuthMiddleware(BaseHTTPMiddleware):
+    """
+    Verifies the Bearer token of every non-public request locally and passes
+    the identity downstream as X-User-* headers. Client-supplied identity
+    headers are always stripped so they cannot be spoofed.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        scope = request.scope
+        scope["headers"] = [(k, v) for k, v in scope["headers"] if k not in IDENTITY_HEADERS]
+        if request.method == "OPTIONS" or is_public_path(request.url.path):
+            return await call_next(request)
+
+        token = bearer_token(request.headers.get("authorization"))
+        if token is None:
+            return self._unauthorized("Not authenticated")
+        try:
+            with tracer.span("auth.verify_token"):
+                claims = await token_verifier.verify(token)
+        except InvalidToken:
+            return self._unauthorized("Invalid or expired token")
+        if revocation_list.is_revoked(claims.get("sid")):
+            return self._unauthorized("Session has been revoked")
+
+        scope["headers"].extend(identity_headers(claims))
+        scope.setdefault("state", {})["user"] = claims
+        return await call_next(request)
+
+    @staticmethod
+    def _unauthorized(detail: str) -> JSONResponse:
+        return JSONResponse(
+            status_code=401,
+            content={"detail": detail},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
+class RateLimitMiddleware(BaseHTTPMiddleware):
+    """
+    Applies the per-route policies of app.core.limiter, keyed by user once
+    AuthMiddleware has run (client IP otherwise). Every limited response
+    carries RateLimit-* headers; refused requests get 429 and Retry-After.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        if request.method == "OPTIONS":
+            return await call_next(request)
+        decision = await limiter.check(request)
+        if decision is None:
+            return await call_next(request)
+        if not decision.allowed:
+            return JSONResponse(
+                status_code=429,
+                content={"detail": f"Rate limit exceeded: {decision.limit} per {decision.window} seconds"},
+                headers=dict(decision.headers()),
+            )
+        response = await call_next(request)
+        for key, value in decision.headers():
+            response.headers[key] = value
+        return response
+
+
+class CacheMiddleware(BaseHTTPMiddleware):
+    """
+    HTTP response cache for GET requests, driven by the per-route policies
+    in app.core.cache. Keys are scoped by Authorization and Vary, entries
+    keep status/headers/body, ETags answer If-None-Match with 304, stale
+    entries are served while being refreshed, and a miss on a hot key only
+    sends one request upstream.
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        path = request.url.path
+        if request.method != "GET":
+            response = await call_next(request)
+            if request.method in UNSAFE_METHODS and response.status_code < 400:
+                try:
+                    await response_cache.invalidate(path)
+                except RedisError:
+                    pass
+            return response
+
+        policy = policy_for(path)
+        request_cc = parse_cache_control(request.headers.get("cache-control"))
+        if policy is None or "no-store" in request_cc:
+            CACHE_REQUESTS.labels("bypass").inc()
+            return await call_next(request)
+
+        key = base_key(path, request.url.query, request.headers)
+
+        async def fetch() -> CachedResponse:
+            return await self._fetch_and_store(request.scope, key, policy)
+
+        try:
+            entry = None if "no-cache" in request_cc else await response_cache.lookup(key, request.headers)
+            if entry is not None and entry.is_fresh():
+                return self._to_response(entry, request, "HIT")
+            if entry is not None and entry.is_usable():
+                response_cache.revalidate_in_background(key, fetch, request.headers)
+                return self._to_response(entry, request, "STALE")
+            entry = await response_cache.single_flight(key, fetch, request.headers)
+        except RedisError:
+            # Cache is best effort: serve from upstream when Redis is unavailable
+            CACHE_REQUESTS.labels("error").inc()
+            return await call_next(request)
+        return self._to_response(entry, request, "MISS")
+
+    async def _fetch(self, scope) -> CachedResponse:
+        """Run the downstream app directly and collect the full response."""
+        # Always ask for a full body, whatever conditional headers the client sent
+        scope = dict(scope)
+        scope["headers"] = [(k, v) for k, v in scope["headers"] if k not in CONDITIONAL_HEADERS]
+        disconnected = asyncio.Event()
+        request_sent = False
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        status_code = 500
+        raw_headers = []
+        chunks = []
+
+        async def send(message):
+            nonlocal status_code, raw_headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                raw_headers = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        await self.app(scope, receive, send)
+        headers = [(k.decode("latin-1"), v.decode("latin-1")) for k, v in raw_headers]
+        return CachedResponse(status_code=status_code, headers=headers, body=b"".join(chunks))
+
+    async def _fetch_and_store(self, scope, key, policy) -> CachedResponse:
+        entry = await self._fetch(scope)
+        response_cc = parse_cache_control(entry.header("cache-control"))
+        request_headers = Headers(scope=scope)
+
+        entry.etag = entry.header("etag")
+        if entry.etag is None and entry.status_code == 200:
+            entry.etag = compute_etag(entry.body)
+            entry.headers.append(("etag", entry.etag))
+
+        ttl = policy.ttl
+        for directive in ("s-maxage", "max-age"):
+            if response_cc.get(directive) and response_cc[directive].isdigit():
+                ttl = int(response_cc[directive])
+                break
+
+        storable = (
+            entry.status_code == 200
+            and ttl > 0
+            and len(entry.body) <= settings.CACHE_MAX_BODY_BYTES
+            and entry.header("set-cookie") is None
+            and (entry.header("vary") or "").strip() != "*"
+            and not {"no-store", "no-cache"} & response_cc.keys()
+            # "private" responses are only kept under a per-credential key
+            and ("private" not in response_cc or "authorization" in request_headers)
+        )
+        if storable:
+            entry.stored_at = time.time()
+            entry.ttl = ttl
+            entry.stale_ttl = policy.stale_while_revalidate
+            entry.headers = [
+                (k, v) for k, v in entry.headers if k.lower() not in HOP_BY_HOP_HEADERS
+            ]
+            try:
+                await response_cache.store(key, scope["path"], request_headers, entry)
+            except RedisError:
+                pass
+        return entry
+
+    @staticmethod
+    def _to_response(entry: CachedResponse, request: Request, cache_status: str) -> Response:
+        CACHE_REQUESTS.labels(cache_status.lower()).inc()
+        extra = [("x-cache", cache_status)]
+        if entry.stored_at:
+            extra.append(("age", str(int(entry.age))))
+
+        if entry.status_code == 200 and etag_matches(request.headers.get("if-none-match"), entry.etag):
+            response = Response(status_code=304)
+            headers = [(k, v) for k, v in entry.headers if k.lower() in NOT_MODIFIED_HEADERS]
+        else:
+            response = Response(content=entry.body, status_code=entry.status_code)
+            headers = [(k, v) for k, v in entry.headers if k.lower() != "content-length"]
+            headers.append(("content-length", str(len(entry.body))))
+        response.raw_headers = [
+            (k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers + extra
+        ]
+        return response
+
+
+# Outermost first, as added in app.main (CORSMiddleware, unchanged, goes around them)
+STACK = [TracingMiddleware, MetricsMiddleware, AuthMiddleware, RateLimitMiddleware, CacheMiddleware]
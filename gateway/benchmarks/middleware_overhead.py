@@ -0,0 +1,174 @@
+"""
+Per-request overhead of the gateway middleware stack.
+
+Requests are driven straight through the ASGI callables (no server, no
+sockets) against stub endpoints: without middlewares, with the
+middlewares configured in app.main, and with the same middlewares as the
+BaseHTTPMiddleware subclasses they were before the plain ASGI rewrite
+(benchmarks/basehttp_middleware.py). Overheads are measured against the
+bare app; the "before" column is the BaseHTTPMiddleware stack.
+Rate limiting is off. The cache-miss scenarios (a new query string on
+every request, so each one is looked up, fetched and stored or, over
+CACHE_MAX_BODY_BYTES, streamed through) need the Redis configured in
+app.core.config and are skipped when it is not reachable; the others
+never reach Redis.
+
+    cd gateway && python benchmarks/middleware_overhead.py [-n 5000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from jose import jwt
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.core.limiter import limiter
+from app.core.redis_client import redis_healthy
+from app.main import app as gateway_app
+from benchmarks.basehttp_middleware import STACK as BASEHTTP_STACK
+
+STREAM_CHUNK = b"x" * 64 * 1024
+STREAM_CHUNKS = 16  # 1 MiB
+LARGE_STREAM_CHUNKS = 32  # 2 MiB, over the default CACHE_MAX_BODY_BYTES
+
+
+async def small(request):
+    return PlainTextResponse("ok")
+
+
+def streamed(chunks: int):
+    async def endpoint(request):
+        async def body():
+            for _ in range(chunks):
+                yield STREAM_CHUNK
+
+        return StreamingResponse(body(), media_type="application/octet-stream")
+
+    return endpoint
+
+
+ROUTES = [
+    Route("/health/bench", small),
+    Route("/gateway/users/small", small),
+    Route("/gateway/users/stream", streamed(STREAM_CHUNKS)),
+    Route("/gateway/users/large", streamed(LARGE_STREAM_CHUNKS)),
+]
+
+
+def build_apps():
+    bare = Starlette(routes=ROUTES)
+    # Same middlewares, in the same order, as the real gateway
+    stacked = Starlette(routes=ROUTES, middleware=gateway_app.user_middleware)
+    # Same order again, with CORS outermost, but as BaseHTTPMiddleware layers
+    cors = gateway_app.user_middleware[0]
+    baseline = Starlette(routes=ROUTES, middleware=[cors, *(Middleware(cls) for cls in BASEHTTP_STACK)])
+    return bare, baseline, stacked
+
+
+def bearer() -> bytes:
+    token = jwt.encode(
+        {"sub": "bench@example.com", "user_id": 1, "exp": int(time.time()) + 3600},
+        settings.JWT_SECRET_KEY,
+        algorithm=settings.JWT_ALGORITHM,
+    )
+    return f"Bearer {token}".encode()
+
+
+def scenarios(with_redis: bool):
+    """name -> (path, headers, new query string on every request)"""
+    token = bearer()
+    no_store = [(b"authorization", token), (b"cache-control", b"no-store")]
+    cacheable = [(b"authorization", token)]
+    selected = {
+        "public GET": ("/health/bench", [], False),
+        "authenticated GET": ("/gateway/users/small", no_store, False),
+        "authenticated GET, 1 MiB streamed": ("/gateway/users/stream", no_store, False),
+    }
+    if with_redis:
+        selected["cache miss"] = ("/gateway/users/small", cacheable, True)
+        selected["cache miss, 2 MiB streamed"] = ("/gateway/users/large", cacheable, True)
+    return selected
+
+
+async def request(app, path: str, headers, query: bytes = b"") -> int:
+    """Run one GET through ``app``; returns the number of body bytes received."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query,
+        "root_path": "",
+        "headers": [(b"host", b"gateway"), *headers],
+        "client": ("127.0.0.1", 50000),
+        "server": ("gateway", 80),
+    }
+    done = asyncio.Event()
+    received = 0
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            received += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    return received
+
+
+async def measure(app, path: str, headers, n: int, unique: bool) -> float:
+    """Mean seconds per request after a warm-up."""
+    queries = (f"q={uuid.uuid4().hex}".encode() if unique else b"" for _ in range(n + min(n, 200)))
+    for _ in range(min(n, 200)):
+        await request(app, path, headers, next(queries))
+    start = time.perf_counter()
+    for _ in range(n):
+        await request(app, path, headers, next(queries))
+    return (time.perf_counter() - start) / n
+
+
+async def main(n: int) -> None:
+    limiter.enabled = False
+    with_redis = await redis_healthy()
+    bare, baseline, stacked = build_apps()
+    print(f"{n} requests per scenario, mean time per request")
+    if not with_redis:
+        print("Redis unreachable: cache-miss scenarios skipped")
+    print(f"{'':<36}{'':>12}{'overhead':>24}")
+    print(f"{'scenario':<36}{'bare':>12}{'before':>12}{'after':>12}")
+    for name, (path, headers, unique) in scenarios(with_redis).items():
+        base = await measure(bare, path, headers, n, unique)
+        before = await measure(baseline, path, headers, n, unique)
+        after = await measure(stacked, path, headers, n, unique)
+        print(
+            f"{name:<36}{base * 1e6:>10.1f}us"
+            f"{(before - base) * 1e6:>10.1f}us{(after - base) * 1e6:>10.1f}us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=5000, help="requests per scenario")
+    asyncio.run(main(parser.parse_args().n))
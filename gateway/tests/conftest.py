@@ -0,0 +1,88 @@
+# tests/conftest.py
+import asyncio
+import os
+import sys
+import time
+
+import fakeredis
+import httpx
+import pytest
+from jose import jwt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Swap the shared Redis client for an in-memory one before any module binds it
+from app.core import redis_client as redis_module
+
+fake_redis = fakeredis.FakeAsyncRedis()
+redis_module.redis_client = fake_redis
+
+from app.core.admission import AdmissionController
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.http_client import upstream_clients
+from app.core.limiter import limiter
+from app.core.registry import Replica, service_registry
+from app.core.resilience import CircuitBreaker, LatencyTracker, RetryBudget
+from app.core.revocation import revocation_list
+
+
+def make_token(**claims) -> str:
+    payload = {"sub": "user@example.com", "user_id": 1, "exp": int(time.time()) + 600, **claims}
+    return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+
+
+def auth_headers(**claims) -> dict:
+    return {"Authorization": f"Bearer {make_token(**claims)}"}
+
+
+class Upstream:
+    """Answers every replica of every pool from ``handler(request) -> httpx.Response``."""
+
+    def __init__(self):
+        self.requests = []
+        self.handler = lambda request: httpx.Response(200, json={"ok": True})
+
+    async def _dispatch(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        response = self.handler(request)
+        if asyncio.iscoroutine(response):
+            response = await response
+        # The proxy reads upstream bodies with aiter_raw(): hand them over unread
+        return httpx.Response(
+            response.status_code, headers=response.headers, stream=httpx.ByteStream(response.content)
+        )
+
+    def mount(self) -> None:
+        for pool in service_registry.pools.values():
+            for replica in pool.replicas:
+                upstream_clients._clients[replica.url] = httpx.AsyncClient(
+                    base_url=replica.url, transport=httpx.MockTransport(self._dispatch)
+                )
+
+
+def reset_pools() -> None:
+    for pool in service_registry.pools.values():
+        pool.replicas = [Replica(replica.url) for replica in pool.replicas]
+        pool.admission = AdmissionController(pool.name)
+        pool.breaker = CircuitBreaker(pool.name)
+        pool.retry_budget = RetryBudget(settings.RETRY_BUDGET_RATIO)
+        pool.latencies = LatencyTracker()
+
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    asyncio.run(fake_redis.flushall())
+    limiter.local._buckets.clear()
+    response_cache.local.clear()
+    revocation_list._revoked.clear()
+    reset_pools()
+    yield
+
+
+@pytest.fixture
+def upstream():
+    stub = Upstream()
+    stub.mount()
+    yield stub
+    upstream_clients._clients.clear()
@@ -0,0 +1,150 @@
+# tests/test_admission.py
+import asyncio
+
+import pytest
+
+from app.core.admission import CRITICAL, HIGH, LOW, NORMAL, AdaptiveLimit, AdmissionController, Overloaded, priority_for
+from app.core.config import settings
+
+
+def controller(limit: int = 1) -> AdmissionController:
+    admission = AdmissionController("test")
+    admission.limit.value = limit
+    return admission
+
+
+# ==============================================================
+# Priorities
+# ==============================================================
+def test_priority_for():
+    assert priority_for("POST", "/gateway/auth/login") == CRITICAL
+    assert priority_for("POST", "/gateway/auth/register") == HIGH
+    assert priority_for("GET", "/gateway/users/") == LOW
+    assert priority_for("GET", "/gateway/users/1") == NORMAL
+    assert priority_for("POST", "/gateway/users/") == NORMAL
+
+
+# ==============================================================
+# Adaptive limit
+# ==============================================================
+def test_failed_call_cuts_the_limit():
+    limit = AdaptiveLimit(50, 5, 500)
+    limit.record(0.01, False, 50)
+    assert limit.value == 50 * settings.ADMISSION_BACKOFF_RATIO
+
+
+def test_slow_call_cuts_the_limit_once_per_average_latency():
+    limit = AdaptiveLimit(50, 5, 500)
+    limit.record(0.1, True, 1)
+    limit.record(1.0, True, 1)
+    limit.record(1.0, True, 1)
+    assert limit.value == 50 * settings.ADMISSION_BACKOFF_RATIO
+
+
+def test_limit_grows_only_while_used():
+    limit = AdaptiveLimit(50, 5, 500)
+    limit.record(0.01, True, 1)
+    assert limit.value == 50
+
+    limit.record(0.01, True, 25)
+    assert limit.value == pytest.approx(50.02)
+
+
+def test_limit_stays_within_bounds():
+    limit = AdaptiveLimit(5, 5, 6)
+    limit.record(0.01, False, 5)
+    assert limit.value == 5
+
+    for _ in range(100):
+        limit.record(0.01, True, 6)
+    assert limit.value == 6
+
+
+# ==============================================================
+# Queue
+# ==============================================================
+def test_release_hands_the_slot_to_a_waiter():
+    admission = controller()
+
+    async def scenario():
+        await admission.acquire(NORMAL)
+        waiter = asyncio.create_task(admission.acquire(NORMAL))
+        await asyncio.sleep(0)
+        assert admission.snapshot()["queued"] == 1
+        admission.release(0.01, True)
+        await waiter
+
+    asyncio.run(scenario())
+    assert admission.snapshot()["inflight"] == 1
+    assert admission.admitted == 2
+
+
+def test_higher_priority_waiter_is_served_first():
+    admission = controller()
+    served = []
+
+    async def wait(priority):
+        await admission.acquire(priority)
+        served.append(priority)
+
+    async def scenario():
+        await admission.acquire(NORMAL)
+        tasks = [asyncio.create_task(wait(priority)) for priority in (LOW, CRITICAL, NORMAL)]
+        await asyncio.sleep(0)
+        for _ in tasks:
+            admission.release(0.01, True)
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(scenario())
+    assert served == [CRITICAL, NORMAL, LOW]
+
+
+def test_waiter_is_shed_after_the_queue_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_TIMEOUT", 0.05)
+    admission = controller()
+
+    async def scenario():
+        await admission.acquire(NORMAL)
+        await admission.acquire(NORMAL)
+
+    with pytest.raises(Overloaded):
+        asyncio.run(scenario())
+    assert admission.shed["normal"] == 1
+    assert admission.snapshot()["queued"] == 0
+
+
+def test_full_queue_evicts_a_lower_priority_waiter(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_SIZE", 1)
+    admission = controller()
+
+    async def scenario():
+        await admission.acquire(NORMAL)
+        low = asyncio.create_task(admission.acquire(LOW))
+        await asyncio.sleep(0)
+        critical = asyncio.create_task(admission.acquire(CRITICAL))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await low
+        admission.release(0.01, True)
+        await critical
+
+    asyncio.run(scenario())
+    assert admission.shed["low"] == 1
+    assert admission.snapshot()["inflight"] == 1
+
+
+def test_full_queue_refuses_an_equal_or_lower_priority(monkeypatch):
+    monkeypatch.setattr(settings, "ADMISSION_QUEUE_SIZE", 1)
+    admission = controller()
+
+    async def scenario():
+        await admission.acquire(NORMAL)
+        waiter = asyncio.create_task(admission.acquire(HIGH))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded):
+            await admission.acquire(HIGH)
+        waiter.cancel()
+
+    asyncio.run(scenario())
+    assert admission.shed == {"critical": 0, "high": 1, "normal": 0, "low": 0}
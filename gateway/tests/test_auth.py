@@ -0,0 +1,34 @@
+# tests/test_auth.py
+import asyncio
+import time
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwk, jwt
+from jose.backends.cryptography_backend import CryptographyRSAKey
+
+from app.core.auth import TokenVerifier
+from app.core.config import settings
+
+
+def test_jose_verifies_with_the_cryptography_backend():
+    # Without cryptography installed jose falls back to the slow pure-Python rsa/ecdsa backends
+    assert jwk.RSAKey is CryptographyRSAKey
+
+
+def test_rs256_token_is_verified_against_the_jwks(upstream, monkeypatch):
+    monkeypatch.setattr(settings, "JWT_ALGORITHM", "RS256")
+    private_pem = rsa.generate_private_key(public_exponent=65537, key_size=2048).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    public_jwk = {**jwk.construct(private_pem, "RS256").public_key().to_dict(), "kid": "k1"}
+    upstream.handler = lambda request: httpx.Response(200, json={"keys": [public_jwk]})
+    token = jwt.encode(
+        {"sub": "user@example.com", "exp": int(time.time()) + 600}, private_pem, algorithm="RS256", headers={"kid": "k1"}
+    )
+
+    claims = asyncio.run(TokenVerifier().verify(token))
+
+    assert claims["sub"] == "user@example.com"
+    assert upstream.requests[0].url.path == settings.JWKS_PATH
@@ -0,0 +1,283 @@
+# tests/test_cache.py
+import asyncio
+import time
+
+import httpx
+
+from conftest import auth_headers, fake_redis
+from app.core.cache import CachedResponse, ResponseCache, affected_by_write, ancestor_paths, response_cache
+from app.core.config import settings
+from app.main import app
+from app.middleware import CacheMiddleware
+
+# One token for the whole module: cached entries are keyed on the credentials
+AUTH = auth_headers()
+
+
+def cacheable(body: bytes = b'{"id": 1}', max_age: int = 30) -> httpx.Response:
+    return httpx.Response(200, headers={"cache-control": f"max-age={max_age}"}, content=body)
+
+
+def entry(body: bytes = b"ok") -> CachedResponse:
+    return CachedResponse(status_code=200, headers=[], body=body, stored_at=time.time(), ttl=30)
+
+
+async def get(path: str, **headers) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+        return await client.get(path, headers={**AUTH, **headers})
+
+
+# ==============================================================
+# Single flight
+# ==============================================================
+def test_concurrent_misses_share_one_fetch():
+    cache = ResponseCache(fake_redis)
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return entry()
+
+    async def scenario():
+        return await asyncio.gather(*(cache.single_flight("cache:k", fetch, {}) for _ in range(10)))
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result.body == b"ok" for result in results)
+
+
+def test_follower_picks_up_the_leader_entry():
+    cache = ResponseCache(fake_redis)
+
+    async def fetch():
+        raise AssertionError("the follower must not fetch")
+
+    async def scenario():
+        await fake_redis.set("lock:cache:k", "leader")
+        follower = asyncio.create_task(cache.single_flight("cache:k", fetch, {}))
+        await asyncio.sleep(0.1)
+        await cache.store("cache:k", "/gateway/users/1", {}, entry(b"from leader"))
+        return await follower
+
+    assert asyncio.run(scenario()).body == b"from leader"
+
+
+def test_follower_stops_waiting_once_the_lock_is_released():
+    cache = ResponseCache(fake_redis)
+
+    async def fetch():
+        return entry(b"own fetch")
+
+    async def scenario():
+        await fake_redis.set("lock:cache:k", "leader")
+        follower = asyncio.create_task(cache.single_flight("cache:k", fetch, {}))
+        await asyncio.sleep(0.1)
+        # The leader got a response it could not store
+        await fake_redis.delete("lock:cache:k")
+        start = time.monotonic()
+        result = await follower
+        return result, time.monotonic() - start
+
+    result, waited = asyncio.run(scenario())
+    assert result.body == b"own fetch"
+    assert waited < settings.CACHE_LOCK_WAIT / 2
+
+
+# ==============================================================
+# Invalidation scope
+# ==============================================================
+def test_ancestor_paths():
+    assert ancestor_paths("/gateway/users/1/status") == [
+        "/gateway/users/1/status", "/gateway/users/1", "/gateway/users", "/gateway",
+    ]
+    assert ancestor_paths("/gateway/users/") == ["/gateway/users", "/gateway"]
+    assert ancestor_paths("/") == ["/"]
+
+
+def test_write_affects_the_resource_its_sub_resources_and_its_collection():
+    affected = affected_by_write("/gateway/users/1")
+    assert affected("/gateway/users/1")
+    assert affected("/gateway/users/1/status")
+    assert affected("/gateway/users/")
+    assert not affected("/gateway/users/2")
+    assert not affected("/gateway/users/10")
+    assert not affected("/gateway/users/1-archive")
+
+
+LOCAL_KEYS = [
+    "cache:/gateway/users/1?|public",
+    "cache:/gateway/users/1?|public|vary",
+    "cache:/gateway/users/1/status?|public",
+    "cache:/gateway/users/?limit=20|public",
+    "cache:/gateway/users/2?|public",
+]
+
+
+def test_peer_workers_evict_the_same_entries():
+    peer = ResponseCache(fake_redis)
+
+    async def scenario():
+        peer.start()
+        await asyncio.sleep(0.05)
+        for key in LOCAL_KEYS:
+            peer.local.set(key, entry())
+        await fake_redis.publish(settings.CACHE_INVALIDATION_CHANNEL, "/gateway/users/1")
+        await asyncio.sleep(0.1)
+        await peer.stop()
+
+    asyncio.run(scenario())
+    assert list(peer.local._entries) == ["cache:/gateway/users/2?|public"]
+
+
+# ==============================================================
+# Middleware
+# ==============================================================
+def test_second_get_is_a_hit(upstream):
+    upstream.handler = lambda request: cacheable()
+
+    first = asyncio.run(get("/gateway/users/1"))
+    second = asyncio.run(get("/gateway/users/1"))
+
+    assert first.headers["x-cache"] == "MISS"
+    assert second.headers["x-cache"] == "HIT"
+    assert second.content == first.content
+    assert len(upstream.requests) == 1
+
+
+def test_matching_etag_gets_304(upstream):
+    upstream.handler = lambda request: cacheable()
+    etag = asyncio.run(get("/gateway/users/1")).headers["etag"]
+
+    response = asyncio.run(get("/gateway/users/1", **{"If-None-Match": etag}))
+
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert len(upstream.requests) == 1
+
+
+def test_stale_entry_is_served_while_revalidating(upstream, monkeypatch):
+    bodies = iter([b'{"v": 1}', b'{"v": 2}'])
+    upstream.handler = lambda request: cacheable(next(bodies), max_age=1)
+    asyncio.run(get("/gateway/users/1"))
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 5)
+
+    async def scenario():
+        stale = await get("/gateway/users/1")
+        await asyncio.gather(*response_cache._background)
+        return stale, await get("/gateway/users/1")
+
+    stale, refreshed = asyncio.run(scenario())
+    assert stale.headers["x-cache"] == "STALE"
+    assert stale.content == b'{"v": 1}'
+    assert refreshed.headers["x-cache"] == "HIT"
+    assert refreshed.content == b'{"v": 2}'
+    assert len(upstream.requests) == 2
+
+
+def test_non_cacheable_response_is_not_stored(upstream):
+    upstream.handler = lambda request: httpx.Response(200, headers={"cache-control": "no-store"}, content=b"x")
+
+    asyncio.run(get("/gateway/users/1"))
+    response = asyncio.run(get("/gateway/users/1"))
+
+    assert response.headers["x-cache"] == "MISS"
+    assert len(upstream.requests) == 2
+
+
+def test_write_invalidates_sub_resources_and_the_listing(upstream):
+    upstream.handler = lambda request: cacheable()
+    paths = ["/gateway/users/?limit=20", "/gateway/users/1/status", "/gateway/users/1", "/gateway/users/2"]
+    for path in paths:
+        asyncio.run(get(path))
+
+    async def patch():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://gateway") as client:
+            return await client.patch("/gateway/users/1", headers=AUTH, json={"city": "Berlin"})
+
+    assert asyncio.run(patch()).status_code == 200
+    # Redis must have dropped them too, not only this worker's LRU
+    response_cache.local.clear()
+
+    results = {path: asyncio.run(get(path)).headers["x-cache"] for path in paths}
+    assert results == {
+        "/gateway/users/?limit=20": "MISS",
+        "/gateway/users/1/status": "MISS",
+        "/gateway/users/1": "MISS",
+        "/gateway/users/2": "HIT",
+    }
+
+
+def test_index_sets_drop_expired_keys():
+    cache = ResponseCache(fake_redis)
+
+    async def scenario():
+        await fake_redis.zadd("cache:tree:/gateway/users", {"cache:/gateway/users/9?|public": time.time() - 1})
+        await cache.store("cache:/gateway/users/1?|public", "/gateway/users/1", {}, entry())
+        return await fake_redis.zrange("cache:tree:/gateway/users", 0, -1)
+
+    assert asyncio.run(scenario()) == [b"cache:/gateway/users/1?|public"]
+
+
+# ==============================================================
+# Bodies over CACHE_MAX_BODY_BYTES
+# ==============================================================
+def chunked_app(chunks):
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        for i, chunk in enumerate(chunks):
+            await send({"type": "http.response.body", "body": chunk, "more_body": i < len(chunks) - 1})
+
+    return app
+
+
+def fetch_through(inner, scope=None):
+    """Run CacheMiddleware._fetch over ``inner``; returns (entry, messages sent to the client)."""
+    scope = scope or {"type": "http", "method": "GET", "path": "/gateway/users/1", "headers": []}
+    sent = []
+
+    async def client_send(message):
+        sent.append(message)
+
+    return asyncio.run(CacheMiddleware(inner)._fetch(scope, client_send)), sent
+
+
+def test_body_over_the_limit_is_streamed_through(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_MAX_BODY_BYTES", 10)
+
+    entry, sent = fetch_through(chunked_app([b"abcd", b"efgh", b"ijkl", b"mnop"]))
+
+    assert entry is None
+    assert sent[0]["type"] == "http.response.start"
+    bodies = [message["body"] for message in sent[1:]]
+    # What was buffered goes out with the chunk that crossed the limit, then chunks pass through
+    assert bodies == [b"abcdefghijkl", b"mnop"]
+    assert sent[-1]["more_body"] is False
+
+
+def test_body_under_the_limit_is_buffered(monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_MAX_BODY_BYTES", 10)
+
+    entry, sent = fetch_through(chunked_app([b"abcd", b"efgh"]))
+
+    assert entry.body == b"abcdefgh"
+    assert sent == []
+
+
+def test_large_content_length_is_not_cached(upstream, monkeypatch):
+    monkeypatch.setattr(settings, "CACHE_MAX_BODY_BYTES", 10)
+    upstream.handler = lambda request: cacheable(b"x" * 100)
+
+    first = asyncio.run(get("/gateway/users/1"))
+    second = asyncio.run(get("/gateway/users/1"))
+
+    assert first.status_code == 200
+    assert first.content == b"x" * 100
+    assert second.content == b"x" * 100
+    assert len(upstream.requests) == 2
@@ -0,0 +1,117 @@
+# tests/test_limiter.py
+import asyncio
+
+from redis.exceptions import ConnectionError
+
+from conftest import fake_redis
+from app.core.limiter import LocalBuckets, RateLimitDecision, RateLimiter, RateLimitPolicy, Quota, policy_for
+
+POLICY = RateLimitPolicy("test", "/test", "3/minute")
+
+
+class DownRedis:
+    """Client whose scripts always fail, as during a Redis outage."""
+
+    def register_script(self, script):
+        async def run(**kwargs):
+            raise ConnectionError("Redis is down")
+
+        return run
+
+
+def hits(limiter: RateLimiter, count: int, identity: str = "ip:1.2.3.4"):
+    async def scenario():
+        return [await limiter.hit(POLICY, identity) for _ in range(count)]
+
+    return asyncio.run(scenario())
+
+
+# ==============================================================
+# Policies
+# ==============================================================
+def test_first_matching_policy_wins():
+    assert policy_for("POST", "/gateway/auth/login").name == "login"
+    assert policy_for("GET", "/gateway/auth/login").name == "auth"
+    assert policy_for("GET", "/gateway/users/1").name == "reads"
+    assert policy_for("DELETE", "/gateway/users/1").name == "writes"
+    assert policy_for("GET", "/health") is None
+
+
+def test_quota_from_policy():
+    quota = Quota.from_policy(RateLimitPolicy("test", "/test", "10/minute", burst=20))
+    assert (quota.limit, quota.window, quota.burst) == (10, 60, 20)
+    assert quota.interval == 6
+
+
+def test_refused_decision_carries_retry_after():
+    headers = dict(RateLimitDecision(False, 10, 0, 30.2, 5.5, 60).headers())
+    assert headers["RateLimit-Reset"] == "31"
+    assert headers["RateLimit-Policy"] == "10;w=60"
+    assert headers["Retry-After"] == "6"
+    assert "Retry-After" not in dict(RateLimitDecision(True, 10, 9, 6, 0, 60).headers())
+
+
+# ==============================================================
+# GCRA
+# ==============================================================
+def test_burst_is_allowed_then_refused():
+    decisions = hits(RateLimiter(fake_redis), 4)
+
+    assert [decision.allowed for decision in decisions] == [True, True, True, False]
+    assert [decision.remaining for decision in decisions] == [2, 1, 0, 0]
+    assert 0 < decisions[-1].retry_after <= 20
+
+
+def test_identities_are_limited_separately():
+    limiter = RateLimiter(fake_redis)
+    hits(limiter, 3, "ip:1.1.1.1")
+
+    assert hits(limiter, 1, "ip:2.2.2.2")[0].allowed
+
+
+def test_quota_is_shared_between_workers():
+    first, second = RateLimiter(fake_redis), RateLimiter(fake_redis)
+    hits(first, 3)
+
+    refused = hits(second, 1)[0]
+
+    assert not refused.allowed
+    assert refused.retry_after > 0
+
+
+def test_identity_refused_by_redis_is_then_refused_locally():
+    first, second = RateLimiter(fake_redis), RateLimiter(fake_redis)
+    hits(first, 3)
+    hits(second, 1)
+    bucket = next(iter(second.local._buckets.values()))
+    assert bucket.blocked_until > 0
+
+    async def scenario():
+        await fake_redis.flushall()
+        return await second.hit(POLICY, "ip:1.2.3.4")
+
+    # Redis would accept again, but the worker does not even ask it
+    assert not asyncio.run(scenario()).allowed
+    assert asyncio.run(fake_redis.keys("ratelimit:*")) == []
+
+
+# ==============================================================
+# Local buckets
+# ==============================================================
+def test_local_bucket_refuses_without_redis():
+    assert [decision.allowed for decision in hits(RateLimiter(DownRedis()), 4)] == [True, True, True, False]
+
+
+def test_redis_outage_fails_open():
+    decision = hits(RateLimiter(DownRedis()), 1)[0]
+    assert decision.allowed
+    assert decision.remaining == 2
+
+
+def test_local_buckets_are_bounded():
+    buckets = LocalBuckets(max_entries=2)
+    quota = Quota.from_policy(POLICY)
+    for key in ("a", "b", "a", "c"):
+        buckets.get(key, quota, 0.0)
+    assert len(buckets) == 2
+    assert list(buckets._buckets) == ["a", "c"]
@@ -0,0 +1,78 @@
+# tests/test_middleware.py
+import httpx
+from fastapi.testclient import TestClient
+
+from conftest import auth_headers
+from app.main import app
+
+client = TestClient(app)
+ORIGIN = {"Origin": "http://localhost:4200"}
+
+
+def test_unauthorized_response_carries_cors_headers():
+    response = client.get("/gateway/users/1", headers=ORIGIN)
+    assert response.status_code == 401
+    assert response.headers["access-control-allow-origin"] == "http://localhost:4200"
+    assert response.headers["access-control-allow-credentials"] == "true"
+
+
+def test_rate_limited_response_carries_cors_headers(upstream):
+    statuses = [client.post("/gateway/auth/login", headers=ORIGIN).status_code for _ in range(10)]
+    assert statuses[-1] == 429
+    response = client.post("/gateway/auth/login", headers=ORIGIN)
+    assert response.status_code == 429
+    assert response.headers["access-control-allow-origin"] == "http://localhost:4200"
+    assert "retry-after" in response.headers
+
+
+def test_preflight_is_answered_without_a_token():
+    response = client.options(
+        "/gateway/users/1", headers={**ORIGIN, "Access-Control-Request-Method": "GET"}
+    )
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == "http://localhost:4200"
+
+
+def test_authenticated_request_reaches_upstream_with_identity(upstream):
+    response = client.get("/gateway/users/1", headers={**auth_headers(), **ORIGIN})
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == "http://localhost:4200"
+    forwarded = upstream.requests[-1]
+    assert forwarded.url.path == "/users/1"
+    assert forwarded.headers["x-user-sub"] == "user@example.com"
+
+
+def test_client_identity_headers_are_not_trusted(upstream):
+    client.get("/gateway/users/1", headers={**auth_headers(), "X-User-Sub": "admin@example.com"})
+    assert upstream.requests[-1].headers.get_list("x-user-sub") == ["user@example.com"]
+
+
+def test_invalid_token_is_refused():
+    response = client.get("/gateway/users/1", headers={"Authorization": "Bearer not-a-jwt"})
+    assert response.status_code == 401
+    assert response.headers["www-authenticate"] == "Bearer"
+
+
+def test_request_id_is_forwarded_and_echoed(upstream):
+    upstream.handler = lambda request: httpx.Response(200, headers={"X-Request-ID": "from-upstream"})
+
+    response = client.get("/gateway/users/1", headers={**auth_headers(), "X-Request-ID": "abc-123"})
+
+    assert upstream.requests[-1].headers["x-request-id"] == "abc-123"
+    assert response.headers["x-request-id"] == "abc-123"
+
+
+def test_request_id_is_generated_when_missing_or_invalid():
+    response = client.get("/health", headers={"X-Request-ID": "bad id\twith spaces"})
+    assert response.headers["x-request-id"] != "bad id\twith spaces"
+    assert len(response.headers["x-request-id"]) == 32
+
+
+def test_limited_response_carries_rate_limit_headers(upstream):
+    first = client.get("/gateway/users/1", headers={**auth_headers(), "Cache-Control": "no-store"})
+    second = client.get("/gateway/users/1", headers={**auth_headers(), "Cache-Control": "no-store"})
+
+    assert first.headers["ratelimit-limit"] == "300"
+    assert first.headers["ratelimit-policy"] == "300;w=60"
+    assert int(second.headers["ratelimit-remaining"]) == int(first.headers["ratelimit-remaining"]) - 1
+    assert "retry-after" not in second.headers
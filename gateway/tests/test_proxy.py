@@ -0,0 +1,56 @@
+# tests/test_proxy.py
+import httpx
+from fastapi.testclient import TestClient
+
+from conftest import auth_headers
+from app.core.registry import service_registry
+from app.main import app
+
+client = TestClient(app)
+
+
+def users_pool():
+    return service_registry.pool("users")
+
+
+def test_overload_503_is_relayed_without_retry_or_penalty(upstream):
+    upstream.handler = lambda request: httpx.Response(503, headers={"Retry-After": "3"}, json={"detail": "busy"})
+
+    response = client.get("/gateway/users/1", headers={**auth_headers(), "Cache-Control": "no-store"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "3"
+    assert response.json() == {"detail": "busy"}
+    assert len(upstream.requests) == 1
+    pool = users_pool()
+    assert pool.breaker.snapshot()["failures"] == 0
+    assert all(replica.consecutive_failures == 0 and replica.failures == 0 for replica in pool.replicas)
+    assert all(replica.outstanding == 0 for replica in pool.replicas)
+
+
+def test_overload_503_never_ejects_a_replica(upstream):
+    upstream.handler = lambda request: httpx.Response(503, headers={"Retry-After": "1"})
+
+    for _ in range(20):
+        client.get("/gateway/users/1", headers={**auth_headers(), "Cache-Control": "no-store"})
+
+    assert all(replica.ejections == 0 for replica in users_pool().replicas)
+
+
+def test_plain_503_is_retried_and_counted(upstream):
+    upstream.handler = lambda request: httpx.Response(503)
+
+    response = client.get("/gateway/users/1", headers={**auth_headers(), "Cache-Control": "no-store"})
+
+    assert response.status_code == 503
+    assert len(upstream.requests) > 1
+    assert users_pool().breaker.snapshot()["failures"] == len(upstream.requests)
+
+
+def test_post_is_not_retried(upstream):
+    upstream.handler = lambda request: httpx.Response(502)
+
+    response = client.post("/gateway/users/", headers=auth_headers(), json={"name": "x"})
+
+    assert response.status_code == 502
+    assert len(upstream.requests) == 1
@@ -0,0 +1,155 @@
+# tests/test_registry.py
+import asyncio
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.core.http_client import upstream_clients
+from app.core.registry import Replica, UpstreamPool, service_registry
+
+URLS = ["http://replica-a", "http://replica-b", "http://replica-c"]
+
+
+def eject(replica: Replica) -> None:
+    for _ in range(settings.EJECT_CONSECUTIVE_FAILURES):
+        replica.record(False)
+
+
+# ==============================================================
+# Replicas
+# ==============================================================
+def test_replica_is_ejected_after_consecutive_failures():
+    replica = Replica("http://replica-a")
+    for _ in range(settings.EJECT_CONSECUTIVE_FAILURES - 1):
+        replica.record(False)
+    assert replica.available(time.monotonic())
+
+    replica.record(False)
+
+    assert not replica.available(time.monotonic())
+    assert replica.ejected_until - time.monotonic() > settings.EJECT_BASE_SECONDS - 1
+
+
+def test_success_resets_the_failure_streak():
+    replica = Replica("http://replica-a")
+    for _ in range(settings.EJECT_CONSECUTIVE_FAILURES - 1):
+        replica.record(False)
+    replica.record(True)
+    replica.record(False)
+    assert replica.ejections == 0
+    assert replica.available(time.monotonic())
+
+
+def test_repeated_ejection_lasts_longer():
+    replica = Replica("http://replica-a")
+    eject(replica)
+    replica.ejected_until = 0.0
+    eject(replica)
+    assert replica.ejected_until - time.monotonic() > 2 * settings.EJECT_BASE_SECONDS - 1
+
+
+def test_health_checks_mark_a_replica_down_then_up():
+    replica = Replica("http://replica-a")
+    for _ in range(settings.HEALTH_CHECK_UNHEALTHY_THRESHOLD):
+        replica.record_check(False)
+    assert not replica.healthy
+
+    for _ in range(settings.HEALTH_CHECK_HEALTHY_THRESHOLD - 1):
+        replica.record_check(True)
+    assert not replica.healthy
+    replica.record_check(True)
+    assert replica.healthy
+
+
+# ==============================================================
+# Pool
+# ==============================================================
+def test_choose_avoids_replicas_already_tried():
+    pool = UpstreamPool("test", URLS)
+    a, b, c = pool.replicas
+    for _ in range(20):
+        assert pool.choose(exclude={a, b}) is c
+
+
+def test_choose_avoids_ejected_replicas():
+    pool = UpstreamPool("test", URLS)
+    a, b, c = pool.replicas
+    eject(a)
+    b.healthy = False
+    for _ in range(20):
+        assert pool.choose() is c
+
+
+def test_choose_falls_back_to_every_replica_in_panic_mode():
+    pool = UpstreamPool("test", URLS[:2])
+    for replica in pool.replicas:
+        eject(replica)
+    assert {pool.choose() for _ in range(50)} == set(pool.replicas)
+
+
+def test_choose_prefers_the_least_busy_replica():
+    pool = UpstreamPool("test", URLS[:2])
+    a, b = pool.replicas
+    a.outstanding = 3
+    for _ in range(20):
+        assert pool.choose() is b
+
+
+def test_overload_answer_is_not_held_against_the_replica():
+    pool = UpstreamPool("test", URLS[:1])
+    replica = pool.replicas[0]
+    answers = iter([
+        httpx.Response(503, headers={"Retry-After": "1"}),
+        httpx.Response(503),
+    ])
+    upstream_clients._clients[replica.url] = httpx.AsyncClient(
+        base_url=replica.url, transport=httpx.MockTransport(lambda request: next(answers))
+    )
+
+    async def scenario():
+        await pool.request("GET", "/jwks")
+        assert (replica.requests, replica.failures) == (0, 0)
+        await pool.request("GET", "/jwks")
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        upstream_clients._clients.clear()
+    assert (replica.requests, replica.failures, replica.outstanding) == (1, 1, 0)
+
+
+def test_active_checks_mark_failing_replicas_down():
+    pool = UpstreamPool("test", URLS[:2])
+    a, b = pool.replicas
+
+    def handler(request):
+        if request.url.host == "replica-a":
+            return httpx.Response(200)
+        raise httpx.ConnectError("refused", request=request)
+
+    for replica in pool.replicas:
+        upstream_clients._clients[replica.url] = httpx.AsyncClient(
+            base_url=replica.url, transport=httpx.MockTransport(handler)
+        )
+
+    async def scenario():
+        for _ in range(settings.HEALTH_CHECK_UNHEALTHY_THRESHOLD):
+            await pool.check()
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        upstream_clients._clients.clear()
+    assert a.healthy
+    assert not b.healthy
+    assert pool.snapshot()["available"] == 1
+
+
+# ==============================================================
+# Routes
+# ==============================================================
+def test_template_for():
+    assert service_registry.template_for("/gateway/users/1") == "/gateway/users/{path:path}"
+    assert service_registry.template_for("/gateway/auth/login") == "/gateway/auth/{path:path}"
+    assert service_registry.template_for("/elsewhere") is None
@@ -0,0 +1,206 @@
+# tests/test_resilience.py
+import asyncio
+import time
+
+import httpx
+
+from app.core.config import settings
+from app.core.http_client import upstream_clients
+from app.core.registry import UpstreamPool
+from app.core.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, LatencyTracker, RetryBudget, is_overload
+from app.services.proxy import _hedged_attempt
+
+
+def open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test")
+    for _ in range(settings.BREAKER_MIN_REQUESTS):
+        breaker.record(False, 0.01)
+    return breaker
+
+
+# ==============================================================
+# Circuit breaker
+# ==============================================================
+def test_breaker_stays_closed_below_the_minimum_calls():
+    breaker = CircuitBreaker("test")
+    for _ in range(settings.BREAKER_MIN_REQUESTS - 1):
+        breaker.record(False, 0.01)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_opens_at_the_error_rate():
+    breaker = open_breaker()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.snapshot()["rejected"] == 1
+
+
+def test_breaker_opens_on_slow_calls():
+    breaker = CircuitBreaker("test")
+    for _ in range(settings.BREAKER_MIN_REQUESTS):
+        breaker.record(True, settings.BREAKER_SLOW_CALL_SECONDS)
+    assert breaker.state == OPEN
+
+
+def test_half_open_breaker_closes_after_successful_probes(monkeypatch):
+    breaker = open_breaker()
+    monkeypatch.setattr(settings, "BREAKER_OPEN_SECONDS", 0)
+
+    probes = [breaker.allow() for _ in range(settings.BREAKER_HALF_OPEN_REQUESTS + 1)]
+    assert breaker.state == HALF_OPEN
+    assert probes == [True] * settings.BREAKER_HALF_OPEN_REQUESTS + [False]
+
+    for _ in range(settings.BREAKER_HALF_OPEN_REQUESTS):
+        breaker.record(True, 0.01)
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_opens_the_breaker_again(monkeypatch):
+    breaker = open_breaker()
+    monkeypatch.setattr(settings, "BREAKER_OPEN_SECONDS", 0)
+    assert breaker.allow()
+
+    breaker.record(False, 0.01)
+
+    assert breaker.state == OPEN
+    assert breaker.times_opened == 2
+
+
+def test_abandoned_probe_frees_its_slot(monkeypatch):
+    breaker = open_breaker()
+    monkeypatch.setattr(settings, "BREAKER_OPEN_SECONDS", 0)
+    for _ in range(settings.BREAKER_HALF_OPEN_REQUESTS):
+        assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.abandon()
+
+    assert breaker.allow()
+
+
+# ==============================================================
+# Retries
+# ==============================================================
+def test_retry_budget_is_capped_and_refilled_by_regular_traffic():
+    budget = RetryBudget(0.5, min_tokens=2)
+    assert budget.withdraw()
+    assert budget.withdraw()
+    assert not budget.withdraw()
+
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+
+    for _ in range(100):
+        budget.deposit()
+    assert budget.tokens == 2
+
+
+def test_only_a_503_with_retry_after_is_an_overload():
+    assert is_overload(httpx.Response(503, headers={"Retry-After": "1"}))
+    assert not is_overload(httpx.Response(503))
+    assert not is_overload(httpx.Response(429, headers={"Retry-After": "1"}))
+
+
+def test_latency_p95_needs_enough_samples(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_MIN_SAMPLES", 100)
+    tracker = LatencyTracker()
+    for ms in range(1, 100):
+        tracker.add(ms / 1000)
+    assert tracker.p95() is None
+
+    tracker.add(0.1)
+    assert tracker.p95() == 0.095
+
+
+# ==============================================================
+# Hedging
+# ==============================================================
+def hedged_pool(delays):
+    """Pool of two replicas; the n-th call waits delays[n] seconds before answering."""
+    pool = UpstreamPool("hedge", ["http://replica-a", "http://replica-b"])
+    calls = []
+
+    async def handler(request):
+        delay = delays[len(calls)]
+        calls.append(request)
+        await asyncio.sleep(delay)
+        return httpx.Response(200, text=str(delay))
+
+    for replica in pool.replicas:
+        upstream_clients._clients[replica.url] = httpx.AsyncClient(
+            base_url=replica.url, transport=httpx.MockTransport(handler)
+        )
+    return pool, calls
+
+
+def run_hedged(pool):
+    async def scenario():
+        start = time.monotonic()
+        attempt = await _hedged_attempt(pool, lambda client: client.build_request("GET", "/users/1"), set())
+        elapsed = time.monotonic() - start
+        await attempt.response.aread()
+        await attempt.response.aclose()
+        pool.release(attempt.replica, ok=attempt.ok)
+        return attempt, elapsed
+
+    try:
+        return asyncio.run(scenario())
+    finally:
+        upstream_clients._clients.clear()
+
+
+def test_slow_call_is_hedged_to_another_replica(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_MIN_SAMPLES", 10)
+    pool, calls = hedged_pool([0.5, 0.0])
+    for _ in range(10):
+        pool.latencies.add(0.01)
+
+    attempt, elapsed = run_hedged(pool)
+
+    assert attempt.response.text == "0.0"
+    assert elapsed < 0.4
+    assert len(calls) == 2
+    assert {request.url.host for request in calls} == {"replica-a", "replica-b"}
+    assert pool.retry_budget.tokens == 9
+    # The cancelled call is neither in flight nor counted against its replica
+    assert all(replica.outstanding == 0 and replica.failures == 0 for replica in pool.replicas)
+
+
+def test_no_hedge_without_latency_samples():
+    pool, calls = hedged_pool([0.05, 0.0])
+
+    attempt, _ = run_hedged(pool)
+
+    assert attempt.response.text == "0.05"
+    assert len(calls) == 1
+
+
+def test_no_hedge_without_retry_budget(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_MIN_SAMPLES", 10)
+    pool, calls = hedged_pool([0.1, 0.0])
+    for _ in range(10):
+        pool.latencies.add(0.01)
+    pool.retry_budget.tokens = 0
+
+    attempt, _ = run_hedged(pool)
+
+    assert attempt.response.text == "0.1"
+    assert len(calls) == 1
+
+
+def test_hedge_refused_by_the_breaker_keeps_the_budget(monkeypatch):
+    monkeypatch.setattr(settings, "HEDGE_MIN_SAMPLES", 10)
+    pool, calls = hedged_pool([0.1, 0.0])
+    for _ in range(10):
+        pool.latencies.add(0.01)
+    # e.g. the half-open probe slots are all taken
+    monkeypatch.setattr(pool.breaker, "allow", lambda: False)
+
+    attempt, _ = run_hedged(pool)
+
+    assert attempt.response.text == "0.1"
+    assert len(calls) == 1
+    assert pool.retry_budget.tokens == 10
@@ -0,0 +1,52 @@
+# tests/test_revocation.py
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from conftest import auth_headers, fake_redis
+from app.core.revocation import REVOKED_PREFIX, RevocationList, revocation_list
+from app.main import app
+
+client = TestClient(app)
+
+
+def test_revoked_session_until_it_expires():
+    revoked = RevocationList(fake_redis)
+    revoked.add("sid-1", time.time() + 60)
+    revoked.add("sid-2", time.time() - 1)
+
+    assert revoked.is_revoked("sid-1")
+    assert not revoked.is_revoked("sid-2")
+    assert not revoked.is_revoked("sid-3")
+    assert not revoked.is_revoked(None)
+    # Expired entries are dropped when seen
+    assert len(revoked) == 1
+
+
+def test_load_reads_the_denylist_written_by_the_auth_service():
+    revoked = RevocationList(fake_redis)
+    expires_at = time.time() + 60
+
+    async def scenario():
+        for i in range(1200):
+            await fake_redis.set(f"{REVOKED_PREFIX}sid-{i}", expires_at, ex=60)
+        await fake_redis.set("auth:session:sid-x", "not a revocation")
+        await revoked.load()
+
+    asyncio.run(scenario())
+    assert len(revoked) == 1200
+    assert revoked.is_revoked("sid-1199")
+    assert not revoked.is_revoked("sid-x")
+
+
+def test_revoked_token_is_refused_by_the_gateway(upstream):
+    revocation_list.add("revoked-sid", time.time() + 60)
+
+    refused = client.get("/gateway/users/1", headers=auth_headers(sid="revoked-sid"))
+    accepted = client.get("/gateway/users/1", headers=auth_headers(sid="live-sid"))
+
+    assert refused.status_code == 401
+    assert refused.json() == {"detail": "Session has been revoked"}
+    assert accepted.status_code == 200
+    assert len(upstream.requests) == 1
@@ -0,0 +1,90 @@
+# tests/test_tracing.py
+import asyncio
+import json
+import os
+import threading
+
+from fastapi.testclient import TestClient
+
+from conftest import auth_headers
+from app.core.spans import FileExporter, Span
+from app.main import app
+
+client = TestClient(app)
+GATEWAY = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def span(name: str = "test") -> Span:
+    return Span(name, "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7", None, True)
+
+
+def read_spans(path) -> list:
+    return [json.loads(line)["name"] for line in path.read_text().splitlines()]
+
+
+# ==============================================================
+# Propagation
+# ==============================================================
+def test_traceparent_reaches_the_upstream_without_an_exporter(upstream):
+    client.get("/gateway/users/1", headers={
+        **auth_headers(), "Cache-Control": "no-store",
+        "traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01",
+    })
+
+    traceparent = upstream.requests[-1].headers["traceparent"]
+    assert traceparent.startswith("00-4bf92f3577b34da6a3ce929d0e0e4736-")
+    assert traceparent.endswith("-01")
+
+
+# ==============================================================
+# File exporter
+# ==============================================================
+def test_file_exporter_writes_off_the_event_loop(tmp_path):
+    exporter = FileExporter("gateway", str(tmp_path / "spans.log"))
+    writers = []
+    flush = exporter.flush
+
+    def recording_flush():
+        writers.append(threading.get_ident())
+        flush()
+
+    exporter.flush = recording_flush
+
+    async def scenario():
+        exporter.export(span("a"))
+        exporter.export(span("b"))
+        # Only buffered so far
+        assert not (tmp_path / "spans.log").exists()
+        await asyncio.sleep(0.1)
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(scenario())
+    assert read_spans(tmp_path / "spans.log") == ["a", "b"]
+    assert writers and loop_thread not in writers
+
+
+def test_file_exporter_writes_at_once_without_a_loop(tmp_path):
+    exporter = FileExporter("gateway", str(tmp_path / "spans.log"))
+    exporter.export(span("a"))
+    assert read_spans(tmp_path / "spans.log") == ["a"]
+
+
+def test_file_exporter_buffer_is_bounded(tmp_path):
+    exporter = FileExporter("gateway", str(tmp_path / "spans.log"), max_buffered=2)
+
+    async def scenario():
+        for name in "abc":
+            exporter.export(span(name))
+        exporter.flush()
+
+    asyncio.run(scenario())
+    assert read_spans(tmp_path / "spans.log") == ["a", "b"]
+    assert exporter.dropped == 1
+
+
+def test_spans_module_is_the_same_as_the_services():
+    with open(os.path.join(GATEWAY, "app", "core", "spans.py"), encoding="utf-8") as f:
+        ours = f.read()
+    for service in ("authService", "userService"):
+        with open(os.path.join(GATEWAY, "..", "services", service, "app", "spans.py"), encoding="utf-8") as f:
+            assert f.read() == ours, service
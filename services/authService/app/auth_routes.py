@@ -1,50 +1,67 @@
 # app/routes/auth_router.py (ou où tu définis tes routes)
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.contoller.user_controller import get_user_by_email, create_user, generate_token_for_user, authenticate_user, \
-    set_reset_token
-from app.db.database import get_db
-from app.schemas import UserCreate, UserLogin, TokenResponse, ForgotPasswordRequest
-from sqlalchemy.exc import SQLAlchemyError
+from app.contoller.user_controller import create_user, generate_tokens_for_user, authenticate_user, \
+    refresh_session, revoke_session, reset_password, InvalidSession, InvalidResetToken
+from app.db.database import get_db, get_lazy_db
+from app.hashing import HashingOverloaded
+from app.jobs import QueueFull
+from app.schemas import UserCreate, UserLogin, TokenResponse, ForgotPasswordRequest, RefreshRequest, \
+    ResetPasswordRequest
+from app.tasks import PASSWORD_RESET, get_job_runner
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeout
 
 auth_router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
+def _server_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
 @auth_router.post("/register", response_model=TokenResponse)
-def register(request: UserCreate, db: Session = Depends(get_db)):
+async def register(request: UserCreate, db: AsyncSession = Depends(get_lazy_db)):
     try:
         email = str(request.email).strip().lower()
-        if get_user_by_email(db, email):
-            raise HTTPException(status_code=400, detail="Email already registered")
-
-        user = create_user(db, email, request.password)
-        token = generate_token_for_user(user)
-        return TokenResponse(access_token=token)
+        user = await create_user(db, email, request.password)
+        access_token, refresh_token = await generate_tokens_for_user(user)
+        return TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
     except ValueError as ve:
         raise HTTPException(status_code=400, detail=str(ve))
+    except HashingOverloaded:
+        raise _server_busy()
+    except PoolTimeout:
+        raise
     except SQLAlchemyError as se:
         print("SQLAlchemyError:", se)
         raise HTTPException(status_code=500, detail="Database error")
 
 
 @auth_router.post("/login", response_model=TokenResponse)
-def login(request: UserLogin, db: Session = Depends(get_db)):
+async def login(request: UserLogin, db: AsyncSession = Depends(get_db)):
     try:
         email = str(request.email).strip().lower()
-        user = authenticate_user(db, email, request.password)
+        user = await authenticate_user(db, email, request.password)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid credentials"
             )
 
-        token = generate_token_for_user(user)
-        return TokenResponse(access_token=token)
+        access_token, refresh_token = await generate_tokens_for_user(user)
+        return TokenResponse(access_token=access_token, refresh_token=refresh_token)
 
     except HTTPException:
         raise
+    except HashingOverloaded:
+        raise _server_busy()
+    except PoolTimeout:
+        raise
     except SQLAlchemyError:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -58,20 +75,52 @@ def login(request: UserLogin, db: Session = Depends(get_db)):
         )
 
 
+@auth_router.post("/refresh", response_model=TokenResponse)
+async def refresh(request: RefreshRequest):
+    # No password check and no DB access: the session store decides
+    try:
+        access_token, refresh_token = await refresh_session(request.refresh_token)
+        return TokenResponse(access_token=access_token, refresh_token=refresh_token)
+    except InvalidSession as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+
+
+@auth_router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(request: RefreshRequest):
+    try:
+        await revoke_session(request.refresh_token)
+    except InvalidSession as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+
+
 @auth_router.post("/forgot-password")
-def forgot_password(request: ForgotPasswordRequest, db: Session = Depends(get_db)):
+async def forgot_password(request: ForgotPasswordRequest):
+    # Lookup, token and mail all happen in a background job: the response is the
+    # same, in the same time, whether the account exists or not (no user enumeration)
     try:
         email = str(request.email).strip().lower()
-        token = set_reset_token(db, email)
-        if not token:
-            # Pas d'indication si user n'existe pas — on renvoie un message générique
-            # pour éviter le user enumeration; si tu veux informer, return 200 sans token.
-            return {"message": "If an account with this email exists, a reset link has been sent."}
-        # Ici normalement envoie d'email asynchrone (celery, background task)
-        # On ne doit PAS renvoyer le token dans la réponse en prod.
-        # Pour le dev on peut renvoyer : token (mais attention en prod)
-        return {"message": "Password reset link sent (development)", "reset_token": token}
-    except SQLAlchemyError:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
-    except Exception:
+        await get_job_runner().enqueue(PASSWORD_RESET, {"email": email})
+    except QueueFull:
+        raise _server_busy()
+    except Exception as e:
+        print("Unexpected error:", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal server error")
+    return {"message": "If an account with this email exists, a reset link has been sent."}
+
+
+@auth_router.post("/reset-password")
+async def reset_password_route(request: ResetPasswordRequest, db: AsyncSession = Depends(get_lazy_db)):
+    try:
+        await reset_password(db, request.token, request.new_password)
+    except InvalidResetToken:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid or expired reset token")
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except HashingOverloaded:
+        raise _server_busy()
+    except PoolTimeout:
+        raise
+    except SQLAlchemyError as se:
+        print("SQLAlchemyError:", se)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database error")
+    return {"message": "Password has been reset."}
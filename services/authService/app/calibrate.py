@@ -0,0 +1,63 @@
+# app/calibrate.py
+"""
+Pick Argon2 parameters that hit a target time per hash on this machine.
+
+    python -m app.calibrate --target-ms 250 --parallelism 4 --max-memory-mib 256
+
+Memory is preferred over iterations (it is what makes GPU attacks costly):
+starting from the largest allowed memory, memory is halved until a single
+pass fits the budget, then time_cost is raised as long as the median hash
+time stays under the target. The result is printed as env variables.
+"""
+import argparse
+import statistics
+import time
+
+from argon2 import PasswordHasher
+
+MIN_MEMORY_KIB = 19456  # OWASP minimum for argon2id
+
+
+def measure_ms(time_cost: int, memory_cost: int, parallelism: int, samples: int = 3) -> float:
+    hasher = PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+    durations = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.hash("calibration-password")
+        durations.append((time.perf_counter() - started) * 1000)
+    return statistics.median(durations)
+
+
+def calibrate(target_ms: float, parallelism: int, max_memory_kib: int, max_time_cost: int = 10) -> dict:
+    memory_cost = max_memory_kib
+    elapsed = measure_ms(1, memory_cost, parallelism)
+    while elapsed > target_ms and memory_cost // 2 >= MIN_MEMORY_KIB:
+        memory_cost //= 2
+        elapsed = measure_ms(1, memory_cost, parallelism)
+
+    time_cost = 1
+    while time_cost < max_time_cost:
+        candidate = measure_ms(time_cost + 1, memory_cost, parallelism)
+        if candidate > target_ms:
+            break
+        time_cost, elapsed = time_cost + 1, candidate
+
+    return {"time_cost": time_cost, "memory_cost": memory_cost, "parallelism": parallelism, "ms": round(elapsed, 1)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=250.0, help="wanted duration of one hash")
+    parser.add_argument("--parallelism", type=int, default=4)
+    parser.add_argument("--max-memory-mib", type=int, default=256)
+    args = parser.parse_args()
+
+    result = calibrate(args.target_ms, args.parallelism, args.max_memory_mib * 1024)
+    print(f"# {result['ms']} ms/hash (target {args.target_ms} ms)")
+    print(f"ARGON2_TIME_COST={result['time_cost']}")
+    print(f"ARGON2_MEMORY_COST={result['memory_cost']}")
+    print(f"ARGON2_PARALLELISM={result['parallelism']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,7 +14,66 @@ class DevConfig(Config):
     SECRET_KEY: str = os.getenv("DEV_SECRET_KEY", "dev-secret-key")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     DATABASE_URL: str = os.getenv("DEV_DATABASE_URL", "sqlite:///./auth.db")
+    # Connection pool (ignored for in-memory SQLite, which shares one connection)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 5))  # seconds to wait for a connection before 503
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds; -1 keeps connections forever
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    SQLITE_WAL: bool = os.getenv("SQLITE_WAL", "true").lower() == "true"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 7))
+    # Session / revocation store: Redis when set, in-process memory otherwise (dev, tests)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    REVOCATION_CHANNEL: str = os.getenv("REVOCATION_CHANNEL", "auth:revoked")
+    # Transactional outbox relayed to a Redis stream (needs REDIS_URL)
+    OUTBOX_STREAM: str = os.getenv("OUTBOX_STREAM", "auth:events")
+    OUTBOX_STREAM_MAXLEN: int = int(os.getenv("OUTBOX_STREAM_MAXLEN", 100000))
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+    OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))  # seconds
+    OUTBOX_RETENTION_HOURS: int = int(os.getenv("OUTBOX_RETENTION_HOURS", 24))  # published rows kept this long
+    # Background jobs (password-reset mails...): durable Redis queue or in-process queue
+    JOBS_BACKEND: str = os.getenv("JOBS_BACKEND", "redis" if os.getenv("REDIS_URL") else "memory")
+    JOBS_QUEUE_KEY: str = os.getenv("JOBS_QUEUE_KEY", "auth:jobs")
+    JOBS_CONSUMER: str = os.getenv("JOBS_CONSUMER", socket.gethostname())
+    JOBS_QUEUE_SIZE: int = int(os.getenv("JOBS_QUEUE_SIZE", 10000))  # queued jobs before answering 503
+    JOBS_WORKERS: int = int(os.getenv("JOBS_WORKERS", 4))
+    JOBS_BATCH_SIZE: int = int(os.getenv("JOBS_BATCH_SIZE", 20))
+    JOBS_MAX_ATTEMPTS: int = int(os.getenv("JOBS_MAX_ATTEMPTS", 5))
+    JOBS_RETRY_BASE_DELAY: float = float(os.getenv("JOBS_RETRY_BASE_DELAY", 2.0))  # seconds, doubled per attempt
+    # Mail: "console", "file" (JSON lines in MAIL_FILE_PATH) or "smtp"
+    MAIL_TRANSPORT: str = os.getenv("MAIL_TRANSPORT", "console")
+    MAIL_FROM: str = os.getenv("MAIL_FROM", "no-reply@objectifbildung.local")
+    MAIL_FILE_PATH: str = os.getenv("MAIL_FILE_PATH", "./mail.log")
+    SMTP_HOST: str = os.getenv("SMTP_HOST", "localhost")
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", 587))
+    SMTP_USERNAME: str = os.getenv("SMTP_USERNAME", "")
+    SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD", "")
+    SMTP_STARTTLS: bool = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+    SMTP_TIMEOUT: float = float(os.getenv("SMTP_TIMEOUT", 10))
+    PASSWORD_RESET_URL: str = os.getenv("PASSWORD_RESET_URL", "http://localhost:3000/reset-password?token={token}")
+    RESET_TOKEN_EXPIRE_HOURS: int = int(os.getenv("RESET_TOKEN_EXPIRE_HOURS", 1))
+    # Expired reset tokens are deleted every RESET_TOKEN_SWEEP_INTERVAL seconds, in chunks of RESET_TOKEN_SWEEP_CHUNK rows
+    RESET_TOKEN_SWEEP_INTERVAL: int = int(os.getenv("RESET_TOKEN_SWEEP_INTERVAL", 600))
+    RESET_TOKEN_SWEEP_CHUNK: int = int(os.getenv("RESET_TOKEN_SWEEP_CHUNK", 1000))
+    # Asymmetric signing (ALGORITHM=RS256/ES256...): one PEM per key, named <kid>.pem.
+    # Every key in the directory is published in the JWKS; JWT_ACTIVE_KID signs new tokens.
+    JWT_KEYS_DIR: str = os.getenv("JWT_KEYS_DIR", "./keys")
+    JWT_ACTIVE_KID: str = os.getenv("JWT_ACTIVE_KID", "")
+    # Password hashing pool: argon2 runs on dedicated threads (it releases the GIL)
+    HASH_WORKERS: int = int(os.getenv("HASH_WORKERS", os.cpu_count() or 2))
+    HASH_MAX_QUEUE: int = int(os.getenv("HASH_MAX_QUEUE", 32))  # waiting jobs before answering 503
+    # Argon2 cost: a named profile (see security.ARGON2_PROFILES), each value overridable.
+    # Run `python -m app.calibrate` to pick values for the target hardware.
+    ARGON2_PROFILE: str = os.getenv("ARGON2_PROFILE", "default")
+    ARGON2_TIME_COST: str = os.getenv("ARGON2_TIME_COST", "")
+    ARGON2_MEMORY_COST: str = os.getenv("ARGON2_MEMORY_COST", "")  # KiB
+    ARGON2_PARALLELISM: str = os.getenv("ARGON2_PARALLELISM", "")
+    # Tracing: spans exported to "console", "file" (JSON lines in TRACE_FILE_PATH) or nowhere ("none").
+    # Traces started here are kept with probability TRACE_SAMPLE_RATIO; incoming traceparents decide for themselves.
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "none")
+    TRACE_FILE_PATH: str = os.getenv("TRACE_FILE_PATH", "./traces.log")
+    TRACE_SAMPLE_RATIO: float = float(os.getenv("TRACE_SAMPLE_RATIO", 1.0))
 
 
 dev_config = DevConfig()
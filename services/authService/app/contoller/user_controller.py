@@ -1,64 +1,178 @@
 # app/controllers/user_controller.py
-from sqlalchemy.orm import Session
+import secrets
+from jose import JWTError
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import models
-from app.security import hash_password, verify_password, create_access_token, generate_reset_token, check_password_policy
-from typing import Optional
+from app.hashing import password_hasher
+from app.outbox import USER_REGISTERED, add_event, get_outbox_relay
+from app.security import create_access_token, create_refresh_token, verify_token, generate_reset_token, \
+    check_password_policy, hash_reset_token
+from app.sessions import get_session_store
+from typing import Optional, Tuple
 from datetime import datetime, timedelta
 from app.config import dev_config as settings
 
-def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
-    return db.query(models.User).filter(models.User.email == email).first()
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[models.User]:
+    result = await db.execute(select(models.User).where(models.User.email == email))
+    return result.scalars().first()
 
-def create_user(db: Session, email: str, password: str) -> models.User:
+async def create_user(db: AsyncSession, email: str, password: str) -> models.User:
     # validation de base
     ok, msg = check_password_policy(password)
     if not ok:
         raise ValueError(msg)
 
-    if get_user_by_email(db, email):
+    # argon2 runs on the hashing pool, off the event loop; nothing has touched
+    # the session yet, so no connection is held while it runs
+    hashed = await password_hasher.hash(password)
+
+    # One INSERT ... RETURNING; the unique index on email detects duplicates.
+    # The UserRegistered event commits (or not) together with the user.
+    stmt = insert(models.User).values(email=email, hashed_password=hashed).returning(models.User)
+    try:
+        user = (await db.execute(stmt)).scalar_one()
+        await add_event(db, USER_REGISTERED, {"auth_id": str(user.id), "email": user.email})
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
         raise ValueError("Email already registered")
+    except Exception:
+        await db.rollback()
+        raise
 
-    hashed = hash_password(password)
-    user = models.User(email=email, hashed_password=hashed)
+    relay = get_outbox_relay()
+    if relay is not None:
+        relay.notify()
+    return user
 
+async def _update_password_hash(db: AsyncSession, user: models.User, new_hash: str) -> None:
+    user.hashed_password = new_hash
     try:
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-        return user
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[models.User]:
-    user = get_user_by_email(db, email)
+async def _release_connection(db: AsyncSession) -> None:
+    # End the read transaction so the pooled connection is not held through an
+    # argon2 call (expire_on_commit=False: loaded objects stay readable)
+    await db.commit()
+
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[models.User]:
+    user = await get_user_by_email(db, email)
+    await _release_connection(db)
     if not user:
         return None
-    # verify_password returns boolean safely
-    if not verify_password(password, user.hashed_password):
+    # verify returns boolean safely
+    ok, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not ok:
         return None
+    if new_hash:
+        # Stored hash uses other Argon2 parameters than the current profile: upgrade (or downgrade) it
+        await _update_password_hash(db, user, new_hash)
     return user
 
-def generate_token_for_user(user: models.User) -> str:
-    # charge utile minimale (sub = email)
-    payload = {"sub": user.email}
-    return create_access_token(payload)
+class InvalidSession(Exception):
+    pass
+
+def _refresh_ttl() -> int:
+    return settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+
+def _access_ttl() -> int:
+    return settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+def _token_pair(sub: str, sid: str, jti: str) -> Tuple[str, str]:
+    # charge utile minimale (sub = email) + session id, checked by the gateway denylist
+    access = create_access_token({"sub": sub, "sid": sid})
+    refresh = create_refresh_token({"sub": sub, "sid": sid, "jti": jti})
+    return access, refresh
+
+async def generate_tokens_for_user(user: models.User) -> Tuple[str, str]:
+    """Open a new session and return its (access, refresh) tokens."""
+    sid, jti = secrets.token_urlsafe(16), secrets.token_urlsafe(16)
+    await get_session_store().create(sid, jti, _refresh_ttl())
+    return _token_pair(user.email, sid, jti)
+
+def _refresh_claims(refresh_token: str) -> dict:
+    try:
+        claims = verify_token(refresh_token)
+    except JWTError:
+        raise InvalidSession("Invalid refresh token")
+    if claims.get("type") != "refresh" or not claims.get("sid") or not claims.get("jti"):
+        raise InvalidSession("Invalid refresh token")
+    return claims
+
+async def refresh_session(refresh_token: str) -> Tuple[str, str]:
+    """
+    Rotate a refresh token: the presented token is consumed and a new pair is
+    issued. Presenting an already-rotated token means it leaked, so the whole
+    session is revoked.
+    """
+    claims = _refresh_claims(refresh_token)
+    store = get_session_store()
+    new_jti = secrets.token_urlsafe(16)
+    if not await store.rotate(claims["sid"], claims["jti"], new_jti, _refresh_ttl()):
+        if await store.exists(claims["sid"]):
+            await store.revoke(claims["sid"], _access_ttl())
+        raise InvalidSession("Refresh token is no longer valid")
+    return _token_pair(claims["sub"], claims["sid"], new_jti)
+
+async def revoke_session(refresh_token: str) -> None:
+    claims = _refresh_claims(refresh_token)
+    await get_session_store().revoke(claims["sid"], _access_ttl())
 
-def set_reset_token(db: Session, email: str) -> Optional[str]:
-    user = get_user_by_email(db, email)
+class InvalidResetToken(Exception):
+    pass
+
+async def set_reset_token(db: AsyncSession, email: str) -> Optional[str]:
+    """Issue a reset token for the user, replacing any previous one; only its digest is stored."""
+    user = await get_user_by_email(db, email)
     if not user:
         return None
     token = generate_reset_token()
-    # define expiration time (ex: 1 heure)
-    expires = datetime.utcnow() + timedelta(hours=getattr(settings, "RESET_TOKEN_EXPIRE_HOURS", 1))
-    # check if field exist
-    user.reset_token = token
-    user.reset_token_expires = expires
+    expires = datetime.utcnow() + timedelta(hours=settings.RESET_TOKEN_EXPIRE_HOURS)
     try:
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.execute(delete(models.PasswordResetToken).where(models.PasswordResetToken.user_id == user.id))
+        await db.execute(
+            insert(models.PasswordResetToken).values(
+                token_hash=hash_reset_token(token), user_id=user.id, expires_at=expires
+            )
+        )
+        await db.commit()
         return token
     except Exception:
-        db.rollback()
+        await db.rollback()
+        raise
+
+async def reset_password(db: AsyncSession, token: str, new_password: str) -> None:
+    ok, msg = check_password_policy(new_password)
+    if not ok:
+        raise ValueError(msg)
+
+    token_hash = hash_reset_token(token)
+    valid = (
+        (models.PasswordResetToken.token_hash == token_hash)
+        & (models.PasswordResetToken.expires_at > datetime.utcnow())
+    )
+    # Cheap indexed check first, so an unknown token never costs an argon2 hash
+    found = (await db.execute(select(models.PasswordResetToken.id).where(valid))).first()
+    await _release_connection(db)
+    if found is None:
+        raise InvalidResetToken()
+
+    hashed = await password_hasher.hash(new_password)
+    try:
+        # DELETE ... RETURNING consumes the token: of two concurrent resets only one gets a row
+        consumed = await db.execute(
+            delete(models.PasswordResetToken).where(valid).returning(models.PasswordResetToken.user_id)
+        )
+        user_id = consumed.scalar()
+        if user_id is None:
+            raise InvalidResetToken()
+        await db.execute(update(models.User).where(models.User.id == user_id).values(hashed_password=hashed))
+        await db.commit()
+    except Exception:
+        await db.rollback()
         raise
@@ -1,21 +1,69 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 
 from app.config import dev_config
+from app.db.pool import PoolStats, enable_sqlite_wal, engine_options, instrument, is_sqlite
+from app.metrics import register_snapshot
+from app.tracing import trace_queries
+
+# Sync URLs from the config are mapped to their async driver
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_database_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
 
-SQLALCHEMY_DATABASE_URL = dev_config.DATABASE_URL
+SQLALCHEMY_DATABASE_URL = async_database_url(dev_config.DATABASE_URL)
 
-connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+pool_stats = PoolStats()
+instrument(engine, pool_stats)
+trace_queries(engine)
+register_snapshot("db_pool", lambda: pool_stats.snapshot(engine.pool), ("in_use", "pool_size", "idle", "overflow"))
+if is_sqlite(SQLALCHEMY_DATABASE_URL) and dev_config.SQLITE_WAL:
+    enable_sqlite_wal(engine)
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: returned objects stay readable without a lazy (sync) reload
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 
+async def init_models():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
 # dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
+        # Check the connection out up front so the pool wait is measured and
+        # an exhausted pool surfaces as PoolTimeout before the handler runs
+        start = time.perf_counter()
+        try:
+            await db.connection()
+        except PoolTimeout:
+            pool_stats.record_timeout()
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
         yield db
-    finally:
-        db.close()
+
+
+# For routes that hash a password: the connection is only checked out on the
+# first query, so it is not held while waiting for the hashing pool
+async def get_lazy_db():
+    async with SessionLocal() as db:
+        try:
+            yield db
+        except PoolTimeout:
+            pool_stats.record_timeout()
+            raise
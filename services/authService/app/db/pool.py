@@ -0,0 +1,114 @@
+# app/db/pool.py
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import StaticPool
+
+from app.config import dev_config as settings
+from app.metrics import DB_POOL_TIMEOUTS, DB_POOL_WAIT
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url: str) -> dict:
+    """Pool arguments for create_async_engine, taken from the config."""
+    if is_sqlite(url) and make_url(url).database in (None, "", ":memory:"):
+        # An in-memory database only exists on its connection: share a single one
+        return {"poolclass": StaticPool}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+class PoolStats:
+    """
+    Connection pool gauges fed by pool event listeners (in use, peak,
+    connects, invalidations) and by get_db for the checkout wait and the
+    checkouts that timed out because the pool was exhausted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.in_use = 0
+        self.peak_in_use = 0
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def on_connect(self, *args) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, *args) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def on_checkin(self, *args) -> None:
+        with self._lock:
+            self.in_use = max(0, self.in_use - 1)
+
+    def on_invalidate(self, *args) -> None:
+        with self._lock:
+            self.invalidated += 1
+
+    def record_wait(self, wait: float) -> None:
+        DB_POOL_WAIT.observe(wait)
+        with self._lock:
+            self.waits += 1
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def record_timeout(self) -> None:
+        DB_POOL_TIMEOUTS.inc()
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool=None) -> dict:
+        with self._lock:
+            waits = self.waits or 1
+            data = {
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "invalidated": self.invalidated,
+                "timeouts": self.timeouts,
+                "avg_checkout_wait_ms": round(self.total_wait_seconds / waits * 1000, 2),
+                "max_checkout_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            }
+        if pool is not None and hasattr(pool, "size"):
+            data.update(pool_size=pool.size(), idle=pool.checkedin(), overflow=pool.overflow())
+        return data
+
+
+def instrument(engine, stats: PoolStats) -> None:
+    target = engine.sync_engine
+    event.listen(target, "connect", stats.on_connect)
+    event.listen(target, "checkout", stats.on_checkout)
+    event.listen(target, "checkin", stats.on_checkin)
+    event.listen(target, "invalidate", stats.on_invalidate)
+
+
+def enable_sqlite_wal(engine) -> None:
+    """WAL lets readers run alongside the single writer; busy_timeout waits for the lock instead of failing."""
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.DB_POOL_TIMEOUT * 1000)}")
+        cursor.close()
@@ -0,0 +1,139 @@
+# app/hashing.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prometheus_client import Counter, Histogram
+
+from app.config import dev_config as settings
+from app.metrics import WAIT_BUCKETS, register_snapshot
+from app.security import hash_password, verify_and_update_password, verify_password
+from app.tracing import tracer
+
+# Seconds
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.5, 1.0, 2.5)
+
+PASSWORD_HASH_DURATION = Histogram(
+    "password_hash_duration_seconds", "Argon2 time per operation", ["operation"], buckets=HASH_BUCKETS
+)
+PASSWORD_HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds", "Time a hashing job waited for a worker thread", buckets=WAIT_BUCKETS
+)
+PASSWORD_HASH_REJECTED = Counter(
+    "password_hash_rejected_total", "Hashing jobs refused because the queue was full"
+)
+
+
+class HashingOverloaded(Exception):
+    """Raised when the hashing queue is full; the caller should answer 503."""
+
+
+class HashingStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+        self.rejected = 0
+        self.total_hash_seconds = 0.0
+        self.max_hash_seconds = 0.0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, operation: str, wait: float, duration: float) -> None:
+        PASSWORD_HASH_DURATION.labels(operation).observe(duration)
+        PASSWORD_HASH_QUEUE_WAIT.observe(wait)
+        with self._lock:
+            self.count += 1
+            self.total_hash_seconds += duration
+            self.max_hash_seconds = max(self.max_hash_seconds, duration)
+            self.total_wait_seconds += wait
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def reject(self) -> None:
+        PASSWORD_HASH_REJECTED.inc()
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            count = self.count or 1
+            return {
+                "count": self.count,
+                "rejected": self.rejected,
+                "avg_hash_ms": round(self.total_hash_seconds / count * 1000, 2),
+                "max_hash_ms": round(self.max_hash_seconds * 1000, 2),
+                "avg_queue_wait_ms": round(self.total_wait_seconds / count * 1000, 2),
+                "max_queue_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            }
+
+
+class PasswordHasherPool:
+    """
+    Runs Argon2 hash/verify on a dedicated, fixed-size thread pool so the
+    event loop and Starlette's shared threadpool are never tied up by it.
+    argon2-cffi releases the GIL while hashing, so threads run in parallel.
+    At most ``workers + max_queue`` jobs are accepted at once; beyond that
+    HashingOverloaded is raised immediately instead of queueing.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.stats = HashingStats()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _release(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def _run(self, fn, *args, operation: str = "other"):
+        with tracer.span(f"password.{operation}") as span:
+            with self._lock:
+                if self._in_flight >= self.workers + self.max_queue:
+                    self.stats.reject()
+                    raise HashingOverloaded("Password hashing queue is full")
+                self._in_flight += 1
+
+            submitted = time.perf_counter()
+
+            def job():
+                started = time.perf_counter()
+                result = fn(*args)
+                return result, started - submitted, time.perf_counter() - started
+
+            try:
+                future = self._executor.submit(job)
+            except BaseException:
+                self._release()
+                raise
+            # Released when the job is really over: a cancelled caller does not
+            # stop a hash that already started, and the slot stays taken until it ends
+            future.add_done_callback(lambda _: self._release())
+            result, wait, duration = await asyncio.wrap_future(future)
+            self.stats.record(operation, wait, duration)
+            if span is not None:
+                span.attributes.update({"hash.queue_wait_ms": round(wait * 1000, 3),
+                                        "hash.duration_ms": round(duration * 1000, 3)})
+            return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password, operation="hash")
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password, operation="verify")
+
+    async def verify_and_update(self, plain_password: str, hashed_password: str):
+        return await self._run(verify_and_update_password, plain_password, hashed_password, operation="verify")
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasherPool(settings.HASH_WORKERS, settings.HASH_MAX_QUEUE)
+register_snapshot("password_hash", lambda: {"in_flight": password_hasher.in_flight}, ("in_flight",))
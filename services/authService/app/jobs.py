@@ -0,0 +1,230 @@
+# app/jobs.py
+import asyncio
+import json
+import random
+import secrets
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+
+class QueueFull(Exception):
+    """Raised when a job cannot be accepted; the caller should answer 503."""
+
+
+@dataclass
+class Job:
+    kind: str
+    payload: dict
+    attempts: int = 0
+    id: str = field(default_factory=lambda: secrets.token_hex(8))
+    # Serialized form the job was read as (Redis queue), needed to acknowledge it
+    raw: Optional[bytes] = field(default=None, repr=False, compare=False)
+
+    def dumps(self) -> str:
+        data = asdict(self)
+        del data["raw"]
+        return json.dumps(data)
+
+    @classmethod
+    def loads(cls, raw) -> "Job":
+        return cls(**json.loads(raw), raw=raw)
+
+
+# A handler receives a batch of jobs of its kind and returns the ones that failed
+Handler = Callable[[List[Job]], Awaitable[List[Job]]]
+
+
+class MemoryJobQueue:
+    """In-process queue: fast, but jobs still queued are lost when the process stops."""
+
+    def __init__(self, maxsize: int):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._delayed: set = set()
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    async def put(self, job: Job) -> None:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFull()
+
+    async def get_batch(self, size: int, timeout: float) -> List[Job]:
+        try:
+            batch = [await asyncio.wait_for(self._queue.get(), timeout)]
+        except asyncio.TimeoutError:
+            return []
+        while len(batch) < size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def ack(self, jobs: List[Job]) -> None:
+        pass
+
+    async def retry(self, job: Job, delay: float) -> None:
+        async def later():
+            await asyncio.sleep(delay)
+            try:
+                await self.put(job)
+            except QueueFull:
+                await self.dead(job)
+
+        task = asyncio.create_task(later())
+        self._delayed.add(task)
+        task.add_done_callback(self._delayed.discard)
+
+    async def dead(self, job: Job) -> None:
+        print(f"Job {job.kind}:{job.id} dropped after {job.attempts} attempts")
+
+
+# Bounded LPUSH: the length check and the push run as one atomic step
+_PUT = """
+if redis.call('llen', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('lpush', KEYS[1], ARGV[1])
+return 1
+"""
+
+
+class RedisJobQueue:
+    """
+    Durable queue shared by every worker. Jobs wait in ``<key>:ready`` and are
+    moved atomically to ``<key>:processing:<consumer>`` while handled, so a
+    crashed worker's jobs are put back on restart. Retries wait in the
+    ``<key>:delayed`` sorted set (score = due time); exhausted jobs end up
+    in ``<key>:dead``.
+    """
+
+    def __init__(self, redis_client, key: str, consumer: str, maxsize: int):
+        self.redis = redis_client
+        self.key = key
+        self.maxsize = maxsize
+        self.ready = f"{key}:ready"
+        self.processing = f"{key}:processing:{consumer}"
+        self.delayed = f"{key}:delayed"
+        self.dead_letter = f"{key}:dead"
+        self._put = redis_client.register_script(_PUT)
+
+    async def recover(self) -> None:
+        while await self.redis.lmove(self.processing, self.ready, "RIGHT", "LEFT"):
+            pass
+
+    async def put(self, job: Job) -> None:
+        if not await self._put(keys=[self.ready], args=[job.dumps(), self.maxsize]):
+            raise QueueFull()
+
+    async def _promote_due(self) -> None:
+        due = await self.redis.zrangebyscore(self.delayed, 0, time.time(), start=0, num=100)
+        for raw in due:
+            # zrem decides which worker promotes the job
+            if await self.redis.zrem(self.delayed, raw):
+                await self.redis.lpush(self.ready, raw)
+
+    async def get_batch(self, size: int, timeout: float) -> List[Job]:
+        await self._promote_due()
+        raw = await self.redis.blmove(self.ready, self.processing, timeout, "RIGHT", "LEFT")
+        if raw is None:
+            return []
+        batch = [raw]
+        while len(batch) < size:
+            raw = await self.redis.lmove(self.ready, self.processing, "RIGHT", "LEFT")
+            if raw is None:
+                break
+            batch.append(raw)
+        return [Job.loads(item) for item in batch]
+
+    async def ack(self, jobs: List[Job]) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        for job in jobs:
+            pipe.lrem(self.processing, 1, job.raw)
+        await pipe.execute()
+
+    async def retry(self, job: Job, delay: float) -> None:
+        await self.redis.zadd(self.delayed, {job.dumps(): time.time() + delay})
+
+    async def dead(self, job: Job) -> None:
+        await self.redis.lpush(self.dead_letter, job.dumps())
+
+
+class JobRunner:
+    """
+    Worker pool for background jobs. Each worker takes up to ``batch_size``
+    jobs at once and hands them to the handler of their kind in a single
+    call (e.g. one SMTP connection for many mails). Failed jobs are retried
+    with exponential backoff and jitter, up to ``max_attempts``.
+    """
+
+    def __init__(self, queue, handlers: Dict[str, Handler], workers: int, batch_size: int,
+                 max_attempts: int, retry_base_delay: float):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self._tasks: List[asyncio.Task] = []
+
+    async def enqueue(self, kind: str, payload: dict) -> None:
+        if kind not in self.handlers:
+            raise ValueError(f"No handler for job kind {kind!r}")
+        await self.queue.put(Job(kind=kind, payload=payload))
+
+    def backoff(self, attempts: int) -> float:
+        return self.retry_base_delay * (2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+
+    async def process(self, jobs: List[Job]) -> None:
+        by_kind: Dict[str, List[Job]] = {}
+        for job in jobs:
+            by_kind.setdefault(job.kind, []).append(job)
+
+        failed: List[Job] = []
+        for kind, batch in by_kind.items():
+            handler = self.handlers.get(kind)
+            if handler is None:
+                failed.extend(batch)
+                continue
+            try:
+                failed.extend(await handler(batch))
+            except Exception as e:
+                print(f"Job handler {kind!r} failed for {len(batch)} job(s): {e}")
+                failed.extend(batch)
+
+        for job in failed:
+            job.attempts += 1
+            if job.attempts >= self.max_attempts:
+                await self.queue.dead(job)
+            else:
+                await self.queue.retry(job, self.backoff(job.attempts))
+        await self.queue.ack(jobs)
+
+    async def _work(self) -> None:
+        backoff = 0.5
+        while True:
+            try:
+                jobs = await self.queue.get_batch(self.batch_size, timeout=1)
+                if jobs:
+                    await self.process(jobs)
+                backoff = 0.5
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Job worker error, retrying in {backoff:.1f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        recover = getattr(self.queue, "recover", None)
+        if recover is not None:
+            await recover()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,87 @@
+# app/keys.py
+import glob
+import os
+import secrets
+from typing import Dict, Optional, Tuple
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
+from jose import jwk
+
+from app.config import dev_config as settings
+
+
+def is_asymmetric(algorithm: str) -> bool:
+    return not algorithm.upper().startswith("HS")
+
+
+def _generate_private_pem(algorithm: str) -> bytes:
+    if algorithm.upper().startswith("ES"):
+        curves = {"ES256": ec.SECP256R1(), "ES384": ec.SECP384R1(), "ES512": ec.SECP521R1()}
+        key = ec.generate_private_key(curves[algorithm.upper()])
+    else:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+
+
+class KeyRing:
+    """
+    Signing keys for asymmetric JWTs.
+    Private keys sign (the active one only), every key verifies and is
+    published in the JWKS. A retired key can be kept as a public-only PEM
+    until the tokens it signed have expired, so rotation does not log anyone out.
+    """
+
+    def __init__(self, algorithm: str, keys_dir: Optional[str] = None, active_kid: Optional[str] = None):
+        self.algorithm = algorithm
+        self._private: Dict[str, str] = {}
+        self._public: Dict[str, dict] = {}
+
+        for path in sorted(glob.glob(os.path.join(keys_dir or "", "*.pem"))):
+            kid = os.path.splitext(os.path.basename(path))[0]
+            with open(path, "rb") as f:
+                self.add_key(kid, f.read())
+
+        if not self._private:
+            # Development fallback: tokens will not survive a restart
+            print(f"No private key found in {keys_dir!r}, generating an ephemeral {algorithm} key")
+            self.add_key(f"ephemeral-{secrets.token_hex(4)}", _generate_private_pem(algorithm))
+
+        self.active_kid = active_kid or sorted(self._private)[-1]
+        if self.active_kid not in self._private:
+            raise ValueError(f"Active key '{self.active_kid}' has no private key")
+
+    def add_key(self, kid: str, pem: bytes) -> None:
+        try:
+            serialization.load_pem_private_key(pem, password=None)
+            self._private[kid] = pem.decode()
+        except (ValueError, TypeError):
+            pass  # public key only: verify but never sign
+        public = jwk.construct(pem, self.algorithm).public_key().to_dict()
+        public.update({"kid": kid, "use": "sig", "alg": self.algorithm})
+        self._public[kid] = public
+
+    def signing_key(self) -> Tuple[str, str]:
+        return self.active_kid, self._private[self.active_kid]
+
+    def verification_key(self, kid: Optional[str]) -> dict:
+        if kid not in self._public:
+            raise KeyError(f"Unknown key id '{kid}'")
+        return self._public[kid]
+
+    def jwks(self) -> dict:
+        return {"keys": list(self._public.values())}
+
+
+_key_ring: Optional[KeyRing] = None
+
+
+def get_key_ring() -> KeyRing:
+    global _key_ring
+    if _key_ring is None:
+        _key_ring = KeyRing(settings.ALGORITHM, settings.JWT_KEYS_DIR, settings.JWT_ACTIVE_KID or None)
+    return _key_ring
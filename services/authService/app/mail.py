@@ -0,0 +1,86 @@
+# app/mail.py
+import asyncio
+import json
+import smtplib
+from dataclasses import asdict, dataclass
+from email.message import EmailMessage
+from typing import List
+
+from app.config import dev_config as settings
+
+
+@dataclass
+class MailMessage:
+    to: str
+    subject: str
+    body: str
+
+
+class ConsoleTransport:
+    """Prints mails to stdout (development)."""
+
+    async def send_many(self, messages: List[MailMessage]) -> None:
+        for message in messages:
+            print(f"--- mail to {message.to}: {message.subject}\n{message.body}\n---")
+
+
+class FileTransport:
+    """Appends mails as JSON lines to a file (tests, local runs)."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, messages: List[MailMessage]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for message in messages:
+                f.write(json.dumps(asdict(message)) + "\n")
+
+    async def send_many(self, messages: List[MailMessage]) -> None:
+        await asyncio.to_thread(self._write, messages)
+
+
+class SMTPTransport:
+    """Sends a whole batch over a single SMTP connection, off the event loop."""
+
+    def __init__(self, host: str, port: int, username: str, password: str, starttls: bool, sender: str,
+                 timeout: float):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.sender = sender
+        self.timeout = timeout
+
+    def _send(self, messages: List[MailMessage]) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            for message in messages:
+                mail = EmailMessage()
+                mail["From"] = self.sender
+                mail["To"] = message.to
+                mail["Subject"] = message.subject
+                mail.set_content(message.body)
+                smtp.send_message(mail)
+
+    async def send_many(self, messages: List[MailMessage]) -> None:
+        await asyncio.to_thread(self._send, messages)
+
+
+def get_mail_transport():
+    if settings.MAIL_TRANSPORT == "smtp":
+        return SMTPTransport(
+            settings.SMTP_HOST,
+            settings.SMTP_PORT,
+            settings.SMTP_USERNAME,
+            settings.SMTP_PASSWORD,
+            settings.SMTP_STARTTLS,
+            settings.MAIL_FROM,
+            settings.SMTP_TIMEOUT,
+        )
+    if settings.MAIL_TRANSPORT == "file":
+        return FileTransport(settings.MAIL_FILE_PATH)
+    return ConsoleTransport()
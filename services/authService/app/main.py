@@ -1,8 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeout
 
 from app.auth_routes import auth_router
 from app.config import dev_config
-from app.db.database import Base, engine
+from app.db.database import engine, init_models, pool_stats
+from app.hashing import password_hasher
+from app.keys import get_key_ring, is_asymmetric
+from app.metrics import MetricsMiddleware, metrics_response
+from app.outbox import get_outbox_relay
+from app.sweeper import reset_token_sweeper
+from app.tasks import get_job_runner
+from app.tracing import TracingMiddleware, tracer
 
 
 def create_app() -> FastAPI:
@@ -11,13 +20,78 @@ def create_app() -> FastAPI:
         version=dev_config.VERSION,
         description="Authentication microservice for ObjectifBildung"
     )
-    Base.metadata.create_all(bind=engine)
+    auth_app.add_middleware(TracingMiddleware)
+    auth_app.add_middleware(MetricsMiddleware)
     auth_app.include_router(auth_router)
 
+    @auth_app.on_event("startup")
+    async def create_tables():
+        await init_models()
+
+    @auth_app.on_event("startup")
+    async def start_outbox_relay():
+        relay = get_outbox_relay()
+        if relay is not None:
+            relay.start()
+
+    @auth_app.on_event("startup")
+    async def start_job_workers():
+        await get_job_runner().start()
+
+    @auth_app.on_event("shutdown")
+    async def stop_job_workers():
+        await get_job_runner().stop()
+
+    @auth_app.on_event("startup")
+    async def start_reset_token_sweeper():
+        reset_token_sweeper.start()
+
+    @auth_app.on_event("shutdown")
+    async def stop_reset_token_sweeper():
+        await reset_token_sweeper.stop()
+
+    @auth_app.on_event("shutdown")
+    async def stop_outbox_relay():
+        relay = get_outbox_relay()
+        if relay is not None:
+            await relay.stop()
+
+    @auth_app.on_event("shutdown")
+    def flush_spans():
+        tracer.flush()
+
+    @auth_app.exception_handler(PoolTimeout)
+    async def pool_exhausted(request: Request, exc: PoolTimeout):
+        # Every connection is busy: ask the client to retry instead of failing with a 500
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": "Database busy, please retry"},
+            headers={"Retry-After": "1"},
+        )
+
     @auth_app.get("/health")
     def health():
         return {"status": "ok"}
 
+    @auth_app.get("/health/hashing")
+    def hashing_health():
+        return {"in_flight": password_hasher.in_flight, **password_hasher.stats.snapshot()}
+
+    @auth_app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return metrics_response()
+
+    @auth_app.get("/health/db")
+    def db_health():
+        return pool_stats.snapshot(engine.pool)
+
+    @auth_app.get("/.well-known/jwks.json")
+    def jwks():
+        # Public keys only; nothing is published for shared-secret (HS*) signing
+        if not is_asymmetric(dev_config.ALGORITHM):
+            return {"keys": []}
+        return get_key_ring().jwks()
+
     return auth_app
 
 
@@ -0,0 +1,140 @@
+# app/outbox.py
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import dev_config as settings
+from app.db import models
+from app.db.database import SessionLocal
+
+USER_REGISTERED = "UserRegistered"
+
+
+async def add_event(db: AsyncSession, event_type: str, payload: dict) -> None:
+    """Queue an event in the caller's transaction; it is published only if that transaction commits."""
+    await db.execute(
+        insert(models.OutboxEvent).values(
+            event_type=event_type,
+            payload=json.dumps(payload),
+            created_at=datetime.utcnow(),
+        )
+    )
+
+
+class RedisStreamPublisher:
+    def __init__(self, url: str, stream: str, maxlen: int):
+        import redis.asyncio as redis
+
+        self.redis = redis.Redis.from_url(url)
+        self.stream = stream
+        self.maxlen = maxlen
+
+    async def publish(self, events: List[models.OutboxEvent]) -> None:
+        # The outbox id travels with the event so consumers can deduplicate redeliveries
+        pipe = self.redis.pipeline(transaction=False)
+        for event in events:
+            fields = {"id": event.id, "type": event.event_type, "payload": event.payload}
+            pipe.xadd(self.stream, fields, maxlen=self.maxlen, approximate=True)
+        await pipe.execute()
+
+
+class OutboxRelay:
+    """
+    Publishes committed outbox events in id order, in batches, then marks
+    them published. Delivery is at-least-once: if the process dies between
+    publishing and marking, the batch is sent again, so consumers must be
+    idempotent. On PostgreSQL, rows are locked with SKIP LOCKED so several
+    relays can run side by side. Published rows are purged after
+    OUTBOX_RETENTION_HOURS.
+    """
+
+    def __init__(self, session_factory, publisher, batch_size: int, poll_interval: float):
+        self.session_factory = session_factory
+        self.publisher = publisher
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """Called after a commit that added events, so they go out without waiting for the next poll."""
+        self._wakeup.set()
+
+    async def run_once(self) -> int:
+        async with self.session_factory() as db:
+            stmt = (
+                select(models.OutboxEvent)
+                .where(models.OutboxEvent.published_at.is_(None))
+                .order_by(models.OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            events = list((await db.execute(stmt)).scalars())
+            if not events:
+                return 0
+            await self.publisher.publish(events)
+            await db.execute(
+                update(models.OutboxEvent)
+                .where(models.OutboxEvent.id.in_([event.id for event in events]))
+                .values(published_at=datetime.utcnow())
+            )
+            await db.commit()
+            return len(events)
+
+    async def purge(self) -> None:
+        cutoff = datetime.utcnow() - timedelta(hours=settings.OUTBOX_RETENTION_HOURS)
+        async with self.session_factory() as db:
+            await db.execute(delete(models.OutboxEvent).where(models.OutboxEvent.published_at < cutoff))
+            await db.commit()
+
+    async def _run(self) -> None:
+        backoff = self.poll_interval
+        last_purge = datetime.utcnow()
+        while True:
+            self._wakeup.clear()
+            try:
+                published = await self.run_once()
+                backoff = self.poll_interval
+                if datetime.utcnow() - last_purge > timedelta(hours=1):
+                    await self.purge()
+                    last_purge = datetime.utcnow()
+            except Exception as e:
+                print(f"Outbox relay error, retrying in {backoff:.1f}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                continue
+            if published < self.batch_size:
+                # Caught up: sleep until the next poll or until a new event is committed
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_outbox_relay = None
+
+
+def get_outbox_relay() -> Optional[OutboxRelay]:
+    """The relay needs a queue; without REDIS_URL events stay in the outbox table."""
+    global _outbox_relay
+    if _outbox_relay is None and settings.REDIS_URL:
+        publisher = RedisStreamPublisher(settings.REDIS_URL, settings.OUTBOX_STREAM, settings.OUTBOX_STREAM_MAXLEN)
+        _outbox_relay = OutboxRelay(SessionLocal, publisher, settings.OUTBOX_BATCH_SIZE, settings.OUTBOX_POLL_INTERVAL)
+    return _outbox_relay
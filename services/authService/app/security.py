@@ -4,11 +4,44 @@ from jose import jwt, JWTError
 from passlib.context import CryptContext
 from typing import Optional, Tuple
 import re
+import hashlib
 import secrets
 from app.config import dev_config as settings
+from app.keys import get_key_ring, is_asymmetric
 
-# CryptContext with Argon2
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+# ----- Argon2 cost profiles -----
+# memory_cost is in KiB. "default" matches the argon2-cffi/passlib defaults the
+# service used so far, "low" is the OWASP minimum for argon2id.
+ARGON2_PROFILES = {
+    "low": {"time_cost": 2, "memory_cost": 19456, "parallelism": 1},
+    "default": {"time_cost": 3, "memory_cost": 65536, "parallelism": 4},
+    "high": {"time_cost": 4, "memory_cost": 131072, "parallelism": 4},
+}
+
+
+def argon2_parameters() -> dict:
+    if settings.ARGON2_PROFILE not in ARGON2_PROFILES:
+        raise ValueError(f"Unknown ARGON2_PROFILE '{settings.ARGON2_PROFILE}'")
+    params = dict(ARGON2_PROFILES[settings.ARGON2_PROFILE])
+    overrides = {
+        "time_cost": settings.ARGON2_TIME_COST,
+        "memory_cost": settings.ARGON2_MEMORY_COST,
+        "parallelism": settings.ARGON2_PARALLELISM,
+    }
+    params.update({name: int(value) for name, value in overrides.items() if value})
+    return params
+
+
+def build_pwd_context(params: dict) -> CryptContext:
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        **{f"argon2__{name}": value for name, value in params.items()},
+    )
+
+
+# CryptContext with Argon2; hashes made with other parameters report needs_update
+pwd_context = build_pwd_context(argon2_parameters())
 
 
 # ----- Password hashing / verification -----
@@ -21,27 +54,43 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify, and return a new hash when the stored one uses outdated Argon2 parameters."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 # ----- Token creation & verification -----
 def _create_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     now = datetime.now(timezone.utc)
     expire = now + (expires_delta or timedelta(hours=settings.RESET_TOKEN_EXPIRE_HOURS))
     to_encode.update({"exp": expire, "iat": now})
+    if is_asymmetric(settings.ALGORITHM):
+        kid, private_key = get_key_ring().signing_key()
+        return jwt.encode(to_encode, private_key, algorithm=settings.ALGORITHM, headers={"kid": kid})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
 def create_access_token(data: dict) -> str:
-    return _create_token(data, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+    return _create_token({**data, "type": "access"}, timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
 
 
 def create_refresh_token(data: dict) -> str:
     # refresh longer lived (configurable)
-    return _create_token(data, timedelta(days=getattr(settings, "REFRESH_TOKEN_EXPIRE_DAYS", 7)))
+    return _create_token({**data, "type": "refresh"}, timedelta(days=getattr(settings, "REFRESH_TOKEN_EXPIRE_DAYS", 7)))
 
 
 def verify_token(token: str) -> dict:
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        if is_asymmetric(settings.ALGORITHM):
+            kid = jwt.get_unverified_header(token).get("kid")
+            try:
+                key = get_key_ring().verification_key(kid)
+            except KeyError as e:
+                raise JWTError(str(e))
+        else:
+            key = settings.SECRET_KEY
+        payload = jwt.decode(token, key, algorithms=[settings.ALGORITHM])
         return payload
     except JWTError as e:
         raise
@@ -53,6 +102,12 @@ def generate_reset_token(length: int = 48) -> str:
     return secrets.token_urlsafe(length)
 
 
+def hash_reset_token(token: str) -> str:
+    # Only the digest is stored: a leaked table gives no usable tokens.
+    # Tokens are random and high-entropy, so a plain SHA-256 is enough (no salt/argon2).
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
 # ----- Password policy -----
 def check_password_policy(password: str) -> tuple[bool, str | None]:
     """
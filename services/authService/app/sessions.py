@@ -0,0 +1,93 @@
+# app/sessions.py
+import time
+from typing import Dict, Optional, Tuple
+
+from app.config import dev_config as settings
+
+SESSION_PREFIX = "auth:session:"
+REVOKED_PREFIX = "auth:revoked:"
+
+# Compare-and-set of the current refresh token id, keeping the session TTL in sync
+_ROTATE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    redis.call('set', KEYS[1], ARGV[2], 'EX', ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+class MemorySessionStore:
+    """In-process store for development and tests (not shared between workers)."""
+
+    def __init__(self):
+        self._sessions: Dict[str, Tuple[str, float]] = {}
+        self._revoked: Dict[str, float] = {}
+
+    async def create(self, sid: str, refresh_jti: str, ttl: int) -> None:
+        self._sessions[sid] = (refresh_jti, time.time() + ttl)
+
+    async def rotate(self, sid: str, expected_jti: str, new_jti: str, ttl: int) -> bool:
+        current = self._sessions.get(sid)
+        if current is None or current[1] <= time.time() or current[0] != expected_jti:
+            return False
+        self._sessions[sid] = (new_jti, time.time() + ttl)
+        return True
+
+    async def exists(self, sid: str) -> bool:
+        current = self._sessions.get(sid)
+        return current is not None and current[1] > time.time()
+
+    async def revoke(self, sid: str, ttl: int) -> None:
+        self._sessions.pop(sid, None)
+        self._revoked[sid] = time.time() + ttl
+
+    async def is_revoked(self, sid: str) -> bool:
+        return self._revoked.get(sid, 0) > time.time()
+
+
+class RedisSessionStore:
+    """
+    Sessions shared by every authService worker.
+    ``auth:session:<sid>`` holds the id of the only refresh token still valid
+    for the session and expires with it. Revoking a session writes
+    ``auth:revoked:<sid>`` (value: expiry timestamp) for as long as access
+    tokens of that session can live, and publishes the sid so gateways can
+    keep an in-memory denylist.
+    """
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self.redis = redis.Redis.from_url(url)
+        self._rotate = self.redis.register_script(_ROTATE)
+
+    async def create(self, sid: str, refresh_jti: str, ttl: int) -> None:
+        await self.redis.set(SESSION_PREFIX + sid, refresh_jti, ex=ttl)
+
+    async def rotate(self, sid: str, expected_jti: str, new_jti: str, ttl: int) -> bool:
+        return bool(await self._rotate(keys=[SESSION_PREFIX + sid], args=[expected_jti, new_jti, ttl]))
+
+    async def exists(self, sid: str) -> bool:
+        return bool(await self.redis.exists(SESSION_PREFIX + sid))
+
+    async def revoke(self, sid: str, ttl: int) -> None:
+        expires_at = int(time.time()) + ttl
+        pipe = self.redis.pipeline(transaction=False)
+        pipe.delete(SESSION_PREFIX + sid)
+        pipe.set(REVOKED_PREFIX + sid, expires_at, ex=ttl)
+        pipe.publish(settings.REVOCATION_CHANNEL, f"{sid}:{expires_at}")
+        await pipe.execute()
+
+    async def is_revoked(self, sid: str) -> bool:
+        return bool(await self.redis.exists(REVOKED_PREFIX + sid))
+
+
+_session_store = None
+
+
+def get_session_store():
+    global _session_store
+    if _session_store is None:
+        _session_store = RedisSessionStore(settings.REDIS_URL) if settings.REDIS_URL else MemorySessionStore()
+    return _session_store
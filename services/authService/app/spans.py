@@ -0,0 +1,214 @@
+# Span model, W3C trace context, exporters and tracer shared by the gateway,
+# authService and userService. Each is built from its own directory, so each
+# ships a copy of this module: keep the three files identical (tests check
+# it) and put the service's wiring in the tracing module next to it.
+import asyncio
+import contextvars
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# W3C Trace Context: version-traceid-parentid-flags
+TRACEPARENT_RE = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+# Request IDs are echoed in headers and logs: keep them short and printable
+REQUEST_ID_RE = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+SAMPLED_FLAG = 0x01
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    sampled: bool
+    request_id: Optional[str] = None
+    attributes: Dict[str, object] = field(default_factory=dict)
+    start_time: float = field(default_factory=time.time)
+    duration: Optional[float] = None
+    error: Optional[str] = None
+    _started: float = field(default_factory=time.perf_counter, repr=False)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{SAMPLED_FLAG if self.sampled else 0:02x}"
+
+    def to_dict(self, service: str) -> dict:
+        return {
+            "service": service,
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "request_id": self.request_id,
+            "start": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """(trace_id, parent span_id, sampled) from a traceparent header, or None when it is invalid."""
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return trace_id, span_id, bool(int(flags, 16) & SAMPLED_FLAG)
+
+
+def valid_request_id(value: Optional[str]) -> Optional[str]:
+    return value if value and REQUEST_ID_RE.match(value) else None
+
+
+# ==============================================================
+# Exporters
+# ==============================================================
+class ConsoleExporter:
+    """Prints finished spans as JSON lines (development)."""
+
+    def __init__(self, service: str):
+        self.service = service
+
+    def export(self, span: Span) -> None:
+        print(json.dumps(span.to_dict(self.service)))
+
+
+class FileExporter:
+    """
+    Appends finished spans as JSON lines to a file (tests, local runs).
+    export() only buffers the line; the file is written by a task that
+    hands the batch to a worker thread, so sampled spans never block the
+    event loop on disk I/O. Without a running loop the line is written
+    at once. At most ``max_buffered`` lines wait; later spans are dropped.
+    """
+
+    def __init__(self, service: str, path: str, max_buffered: int = 10000):
+        self.service = service
+        self.path = path
+        self.max_buffered = max_buffered
+        self.dropped = 0
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flusher: Optional[asyncio.Task] = None
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(self.service)) + "\n"
+        with self._lock:
+            if len(self._buffer) >= self.max_buffered:
+                self.dropped += 1
+                return
+            self._buffer.append(line)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        # A flusher left pending by a closed loop (e.g. a test client's) never runs
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not loop:
+            self._flusher = loop.create_task(self._flush_in_thread())
+
+    async def _flush_in_thread(self) -> None:
+        while self._buffer:
+            await asyncio.to_thread(self.flush)
+
+    def flush(self) -> None:
+        """Write the buffered spans now (also called on shutdown)."""
+        with self._lock:
+            lines, self._buffer = self._buffer, []
+        if lines:
+            with self._write_lock, open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(lines)
+
+
+# ==============================================================
+# Tracer
+# ==============================================================
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Minimal tracer. The sampling decision is taken once per trace, where it
+    starts: a trace continued from a traceparent keeps the caller's
+    decision, a new one is sampled with probability TRACE_SAMPLE_RATIO.
+    Only sampled spans reach the exporter. Without an exporter nothing is
+    recorded, unless ``propagate`` is set: the gateway always creates trace
+    context, so the services behind it still receive a traceparent carrying
+    its sampling decision.
+    """
+
+    def __init__(self, exporter=None, sample_ratio: float = 1.0, propagate: bool = False):
+        self.exporter = exporter
+        self.sample_ratio = sample_ratio
+        self.propagate = propagate
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None or self.propagate
+
+    def start_span(self, name: str, parent: Optional[Span] = None, **attributes) -> Optional[Span]:
+        """Child of ``parent`` (the current span by default); None outside a trace or while disabled."""
+        parent = parent or _current_span.get()
+        if parent is None or not self.enabled:
+            return None
+        return Span(name, parent.trace_id, uuid.uuid4().hex[16:], parent.span_id, parent.sampled,
+                    parent.request_id, attributes)
+
+    def end_span(self, span: Optional[Span], error: Optional[BaseException] = None) -> None:
+        if span is None:
+            return
+        span.duration = time.perf_counter() - span._started
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+        if span.sampled and self.exporter is not None:
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                print(f"Span export failed: {e}")
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, request_id: Optional[str] = None,
+                    **attributes) -> Optional[Span]:
+        """Root span of this service for one request, continuing the caller's trace when there is one."""
+        if not self.enabled:
+            return None
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = uuid.uuid4().hex, None, random.random() < self.sample_ratio
+        return Span(name, trace_id, uuid.uuid4().hex[16:], parent_id, sampled, request_id, attributes)
+
+    @contextmanager
+    def activate(self, span: Optional[Span]) -> Iterator[Optional[Span]]:
+        """Make ``span`` the parent of the spans started inside the block, then end it."""
+        token = _current_span.set(span) if span is not None else None
+        try:
+            yield span
+        except BaseException as e:
+            self.end_span(span, e)
+            raise
+        else:
+            self.end_span(span)
+        finally:
+            if token is not None:
+                _current_span.reset(token)
+
+    def span(self, name: str, **attributes):
+        """``with tracer.span("name"):`` times the block as a child of the current span."""
+        return self.activate(self.start_span(name, **attributes))
+
+    def flush(self) -> None:
+        """Write out spans the exporter still buffers."""
+        flush = getattr(self.exporter, "flush", None)
+        if flush is not None:
+            flush()
@@ -0,0 +1,64 @@
+# app/sweeper.py
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, select
+
+from app.config import dev_config as settings
+from app.db import models
+from app.db.database import SessionLocal
+
+
+async def purge_expired_reset_tokens(session_factory, chunk_size: int, pause: float = 0.0) -> int:
+    """
+    Delete expired reset tokens ``chunk_size`` rows at a time, one short
+    transaction per chunk, so the table is never locked for long. Returns the
+    number of rows deleted.
+    """
+    table = models.PasswordResetToken
+    now = datetime.utcnow()
+    total = 0
+    while True:
+        async with session_factory() as db:
+            expired = select(table.id).where(table.expires_at <= now).order_by(table.expires_at).limit(chunk_size)
+            result = await db.execute(delete(table).where(table.id.in_(expired.scalar_subquery())))
+            await db.commit()
+        total += result.rowcount
+        if result.rowcount < chunk_size:
+            return total
+        await asyncio.sleep(pause)
+
+
+class ResetTokenSweeper:
+    def __init__(self, session_factory, interval: float, chunk_size: int):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await purge_expired_reset_tokens(self.session_factory, self.chunk_size, pause=0.05)
+            except Exception as e:
+                print(f"Reset token sweep failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+reset_token_sweeper = ResetTokenSweeper(
+    SessionLocal, settings.RESET_TOKEN_SWEEP_INTERVAL, settings.RESET_TOKEN_SWEEP_CHUNK
+)
@@ -0,0 +1,77 @@
+# app/tasks.py
+from typing import List, Optional
+
+from app.config import dev_config as settings
+from app.contoller.user_controller import set_reset_token
+from app.db.database import SessionLocal
+from app.jobs import Handler, Job, JobRunner, MemoryJobQueue, RedisJobQueue
+from app.mail import MailMessage, get_mail_transport
+
+PASSWORD_RESET = "password_reset"
+
+
+def password_reset_handler(session_factory, transport) -> Handler:
+    async def send_password_reset_emails(jobs: List[Job]) -> List[Job]:
+        # Unknown emails are silently skipped: the HTTP response never depended on them.
+        # Only the jobs that failed are returned, so one bad job does not retry the batch.
+        failed: List[Job] = []
+        mailed: List[Job] = []
+        messages = []
+        async with session_factory() as db:
+            for job in jobs:
+                try:
+                    token = await set_reset_token(db, job.payload["email"])
+                except Exception as e:
+                    print(f"Password reset job {job.id} failed: {e}")
+                    failed.append(job)
+                    continue
+                if token:
+                    mailed.append(job)
+                    messages.append(MailMessage(
+                        to=job.payload["email"],
+                        subject="Reset your password",
+                        body=(
+                            "Use the link below to choose a new password:\n"
+                            f"{settings.PASSWORD_RESET_URL.format(token=token)}\n\n"
+                            "If you did not ask for a password reset, you can ignore this email."
+                        ),
+                    ))
+        if messages:
+            # The batch goes out over one connection: if it fails, every mail in it is retried
+            try:
+                await transport.send_many(messages)
+            except Exception as e:
+                print(f"Sending {len(messages)} password reset mail(s) failed: {e}")
+                failed.extend(mailed)
+        return failed
+
+    return send_password_reset_emails
+
+
+_job_runner: Optional[JobRunner] = None
+
+
+def get_job_runner() -> JobRunner:
+    global _job_runner
+    if _job_runner is None:
+        if settings.JOBS_BACKEND == "redis":
+            import redis.asyncio as redis
+
+            queue = RedisJobQueue(
+                redis.Redis.from_url(settings.REDIS_URL),
+                settings.JOBS_QUEUE_KEY,
+                settings.JOBS_CONSUMER,
+                settings.JOBS_QUEUE_SIZE,
+            )
+        else:
+            queue = MemoryJobQueue(settings.JOBS_QUEUE_SIZE)
+        handlers = {PASSWORD_RESET: password_reset_handler(SessionLocal, get_mail_transport())}
+        _job_runner = JobRunner(
+            queue,
+            handlers,
+            workers=settings.JOBS_WORKERS,
+            batch_size=settings.JOBS_BATCH_SIZE,
+            max_attempts=settings.JOBS_MAX_ATTEMPTS,
+            retry_base_delay=settings.JOBS_RETRY_BASE_DELAY,
+        )
+    return _job_runner
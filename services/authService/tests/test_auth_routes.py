@@ -1,19 +1,34 @@
 # tests/test_auth_routes.py
+import asyncio
+import json
 import os
 import sys
+from datetime import datetime, timedelta
 import pytest
 from unittest.mock import patch
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
 
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from app.db.database import Base, get_db
+from app.db.database import Base, get_db, get_lazy_db
 from app.main import create_app
+from app.jobs import Job
+from app.mail import FileTransport
+from app.contoller.user_controller import set_reset_token
+from app.outbox import OutboxRelay
+from app.tasks import PASSWORD_RESET, get_job_runner, password_reset_handler
 from app.db import models
+from app.hashing import HashingOverloaded, password_hasher
+from app.security import ARGON2_PROFILES, build_pwd_context, hash_reset_token, pwd_context, verify_token
+from app.sweeper import purge_expired_reset_tokens
+from app.tracing import FileExporter, trace_queries, tracer
 
 
 load_dotenv(".env.test")
@@ -22,18 +37,26 @@ TEST_DB_FILE = "./test_auth.db"
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB_FILE}"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The app runs on an async session; TestClient starts a new event loop per request,
+# so connections must not be pooled across requests
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{TEST_DB_FILE}", poolclass=NullPool)
+trace_queries(async_engine)
+AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+# Sessions handed to the routes, to check what they hold while hashing
+sessions = []
+
+
+async def override_get_db():
+    async with AsyncTestingSessionLocal() as db:
+        sessions.append(db)
         yield db
-    finally:
-        db.close()
 
 
 app = create_app()
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_lazy_db] = override_get_db
 client = TestClient(app)
 
 
@@ -60,7 +83,7 @@ def test_register_success():
 
 def test_register_existing_user():
     # Vider la table
-    with next(override_get_db()) as db:
+    with TestingSessionLocal() as db:
         db.query(models.User).delete()
         db.commit()
 
@@ -77,6 +100,45 @@ def test_register_existing_user():
     assert response2.json()["detail"] == "Email already registered"
 
 
+def test_register_writes_user_and_event_in_one_round_each():
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        response = client.post("/auth/register", json={"email": "one_stmt@example.com", "password": "StrongPass123"})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert response.status_code == 200
+    assert len(statements) == 2
+    assert statements[0].startswith("INSERT INTO users") and "RETURNING" in statements[0]
+    assert statements[1].startswith("INSERT INTO outbox_events")
+
+def test_register_queues_user_registered_event():
+    response = client.post("/auth/register", json={"email": "outbox@example.com", "password": "StrongPass123"})
+    assert response.status_code == 200
+
+    class RecordingPublisher:
+        def __init__(self):
+            self.events = []
+
+        async def publish(self, events):
+            self.events.extend(events)
+
+    publisher = RecordingPublisher()
+    relay = OutboxRelay(AsyncTestingSessionLocal, publisher, batch_size=500, poll_interval=1)
+    assert asyncio.run(relay.run_once()) >= 1
+    payloads = [json.loads(e.payload) for e in publisher.events if e.event_type == "UserRegistered"]
+    assert "outbox@example.com" in [p["email"] for p in payloads]
+
+    # Published events are not sent again
+    assert asyncio.run(relay.run_once()) == 0
+    with TestingSessionLocal() as db:
+        assert db.query(models.OutboxEvent).filter(models.OutboxEvent.published_at.is_(None)).count() == 0
+
+
 def test_login_success():
     email = "loginuser@example.com"
     password = "MyPass123"
@@ -92,19 +154,98 @@ def test_login_invalid_credentials():
     assert response.json()["detail"] == "Invalid credentials"
 
 
+def test_login_returns_503_when_hashing_pool_is_full():
+    email = "busy@example.com"
+    password = "BusyPass123"
+    client.post("/auth/register", json={"email": email, "password": password})
+
+    with patch("app.contoller.user_controller.password_hasher.verify_and_update", side_effect=HashingOverloaded):
+        response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_login_returns_503_when_db_pool_is_exhausted():
+    email = "pooled@example.com"
+    password = "PooledPass123"
+    client.post("/auth/register", json={"email": email, "password": password})
+
+    with patch("app.contoller.user_controller._update_password_hash", side_effect=PoolTimeout("pool exhausted")), \
+            patch("app.contoller.user_controller.password_hasher.verify_and_update", return_value=(True, "rehashed")):
+        response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_login_rehashes_password_with_outdated_parameters():
+    email = "legacy@example.com"
+    password = "LegacyPass123"
+    legacy_context = build_pwd_context(ARGON2_PROFILES["low"])
+    with TestingSessionLocal() as db:
+        db.add(models.User(email=email, hashed_password=legacy_context.hash(password)))
+        db.commit()
+
+    response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200
+
+    with TestingSessionLocal() as db:
+        stored = db.query(models.User).filter(models.User.email == email).first().hashed_password
+    assert "m=19456,t=2,p=1" not in stored
+    assert not pwd_context.needs_update(stored)
+
+
+def _login_tokens(email: str, password: str) -> dict:
+    client.post("/auth/register", json={"email": email, "password": password})
+    response = client.post("/auth/login", json={"email": email, "password": password})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_refresh_rotates_tokens():
+    tokens = _login_tokens("refresh@example.com", "RefreshPass123")
+    assert tokens["refresh_token"]
+
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    rotated = response.json()
+    assert rotated["refresh_token"] != tokens["refresh_token"]
+    assert verify_token(rotated["access_token"])["sub"] == "refresh@example.com"
+
+
+def test_refresh_token_reuse_revokes_session():
+    tokens = _login_tokens("reuse@example.com", "ReusePass123")
+    rotated = client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).json()
+
+    # Replaying the consumed token kills the session, including the newest refresh token
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": rotated["refresh_token"]}).status_code == 401
+
+
+def test_access_token_cannot_be_used_to_refresh():
+    tokens = _login_tokens("wrongtype@example.com", "WrongType123")
+    response = client.post("/auth/refresh", json={"refresh_token": tokens["access_token"]})
+    assert response.status_code == 401
+
+
+def test_logout_revokes_session():
+    tokens = _login_tokens("logout@example.com", "LogoutPass123")
+    assert client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 204
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
 def test_forgot_password_existing_user():
     email = "reset@example.com"
     password = "ResetPass123"
     client.post("/auth/register", json={"email": email, "password": password})
 
-    # Patch correct
-    with patch("app.auth_routes.set_reset_token") as mock_set_token:
-        mock_set_token.return_value = "mockedtoken123"
+    with patch.object(get_job_runner(), "enqueue") as enqueue:
         response = client.post("/auth/forgot-password", json={"email": email})
-        assert response.status_code == 200
-        data = response.json()
-        assert "reset_token" in data
-        assert data["reset_token"] == "mockedtoken123"
+        unknown = client.post("/auth/forgot-password", json={"email": "unknown@example.com"})
+    # Same answer whether or not the account exists, and the token never leaves by HTTP
+    assert response.status_code == unknown.status_code == 200
+    assert response.json() == unknown.json()
+    assert "reset_token" not in response.json()
+    enqueue.assert_any_call(PASSWORD_RESET, {"email": email})
 
 
 def test_forgot_password_unknown_user():
@@ -112,3 +253,154 @@ def test_forgot_password_unknown_user():
     assert response.status_code == 200
     data = response.json()
     assert data["message"].startswith("If an account")
+
+
+def test_password_reset_job_mails_a_link(tmp_path):
+    email = "resetjob@example.com"
+    client.post("/auth/register", json={"email": email, "password": "ResetPass123"})
+    transport = FileTransport(str(tmp_path / "mail.log"))
+    handler = password_reset_handler(AsyncTestingSessionLocal, transport)
+
+    jobs = [Job(PASSWORD_RESET, {"email": email}), Job(PASSWORD_RESET, {"email": "nobody@example.com"})]
+    assert asyncio.run(handler(jobs)) == []
+
+    mails = [json.loads(line) for line in (tmp_path / "mail.log").read_text().splitlines()]
+    assert [m["to"] for m in mails] == [email]
+    token = mails[0]["body"].split("token=")[1].split()[0]
+    with TestingSessionLocal() as db:
+        stored = db.query(models.PasswordResetToken).one()
+        assert stored.token_hash == hash_reset_token(token) != token
+
+
+def _issue_reset_token(email: str) -> str:
+    with TestingSessionLocal() as db:
+        db.query(models.PasswordResetToken).delete()
+        db.commit()
+
+    async def issue():
+        async with AsyncTestingSessionLocal() as db:
+            return await set_reset_token(db, email)
+
+    return asyncio.run(issue())
+
+
+def test_reset_password_consumes_token():
+    email = "consume@example.com"
+    client.post("/auth/register", json={"email": email, "password": "OldPass1234"})
+    token = _issue_reset_token(email)
+
+    response = client.post("/auth/reset-password", json={"token": token, "new_password": "NewPass1234"})
+    assert response.status_code == 200
+    assert client.post("/auth/login", json={"email": email, "password": "NewPass1234"}).status_code == 200
+    assert client.post("/auth/login", json={"email": email, "password": "OldPass1234"}).status_code == 401
+
+    # Single use
+    response = client.post("/auth/reset-password", json={"token": token, "new_password": "OtherPass1234"})
+    assert response.status_code == 400
+
+
+def test_no_connection_is_held_while_hashing():
+    email = "no_conn@example.com"
+    held = []
+    hash_password = password_hasher.hash
+    verify_and_update = password_hasher.verify_and_update
+
+    async def hash_and_check(*args):
+        held.append(sessions[-1].in_transaction())
+        return await hash_password(*args)
+
+    async def verify_and_check(*args):
+        held.append(sessions[-1].in_transaction())
+        return await verify_and_update(*args)
+
+    with patch.object(password_hasher, "hash", hash_and_check), \
+            patch.object(password_hasher, "verify_and_update", verify_and_check):
+        assert client.post("/auth/register", json={"email": email, "password": "OldPass1234"}).status_code == 200
+        assert client.post("/auth/login", json={"email": email, "password": "OldPass1234"}).status_code == 200
+        token = _issue_reset_token(email)
+        response = client.post("/auth/reset-password", json={"token": token, "new_password": "NewPass1234"})
+        assert response.status_code == 200
+    assert held == [False, False, False]
+
+
+def test_reset_password_rejects_expired_token():
+    email = "expired@example.com"
+    client.post("/auth/register", json={"email": email, "password": "OldPass1234"})
+    token = _issue_reset_token(email)
+    with TestingSessionLocal() as db:
+        db.query(models.PasswordResetToken).update({"expires_at": datetime.utcnow() - timedelta(minutes=1)})
+        db.commit()
+
+    response = client.post("/auth/reset-password", json={"token": token, "new_password": "NewPass1234"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid or expired reset token"
+
+
+def test_sweeper_deletes_expired_tokens_in_chunks():
+    with TestingSessionLocal() as db:
+        db.query(models.PasswordResetToken).delete()
+        user = db.query(models.User).first()
+        past, future = datetime.utcnow() - timedelta(hours=1), datetime.utcnow() + timedelta(hours=1)
+        for i in range(7):
+            db.add(models.PasswordResetToken(token_hash=f"expired{i}", user_id=user.id, expires_at=past))
+        db.add(models.PasswordResetToken(token_hash="live", user_id=user.id, expires_at=future))
+        db.commit()
+
+    assert asyncio.run(purge_expired_reset_tokens(AsyncTestingSessionLocal, chunk_size=3)) == 7
+    with TestingSessionLocal() as db:
+        assert [t.token_hash for t in db.query(models.PasswordResetToken)] == ["live"]
+
+
+def test_jwks_does_not_publish_shared_secret():
+    response = client.get("/.well-known/jwks.json")
+    assert response.status_code == 200
+    assert response.json() == {"keys": []}
+
+
+def test_metrics_expose_route_templates_and_hash_time():
+    client.post("/auth/register", json={"email": "metrics@example.com", "password": "StrongPass123!"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_requests_total{method="POST",route="/auth/register",status="200"}' in body
+    assert 'password_hash_duration_seconds_count{operation="hash"}' in body
+    assert "db_pool_in_use" in body
+
+
+def test_login_continues_the_callers_trace(tmp_path):
+    email = "traced@example.com"
+    password = "TracedPass123"
+    client.post("/auth/register", json={"email": email, "password": password})
+    trace_id, parent_id = "4bf92f3577b34da6a3ce929d0e0e4736", "00f067aa0ba902b7"
+    spans_file = tmp_path / "spans.log"
+
+    with patch.object(tracer, "exporter", FileExporter("auth", str(spans_file))):
+        response = client.post(
+            "/auth/login",
+            json={"email": email, "password": password},
+            headers={"traceparent": f"00-{trace_id}-{parent_id}-01", "X-Request-ID": "req-42"},
+        )
+        tracer.flush()
+    assert response.status_code == 200
+    assert response.headers["x-request-id"] == "req-42"
+
+    spans = [json.loads(line) for line in spans_file.read_text().splitlines()]
+    root = next(span for span in spans if span["name"] == "POST /auth/login")
+    assert root["parent_id"] == parent_id
+    assert root["attributes"]["http.status_code"] == 200
+    assert {span["trace_id"] for span in spans} == {trace_id}
+    assert {span["request_id"] for span in spans} == {"req-42"}
+    children = [span for span in spans if span is not root]
+    assert {span["name"] for span in children} >= {"db.query", "password.verify"}
+    assert all(span["parent_id"] == root["span_id"] for span in children)
+
+
+def test_unsampled_trace_exports_nothing(tmp_path):
+    spans_file = tmp_path / "spans.log"
+    with patch.object(tracer, "exporter", FileExporter("auth", str(spans_file))):
+        response = client.get("/health", headers={"traceparent": "00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-00"})
+        tracer.flush()
+    assert response.status_code == 200
+    assert response.headers["x-request-id"]
+    assert not spans_file.exists()
@@ -0,0 +1,83 @@
+# tests/test_database.py
+import asyncio
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import StaticPool
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.db import pool
+from app.db.database import async_database_url, get_db
+from app.db.pool import PoolStats, enable_sqlite_wal, engine_options, instrument
+from app.main import create_app
+
+
+def test_async_driver_is_picked_from_url():
+    assert async_database_url("sqlite:///./auth.db") == "sqlite+aiosqlite:///./auth.db"
+    assert async_database_url("postgresql+psycopg2://u:p@db/authdb") == "postgresql+asyncpg://u:p@db/authdb"
+
+
+def test_engine_options_follow_config():
+    with patch.object(pool.settings, "DB_POOL_SIZE", 3), patch.object(pool.settings, "DB_MAX_OVERFLOW", 1):
+        options = engine_options("postgresql+asyncpg://u:p@db/authdb")
+    assert options["pool_size"] == 3
+    assert options["max_overflow"] == 1
+    assert options["pool_pre_ping"] is True
+    assert engine_options("sqlite+aiosqlite://") == {"poolclass": StaticPool}
+
+
+def test_pool_gauges_and_exhaustion(tmp_path):
+    async def scenario():
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}", pool_size=1, max_overflow=0, pool_timeout=0.1
+        )
+        stats = PoolStats()
+        instrument(engine, stats)
+        try:
+            async with engine.connect():
+                assert stats.in_use == 1
+                with pytest.raises(PoolTimeout):
+                    async with engine.connect():
+                        pass
+            snapshot = stats.snapshot(engine.pool)
+        finally:
+            await engine.dispose()
+        return stats, snapshot
+
+    stats, snapshot = asyncio.run(scenario())
+    assert stats.in_use == 0
+    assert snapshot["peak_in_use"] == 1
+    assert snapshot["connects"] == 1
+    assert snapshot["pool_size"] == 1
+
+
+def test_sqlite_uses_wal(tmp_path):
+    async def journal_mode():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'wal.db'}")
+        enable_sqlite_wal(engine)
+        try:
+            async with engine.connect() as conn:
+                return (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+        finally:
+            await engine.dispose()
+
+    assert asyncio.run(journal_mode()) == "wal"
+
+
+def test_pool_timeout_returns_503():
+    async def exhausted_db():
+        raise PoolTimeout("QueuePool limit reached")
+        yield
+
+    app = create_app()
+    app.dependency_overrides[get_db] = exhausted_db
+    response = TestClient(app).post("/auth/login", json={"email": "a@example.com", "password": "Whatever123"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
@@ -0,0 +1,150 @@
+# tests/test_jobs.py
+import asyncio
+import os
+import sys
+from contextlib import asynccontextmanager
+from unittest.mock import patch
+
+import fakeredis
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.jobs import Job, JobRunner, MemoryJobQueue, QueueFull, RedisJobQueue
+from app.tasks import password_reset_handler
+
+
+def test_jobs_are_batched_by_kind():
+    batches = []
+
+    async def handler(jobs):
+        batches.append([job.payload["n"] for job in jobs])
+        return []
+
+    async def scenario():
+        runner = JobRunner(MemoryJobQueue(100), {"mail": handler}, workers=1, batch_size=3,
+                           max_attempts=3, retry_base_delay=0.01)
+        for n in range(5):
+            await runner.enqueue("mail", {"n": n})
+        await runner.start()
+        await asyncio.sleep(0.1)
+        await runner.stop()
+
+    asyncio.run(scenario())
+    assert batches == [[0, 1, 2], [3, 4]]
+
+
+def test_failed_jobs_are_retried_then_dropped():
+    attempts = []
+    dead = []
+
+    async def flaky(jobs):
+        attempts.append(jobs[0].attempts)
+        return jobs
+
+    class RecordingQueue(MemoryJobQueue):
+        async def dead(self, job):
+            dead.append(job)
+
+    async def scenario():
+        runner = JobRunner(RecordingQueue(100), {"mail": flaky}, workers=1, batch_size=10,
+                           max_attempts=3, retry_base_delay=0.01)
+        await runner.enqueue("mail", {})
+        await runner.start()
+        await asyncio.sleep(0.3)
+        await runner.stop()
+
+    asyncio.run(scenario())
+    assert attempts == [0, 1, 2]
+    assert len(dead) == 1 and dead[0].attempts == 3
+
+
+def test_full_queue_rejects_jobs():
+    async def scenario():
+        queue = MemoryJobQueue(1)
+        await queue.put(Job("mail", {}))
+        try:
+            await queue.put(Job("mail", {}))
+        except QueueFull:
+            return True
+        return False
+
+    assert asyncio.run(scenario())
+
+
+def test_job_round_trips_through_json():
+    job = Job("mail", {"email": "a@example.com"}, attempts=2)
+    loaded = Job.loads(job.dumps())
+    assert (loaded.kind, loaded.payload, loaded.attempts, loaded.id) == ("mail", job.payload, 2, job.id)
+
+
+class SlowRedis:
+    """Lets other tasks run before LLEN and LPUSH, as a network round-trip would."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in ("llen", "lpush"):
+            return attr
+
+        async def command(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await attr(*args, **kwargs)
+
+        return command
+
+
+def test_redis_queue_bound_holds_under_concurrent_puts():
+    async def scenario():
+        queue = RedisJobQueue(SlowRedis(fakeredis.FakeAsyncRedis()), "jobs", "worker-1", maxsize=3)
+        results = await asyncio.gather(*(queue.put(Job("mail", {"n": n})) for n in range(10)),
+                                       return_exceptions=True)
+        return results, await queue.redis.llen(queue.ready)
+
+    results, length = asyncio.run(scenario())
+    assert sum(isinstance(result, QueueFull) for result in results) == 7
+    assert length == 3
+
+
+@asynccontextmanager
+async def no_session():
+    yield None
+
+
+class RecordingTransport:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.sent = []
+
+    async def send_many(self, messages):
+        if self.fail:
+            raise ConnectionError("SMTP server unreachable")
+        self.sent.extend(messages)
+
+
+def test_password_reset_handler_only_returns_failed_jobs():
+    async def set_reset_token(db, email):
+        if email == "broken@example.com":
+            raise RuntimeError("database unavailable")
+        return None if email == "unknown@example.com" else "token"
+
+    jobs = [Job("password_reset", {"email": email})
+            for email in ("a@example.com", "broken@example.com", "unknown@example.com")]
+    transport = RecordingTransport()
+    with patch("app.tasks.set_reset_token", set_reset_token):
+        failed = asyncio.run(password_reset_handler(no_session, transport)(jobs))
+
+    assert failed == [jobs[1]]
+    assert [message.to for message in transport.sent] == ["a@example.com"]
+
+
+def test_password_reset_handler_retries_mailed_jobs_when_sending_fails():
+    async def set_reset_token(db, email):
+        return None if email == "unknown@example.com" else "token"
+
+    jobs = [Job("password_reset", {"email": email}) for email in ("a@example.com", "unknown@example.com")]
+    with patch("app.tasks.set_reset_token", set_reset_token):
+        failed = asyncio.run(password_reset_handler(no_session, RecordingTransport(fail=True))(jobs))
+
+    assert failed == [jobs[0]]
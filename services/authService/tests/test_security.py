@@ -0,0 +1,121 @@
+# tests/test_security.py
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+from jose import JWTError, jwt
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import keys, security
+from app.keys import KeyRing, _generate_private_pem
+
+
+@pytest.fixture
+def rs256_ring(tmp_path):
+    (tmp_path / "2024-01.pem").write_bytes(_generate_private_pem("RS256"))
+    (tmp_path / "2025-01.pem").write_bytes(_generate_private_pem("RS256"))
+    ring = KeyRing("RS256", str(tmp_path))
+    with patch.object(security.settings, "ALGORITHM", "RS256"), patch.object(keys, "_key_ring", ring):
+        yield ring
+
+
+def test_asymmetric_token_has_kid_and_verifies(rs256_ring):
+    token = security.create_access_token({"sub": "kid@example.com"})
+    assert jwt.get_unverified_header(token)["kid"] == "2025-01"
+    assert security.verify_token(token)["sub"] == "kid@example.com"
+
+
+def test_rotated_key_still_verifies(rs256_ring):
+    token = security.create_access_token({"sub": "old@example.com"})
+    rs256_ring.active_kid = "2024-01"
+    assert jwt.get_unverified_header(security.create_access_token({"sub": "x"}))["kid"] == "2024-01"
+    assert security.verify_token(token)["sub"] == "old@example.com"
+
+
+def test_unknown_kid_is_rejected(rs256_ring):
+    other = KeyRing("RS256")
+    kid, private_key = other.signing_key()
+    token = jwt.encode({"sub": "evil@example.com"}, private_key, algorithm="RS256", headers={"kid": kid})
+    with pytest.raises(JWTError):
+        security.verify_token(token)
+
+
+def test_jwks_publishes_public_keys_only(rs256_ring):
+    published = rs256_ring.jwks()["keys"]
+    assert {k["kid"] for k in published} == {"2024-01", "2025-01"}
+    for key in published:
+        assert key["kty"] == "RSA" and key["alg"] == "RS256" and key["use"] == "sig"
+        assert "d" not in key  # no private exponent
+
+
+def test_hashing_pool_rejects_beyond_queue_limit():
+    import asyncio
+    import threading
+    from app.hashing import HashingOverloaded, PasswordHasherPool
+
+    pool = PasswordHasherPool(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        blocked = [asyncio.ensure_future(pool._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        assert pool.in_flight == 2
+        with pytest.raises(HashingOverloaded):
+            await pool.hash("Overflow123")
+        release.set()
+        await asyncio.gather(*blocked)
+        assert await pool.verify("Overflow123", await pool.hash("Overflow123"))
+
+    asyncio.run(scenario())
+    stats = pool.stats.snapshot()
+    assert stats["rejected"] == 1
+    assert stats["count"] == 4
+
+
+def test_argon2_profile_with_overrides():
+    with patch.object(security.settings, "ARGON2_PROFILE", "low"), \
+            patch.object(security.settings, "ARGON2_TIME_COST", "5"):
+        params = security.argon2_parameters()
+    assert params == {"time_cost": 5, "memory_cost": 19456, "parallelism": 1}
+
+    context = security.build_pwd_context(params)
+    assert "m=19456,t=5,p=1" in context.hash("Profile123")
+
+
+def test_cancelled_caller_keeps_the_slot_until_the_hash_ends():
+    import asyncio
+    import threading
+    from app.hashing import PasswordHasherPool
+
+    pool = PasswordHasherPool(workers=1, max_queue=0)
+    started, release = threading.Event(), threading.Event()
+
+    def slow_hash():
+        started.set()
+        release.wait(5)
+        return "hashed"
+
+    async def scenario():
+        task = asyncio.create_task(pool._run(slow_hash))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # The thread is still hashing: its slot must not be handed out again
+        in_flight_after_cancel = pool.in_flight
+        release.set()
+        for _ in range(100):
+            if pool.in_flight == 0:
+                break
+            await asyncio.sleep(0.01)
+        return in_flight_after_cancel, pool.in_flight
+
+    try:
+        assert asyncio.run(scenario()) == (1, 0)
+    finally:
+        release.set()
+        pool.shutdown()
@@ -0,0 +1,201 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from app.config import dev_config as settings
+from app.metrics import WAIT_BUCKETS
+from app.schema import UserResponse
+from app.tracing import tracer
+
+PROFILE_CACHE_LOOKUPS = Counter(
+    "profile_cache_lookups_total", "Profile cache lookups", ["result"]
+)
+PROFILE_CACHE_LOOKUP_DURATION = Histogram(
+    "profile_cache_lookup_seconds", "Time of a profile cache lookup", buckets=WAIT_BUCKETS
+)
+
+ID_PREFIX = "user:id:"
+
+
+@dataclass
+class CachedProfile:
+    payload: bytes  # UserResponse déjà sérialisé en JSON
+    is_complete: bool
+
+    def dumps(self) -> bytes:
+        return (b"1" if self.is_complete else b"0") + self.payload
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "CachedProfile":
+        return cls(payload=raw[1:], is_complete=raw[:1] == b"1")
+
+
+def profile_keys(user) -> Tuple[str, ...]:
+    # Les routes lisent par id uniquement : une clé par auth_id ne serait jamais relue
+    return (ID_PREFIX + str(user.id),)
+
+
+class ProfileCacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.total_lookup_seconds = 0.0
+        self.max_lookup_seconds = 0.0
+        self.loads = 0
+        self.total_load_seconds = 0.0
+
+    def record_lookup(self, hit: bool, duration: float) -> None:
+        PROFILE_CACHE_LOOKUPS.labels("hit" if hit else "miss").inc()
+        PROFILE_CACHE_LOOKUP_DURATION.observe(duration)
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.total_lookup_seconds += duration
+            self.max_lookup_seconds = max(self.max_lookup_seconds, duration)
+
+    def record_load(self, duration: float) -> None:
+        with self._lock:
+            self.loads += 1
+            self.total_load_seconds += duration
+
+    def record_error(self) -> None:
+        PROFILE_CACHE_LOOKUPS.labels("error").inc()
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "avg_lookup_ms": round(self.total_lookup_seconds / (lookups or 1) * 1000, 3),
+                "max_lookup_ms": round(self.max_lookup_seconds * 1000, 3),
+                "avg_db_load_ms": round(self.total_load_seconds / (self.loads or 1) * 1000, 3),
+            }
+
+
+class MemoryProfileBackend:
+    """LRU en mémoire du process : développement, tests, ou un seul worker."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[bytes, float]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    async def set_many(self, keys, raw: bytes, ttl: int) -> None:
+        expires_at = time.time() + ttl
+        for key in keys:
+            self._entries[key] = (raw, expires_at)
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class RedisProfileBackend:
+    """Partagé entre tous les workers : une invalidation est vue par tous."""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        import redis.asyncio as redis
+
+        self.redis = redis.Redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.redis.get(key)
+
+    async def set_many(self, keys, raw: bytes, ttl: int) -> None:
+        pipe = self.redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.set(key, raw, ex=ttl)
+        await pipe.execute()
+
+    async def delete(self, *keys: str) -> None:
+        await self.redis.delete(*keys)
+
+
+class ProfileCache:
+    """
+    Read-through cache of serialized UserResponse payloads plus their
+    precomputed completeness, stored under the user id. The cache is best
+    effort: backend errors count as misses, and writes through the
+    controller invalidate the entry right after the commit.
+    """
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.stats = ProfileCacheStats()
+
+    async def get(self, key: str) -> Optional[CachedProfile]:
+        start = time.perf_counter()
+        with tracer.span("cache.get") as span:
+            try:
+                raw = await self.backend.get(key)
+            except Exception:
+                self.stats.record_error()
+                raw = None
+            if span is not None:
+                span.attributes["cache.hit"] = raw is not None
+        self.stats.record_lookup(raw is not None, time.perf_counter() - start)
+        return CachedProfile.loads(raw) if raw is not None else None
+
+    async def put(self, user, is_complete: bool) -> CachedProfile:
+        entry = CachedProfile(
+            payload=UserResponse.model_validate(user, from_attributes=True).model_dump_json().encode(),
+            is_complete=is_complete,
+        )
+        try:
+            await self.backend.set_many(profile_keys(user), entry.dumps(), self.ttl)
+        except Exception:
+            self.stats.record_error()
+        return entry
+
+    async def invalidate(self, user) -> None:
+        try:
+            await self.backend.delete(*profile_keys(user))
+        except Exception:
+            self.stats.record_error()
+
+    def snapshot(self) -> dict:
+        return {"backend": self.backend.name, "ttl": self.ttl, **self.stats.snapshot()}
+
+
+_profile_cache = None
+
+
+def get_profile_cache() -> ProfileCache:
+    global _profile_cache
+    if _profile_cache is None:
+        if settings.REDIS_URL:
+            backend = RedisProfileBackend(settings.REDIS_URL)
+        else:
+            backend = MemoryProfileBackend(settings.PROFILE_CACHE_MAX_ENTRIES)
+        _profile_cache = ProfileCache(backend, settings.PROFILE_CACHE_TTL)
+    return _profile_cache
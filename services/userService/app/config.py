@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,6 +10,31 @@ class Config:
 
 class DevConfig(Config):
     DATABASE_URL: str = os.getenv("DEV_DATABASE_URL", "sqlite:///./user.db")
+    # Pool de connexions (ignoré pour SQLite en mémoire, qui partage une seule connexion)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 5))  # secondes d'attente avant 503
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # secondes; -1 = jamais
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    SQLITE_WAL: bool = os.getenv("SQLITE_WAL", "true").lower() == "true"
+    # Cache des profils : Redis si REDIS_URL est défini, sinon LRU en mémoire (dev, tests)
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    PROFILE_CACHE_TTL: int = int(os.getenv("PROFILE_CACHE_TTL", 300))  # secondes
+    PROFILE_CACHE_MAX_ENTRIES: int = int(os.getenv("PROFILE_CACHE_MAX_ENTRIES", 10000))  # backend mémoire
+    USERS_BATCH_MAX: int = int(os.getenv("USERS_BATCH_MAX", 1000))  # profils par batch-get / bulk
+    USERS_PAGE_MAX: int = int(os.getenv("USERS_PAGE_MAX", 200))  # taille de page max de GET /users
+    # Création des profils depuis les événements UserRegistered d'AuthService (stream Redis, nécessite REDIS_URL)
+    PROFILE_EVENTS_ENABLED: bool = os.getenv("PROFILE_EVENTS_ENABLED", "true").lower() == "true"
+    PROFILE_EVENTS_STREAM: str = os.getenv("PROFILE_EVENTS_STREAM", "auth:events")
+    PROFILE_EVENTS_GROUP: str = os.getenv("PROFILE_EVENTS_GROUP", "user-service")
+    PROFILE_EVENTS_CONSUMER: str = os.getenv("PROFILE_EVENTS_CONSUMER", socket.gethostname())
+    PROFILE_EVENTS_BATCH_SIZE: int = int(os.getenv("PROFILE_EVENTS_BATCH_SIZE", 100))
+    PROFILE_EVENTS_BLOCK_MS: int = int(os.getenv("PROFILE_EVENTS_BLOCK_MS", 5000))
+    # Tracing: spans exported to "console", "file" (JSON lines in TRACE_FILE_PATH) or nowhere ("none").
+    # Traces started here are kept with probability TRACE_SAMPLE_RATIO; incoming traceparents decide for themselves.
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "none")
+    TRACE_FILE_PATH: str = os.getenv("TRACE_FILE_PATH", "./traces.log")
+    TRACE_SAMPLE_RATIO: float = float(os.getenv("TRACE_SAMPLE_RATIO", 1.0))
     DEFAULT_LANGUAGE: str = os.getenv("DEFAULT_LANGUAGE", "fr")
     DEBUG: bool = os.getenv("DEBUG", "true").lower() == "true"
 
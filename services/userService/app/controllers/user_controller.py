@@ -1,48 +1,174 @@
-from sqlalchemy.orm import Session
-from typing import Optional
+import base64
+import json
+import time
+from datetime import datetime
+
+from sqlalchemy import insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Tuple
 from uuid import UUID
 
+from app.cache import ID_PREFIX, CachedProfile, get_profile_cache
 from app.db.user_models import User
 
 
-def get_user_by_id(db: Session, user_id: UUID) -> Optional[User]:
-    return db.query(User).filter(User.id == user_id).first()
+async def get_user_by_id(db: AsyncSession, user_id: UUID) -> Optional[User]:
+    result = await db.execute(select(User).where(User.id == user_id))
+    return result.scalars().first()
 
 
-def get_user_by_auth_id(db: Session, auth_id: UUID) -> Optional[User]:
-    return db.query(User).filter(User.auth_id == auth_id).first()
+async def get_user_by_auth_id(db: AsyncSession, auth_id: UUID) -> Optional[User]:
+    result = await db.execute(select(User).where(User.auth_id == auth_id))
+    return result.scalars().first()
 
 
-def create_user_profile(db: Session, user_data: dict) -> User:
-    if get_user_by_auth_id(db, user_data["auth_id"]):
+async def create_user_profile(db: AsyncSession, user_data: dict) -> User:
+    # Un seul INSERT ... RETURNING : les contraintes uniques (auth_id, email) détectent les doublons
+    stmt = insert(User).values(**user_data).returning(User)
+    try:
+        user = (await db.execute(stmt)).scalar_one()
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
         raise ValueError("User profile already exists")
+    except Exception:
+        await db.rollback()
+        raise
+    await get_profile_cache().invalidate(user)
+    return user
+
+
+async def get_users_by_ids(db: AsyncSession, ids: List[UUID], by_auth_id: bool = False) -> Tuple[List[User], List[UUID]]:
+    """One IN query; users come back in request order, unknown ids in ``missing``."""
+    column = User.auth_id if by_auth_id else User.id
+    result = await db.execute(select(User).where(column.in_(set(ids))))
+    found = {getattr(user, column.key): user for user in result.scalars()}
+    users = [found[i] for i in ids if i in found]
+    missing = [i for i in ids if i not in found]
+    return users, missing
+
 
-    user = User(**user_data)
+def _insert_ignoring_duplicates(dialect_name: str):
+    # ON CONFLICT DO NOTHING : un import rejoué ne crée pas de doublons et n'échoue pas
+    if dialect_name == "postgresql":
+        return postgresql.insert(User).on_conflict_do_nothing()
+    if dialect_name == "sqlite":
+        return sqlite.insert(User).on_conflict_do_nothing()
+    return insert(User)
+
+
+async def bulk_create_user_profiles(db: AsyncSession, rows: List[dict]) -> Tuple[int, List[UUID]]:
+    """
+    Insert many profiles with a single executemany (batched multi-row
+    INSERT ... RETURNING). Rows whose auth_id or email already exists are
+    skipped; returns the number created and the skipped auth_ids.
+    """
+    unique_rows, duplicates, seen = [], [], set()
+    for row in rows:
+        if row["auth_id"] in seen:
+            duplicates.append(row["auth_id"])
+            continue
+        seen.add(row["auth_id"])
+        unique_rows.append(row)
+
+    stmt = _insert_ignoring_duplicates(db.bind.dialect.name).returning(User.auth_id)
     try:
-        db.add(user)
-        db.commit()
-        db.refresh(user)
-        return user
+        result = await db.execute(stmt, unique_rows)
+        created = set(result.scalars())
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise
 
+    skipped = [row["auth_id"] for row in unique_rows if row["auth_id"] not in created] + duplicates
+    return len(created), skipped
 
-def update_user_profile(db: Session, user_id: UUID, updates: dict) -> Optional[User]:
-    user = get_user_by_id(db, user_id)
-    if not user:
-        return None
 
-    for key, value in updates.items():
-        setattr(user, key, value)
+# Champs exposés par GET /users (UserResponse + created_at)
+LISTABLE_FIELDS = (
+    "id", "auth_id", "email", "first_name", "last_name", "country", "city", "language", "is_active", "created_at",
+)
+
+
+def encode_cursor(created_at: datetime, user_id: UUID) -> str:
+    raw = json.dumps([created_at.isoformat(), str(user_id)]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
 
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
     try:
-        db.commit()
-        db.refresh(user)
-        return user
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, user_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(user_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+async def list_users(
+    db: AsyncSession,
+    filters: Dict[str, Any],
+    fields: List[str],
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Keyset pagination, newest first, on (created_at, id): each page is an
+    index range scan starting after the cursor, whatever its depth.
+    Only the requested columns are selected.
+    """
+    columns = list(dict.fromkeys([*fields, "created_at", "id"]))
+    stmt = select(*(getattr(User, name) for name in columns))
+    for name, value in filters.items():
+        if value is not None:
+            stmt = stmt.where(getattr(User, name) == value)
+    if cursor:
+        created_at, user_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(User.created_at, User.id) < tuple_(created_at, user_id))
+    stmt = stmt.order_by(User.created_at.desc(), User.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(stmt)).mappings().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return [{name: row[name] for name in fields} for row in rows], next_cursor
+
+
+async def update_user_profile(db: AsyncSession, user_id: UUID, updates: dict) -> Optional[User]:
+    if not updates:
+        return await get_user_by_id(db, user_id)
+
+    # Un seul UPDATE ... RETURNING ; aucune ligne retournée = utilisateur inconnu
+    stmt = update(User).where(User.id == user_id).values(**updates).returning(User)
+    try:
+        user = (await db.execute(stmt)).scalars().first()
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise
+    if user is not None:
+        await get_profile_cache().invalidate(user)
+    return user
+
+
+async def _read_through(key: str, load) -> Optional[CachedProfile]:
+    cache = get_profile_cache()
+    entry = await cache.get(key)
+    if entry is not None:
+        return entry
+
+    start = time.perf_counter()
+    user = await load()
+    cache.stats.record_load(time.perf_counter() - start)
+    if user is None:
+        return None
+    return await cache.put(user, is_profile_complete(user))
+
+
+async def get_cached_profile(db: AsyncSession, user_id: UUID) -> Optional[CachedProfile]:
+    return await _read_through(ID_PREFIX + str(user_id), lambda: get_user_by_id(db, user_id))
 
 
 def is_profile_complete(user) -> bool:
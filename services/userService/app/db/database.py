@@ -1,19 +1,64 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
 from app.config import dev_config
+from app.db.pool import PoolStats, enable_sqlite_wal, engine_options, instrument, is_sqlite
+from app.metrics import register_snapshot
+from app.tracing import trace_queries
+
+# Les URLs synchrones de la config sont converties vers leur driver async
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
 
-SQLALCHEMY_DATABASE_URL = dev_config.DATABASE_URL
+def async_database_url(url: str) -> str:
+    scheme, sep, rest = url.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
 
-connect_args = {"check_same_thread": False} if SQLALCHEMY_DATABASE_URL.startswith("sqlite") else {}
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args=connect_args)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SQLALCHEMY_DATABASE_URL = async_database_url(dev_config.DATABASE_URL)
+
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+pool_stats = PoolStats()
+instrument(engine, pool_stats)
+trace_queries(engine)
+register_snapshot("db_pool", lambda: pool_stats.snapshot(engine.pool), ("in_use", "pool_size", "idle", "overflow"))
+if is_sqlite(SQLALCHEMY_DATABASE_URL) and dev_config.SQLITE_WAL:
+    enable_sqlite_wal(engine)
+
+# expire_on_commit=False: les objets retournés restent lisibles sans rechargement (sync) implicite
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
+
+async def init_models():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
 # Dependency pour FastAPI
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
+        # Connexion prise dès le début : l'attente sur le pool est mesurée et un
+        # pool saturé lève PoolTimeout avant l'exécution de la route
+        start = time.perf_counter()
+        try:
+            await db.connection()
+        except PoolTimeout:
+            pool_stats.record_timeout()
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+        yield db
+
+
+# Pour les routes servies depuis le cache de profils : la connexion n'est prise
+# qu'au premier accès à la base, donc jamais sur un hit
+async def get_lazy_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
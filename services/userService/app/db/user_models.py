@@ -1,9 +1,15 @@
-from sqlalchemy import Column, String, Boolean, DateTime
+from sqlalchemy import Column, String, Boolean, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 import uuid
+from datetime import datetime, timezone
 from app.db.database import Base
 
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -18,5 +24,17 @@ class User(Base):
     language = Column(String, default="fr")
     is_active = Column(Boolean, default=True)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Défaut Python en plus du défaut serveur : précision à la microseconde, même
+    # format en SQLite qu'à la lecture, pour une pagination par curseur stable
+    created_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Pagination par curseur sur (created_at, id), seule ou après un filtre d'égalité
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_country_city_created_at_id", "country", "city", "created_at", "id"),
+        # Filtre sur la ville seule : l'index (country, city, ...) ne sert pas sans le pays
+        Index("ix_users_city_created_at_id", "city", "created_at", "id"),
+        Index("ix_users_language_created_at_id", "language", "created_at", "id"),
+        Index("ix_users_is_active_created_at_id", "is_active", "created_at", "id"),
+    )
@@ -0,0 +1,136 @@
+import asyncio
+import json
+from typing import List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from app.config import dev_config as settings
+from app.controllers.user_controller import bulk_create_user_profiles
+from app.db.database import SessionLocal
+from app.schema import UserCreate
+
+USER_REGISTERED = "UserRegistered"
+
+
+def profiles_from_messages(messages: List[Tuple[bytes, dict]]) -> List[dict]:
+    """
+    Profile rows for the UserRegistered events of a batch; other, malformed
+    or trimmed events are ignored (they are still acknowledged by handle).
+    """
+    rows = []
+    for message_id, fields in messages:
+        # A pending entry trimmed from the stream by MAXLEN comes back with no fields
+        if not fields:
+            print(f"Skipping event {message_id!r} trimmed from the stream")
+            continue
+        if fields.get(b"type") != USER_REGISTERED.encode():
+            continue
+        try:
+            payload = json.loads(fields[b"payload"])
+            rows.append(UserCreate(auth_id=payload["auth_id"], email=payload["email"]).dict())
+        except (KeyError, TypeError, ValueError, ValidationError) as e:
+            print(f"Skipping malformed {USER_REGISTERED} event {message_id!r}: {e}")
+    return rows
+
+
+class ProfileEventConsumer:
+    """
+    Creates profiles from the UserRegistered events that authService
+    relays to a Redis stream, so registration does not wait for
+    userService. Reads in batches through a consumer group and inserts
+    each batch with bulk_create_user_profiles (ON CONFLICT DO NOTHING),
+    which makes redelivered events harmless. Messages are acknowledged
+    only after the insert commits; on a failure they stay pending and are
+    read again from the group's pending list.
+    """
+
+    def __init__(self, redis_client, session_factory, stream: str, group: str, consumer: str,
+                 batch_size: int, block_ms: int):
+        self.redis = redis_client
+        self.session_factory = session_factory
+        self.stream = stream
+        self.group = group
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self._task: Optional[asyncio.Task] = None
+
+    async def ensure_group(self) -> None:
+        from redis.exceptions import ResponseError
+
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def handle(self, messages: List[Tuple[bytes, dict]]) -> int:
+        rows = profiles_from_messages(messages)
+        created = 0
+        if rows:
+            async with self.session_factory() as db:
+                created, _ = await bulk_create_user_profiles(db, rows)
+        await self.redis.xack(self.stream, self.group, *[message_id for message_id, _ in messages])
+        return created
+
+    async def poll(self, pending: bool = False) -> int:
+        # "0" re-reads this consumer's unacknowledged messages, ">" only new ones
+        response = await self.redis.xreadgroup(
+            self.group, self.consumer, {self.stream: "0" if pending else ">"},
+            count=self.batch_size, block=None if pending else self.block_ms,
+        )
+        messages = [message for _, batch in response or [] for message in batch]
+        if messages:
+            await self.handle(messages)
+        return len(messages)
+
+    async def _run(self) -> None:
+        backoff = 0.5
+        pending = True
+        while True:
+            try:
+                await self.ensure_group()
+                while True:
+                    read = await self.poll(pending=pending)
+                    # Drain the pending list first (after a restart or a failed batch), then follow the stream
+                    pending = pending and read > 0
+                    backoff = 0.5
+            except Exception as e:
+                print(f"Profile event consumer error, retrying in {backoff:.1f}s: {e}")
+                pending = True
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+_consumer = None
+
+
+def get_profile_event_consumer() -> Optional[ProfileEventConsumer]:
+    """Only runs when REDIS_URL is set and the consumer is enabled."""
+    global _consumer
+    if _consumer is None and settings.REDIS_URL and settings.PROFILE_EVENTS_ENABLED:
+        import redis.asyncio as redis
+
+        _consumer = ProfileEventConsumer(
+            redis.Redis.from_url(settings.REDIS_URL),
+            SessionLocal,
+            stream=settings.PROFILE_EVENTS_STREAM,
+            group=settings.PROFILE_EVENTS_GROUP,
+            consumer=settings.PROFILE_EVENTS_CONSUMER,
+            batch_size=settings.PROFILE_EVENTS_BATCH_SIZE,
+            block_ms=settings.PROFILE_EVENTS_BLOCK_MS,
+        )
+    return _consumer
@@ -1,7 +1,13 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import TimeoutError as PoolTimeout
 from app.routes.user_routes import router
+from app.cache import get_profile_cache
 from app.config import dev_config
-from app.db.database import Base, engine
+from app.events import get_profile_event_consumer
+from app.metrics import MetricsMiddleware, metrics_response
+from app.tracing import TracingMiddleware, tracer
+from app.db.database import engine, init_models, pool_stats
 
 def create_app() -> FastAPI:
     user_app = FastAPI(
@@ -10,13 +16,55 @@ def create_app() -> FastAPI:
         description="User profile microservice for ObjectifBildung"
     )
 
-    Base.metadata.create_all(bind=engine)
+    user_app.add_middleware(TracingMiddleware)
+    user_app.add_middleware(MetricsMiddleware)
     user_app.include_router(router)
 
+    @user_app.on_event("startup")
+    async def create_tables():
+        await init_models()
+
+    @user_app.on_event("startup")
+    async def start_event_consumer():
+        consumer = get_profile_event_consumer()
+        if consumer is not None:
+            consumer.start()
+
+    @user_app.on_event("shutdown")
+    async def stop_event_consumer():
+        consumer = get_profile_event_consumer()
+        if consumer is not None:
+            await consumer.stop()
+
+    @user_app.on_event("shutdown")
+    def flush_spans():
+        tracer.flush()
+
+    @user_app.exception_handler(PoolTimeout)
+    async def pool_exhausted(request: Request, exc: PoolTimeout):
+        # Toutes les connexions sont occupées : 503 + Retry-After plutôt qu'une 500
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": "Database busy, please retry"},
+            headers={"Retry-After": "1"},
+        )
+
     @user_app.get("/health")
     def health():
         return {"status": "ok"}
 
+    @user_app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return metrics_response()
+
+    @user_app.get("/health/db")
+    def db_health():
+        return pool_stats.snapshot(engine.pool)
+
+    @user_app.get("/health/cache")
+    def cache_health():
+        return get_profile_cache().snapshot()
+
     return user_app
 
 app = create_app()
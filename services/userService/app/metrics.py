@@ -0,0 +1,90 @@
+# app/metrics.py
+# HTTP and DB pool instrumentation shared by authService and userService.
+# Each service is built from its own directory, so both ship a copy of this
+# module: keep the two files identical and put service metrics next to the
+# code that records them.
+import time
+from typing import Callable, Iterable
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from starlette.responses import Response
+
+# Label values come from fixed sets only (route templates, never raw paths;
+# known methods; status codes), so the number of series stays bounded.
+KNOWN_METHODS = frozenset({"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"})
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0)
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests handled", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_POOL_WAIT = Histogram(
+    "db_pool_wait_seconds", "Time spent waiting for a database connection", buckets=WAIT_BUCKETS
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total", "Connection checkouts that timed out on an exhausted pool"
+)
+
+
+class SnapshotCollector:
+    """Publishes selected values of a component's snapshot() as gauges, read at scrape time only."""
+
+    def __init__(self, prefix: str, snapshot: Callable[[], dict], keys: Iterable[str]):
+        self.prefix = prefix
+        self.snapshot = snapshot
+        self.keys = tuple(keys)
+
+    def collect(self):
+        data = self.snapshot()
+        for key in self.keys:
+            if key in data:
+                yield GaugeMetricFamily(f"{self.prefix}_{key}", f"{self.prefix} {key.replace('_', ' ')}", value=data[key])
+
+
+def register_snapshot(prefix: str, snapshot: Callable[[], dict], keys: Iterable[str]) -> None:
+    REGISTRY.register(SnapshotCollector(prefix, snapshot, keys))
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware counting requests and timing them per route
+    template. The template is read from the scope once routing is done,
+    so /users/42 and /users/43 share one series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+            HTTP_REQUESTS.labels(method, template, str(status_code)).inc()
+            HTTP_REQUEST_DURATION.labels(method, template).observe(time.perf_counter() - start)
+
+
+def metrics_response() -> Response:
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
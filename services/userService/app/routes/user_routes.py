@@ -1,16 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 from uuid import UUID
 
-from app.db.database import get_db
+from app.config import dev_config
+from app.db.database import get_db, get_lazy_db
 from app.controllers.user_controller import (
-    get_user_by_id,
-    get_user_by_auth_id,
+    LISTABLE_FIELDS,
+    get_cached_profile,
+    get_users_by_ids,
+    list_users,
     create_user_profile,
-    update_user_profile, is_profile_complete
+    bulk_create_user_profiles,
+    update_user_profile,
 
 )
-from app.schema import UserResponse, UserCreate, UserUpdate, ProfileStatus
+from app.schema import (
+    UserResponse, UserCreate, UserUpdate, ProfileStatus,
+    BatchGetRequest, BatchGetResponse, BulkCreateRequest, BulkCreateResponse, UserPage,
+)
 
 router = APIRouter(prefix="/users", tags=["User Profile"])
 
@@ -19,50 +27,117 @@ router = APIRouter(prefix="/users", tags=["User Profile"])
 # Create a new user profile
 # ==============================================================
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(request: UserCreate, db: Session = Depends(get_db)):
+async def create_user(request: UserCreate, db: AsyncSession = Depends(get_db)):
     """
     Create a new user profile linked to an auth_id.
     Called after a successful registration in AuthService.
     """
-    existing = get_user_by_auth_id(db, request.auth_id)
-    if existing:
+    try:
+        user = await create_user_profile(db, request.dict())
+    except ValueError:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User profile already exists."
         )
-
-    user = create_user_profile(db, request.dict())
     return user
 
 
+# ==============================================================
+# List users (cursor pagination, filters, projection)
+# ==============================================================
+@router.get("/", response_model=UserPage)
+async def list_user_profiles(
+    country: Optional[str] = None,
+    city: Optional[str] = None,
+    language: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return"),
+    limit: int = Query(50, ge=1, le=dev_config.USERS_PAGE_MAX),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List user profiles, newest first, for admin dashboards.
+    Pass the returned `next_cursor` to get the following page.
+    """
+    selected = [f.strip() for f in fields.split(",") if f.strip()] if fields else list(LISTABLE_FIELDS)
+    unknown = [f for f in selected if f not in LISTABLE_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+
+    filters = {"country": country, "city": city, "language": language, "is_active": is_active}
+    try:
+        items, next_cursor = await list_users(db, filters, selected, limit, cursor)
+    except ValueError as ve:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(ve)
+        )
+    return UserPage(items=items, next_cursor=next_cursor)
+
+
+# ==============================================================
+# Batch lookup by ids or auth_ids
+# ==============================================================
+@router.post("/batch-get", response_model=BatchGetResponse)
+async def batch_get_users(request: BatchGetRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Fetch many profiles in one query instead of one GET per user.
+    Profiles are returned in the order of the requested ids; unknown ids are listed in `missing`.
+    """
+    by_auth_id = bool(request.auth_ids)
+    users, missing = await get_users_by_ids(db, request.auth_ids or request.ids, by_auth_id=by_auth_id)
+    return BatchGetResponse(
+        users=[UserResponse.model_validate(user, from_attributes=True) for user in users],
+        missing=missing,
+    )
+
+
+# ==============================================================
+# Bulk create (migration imports, event backfills)
+# ==============================================================
+@router.post("/bulk", response_model=BulkCreateResponse, status_code=status.HTTP_201_CREATED)
+async def bulk_create_users(request: BulkCreateRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Create many profiles in one batched insert.
+    Profiles whose auth_id or email already exists are skipped, so an import can be replayed safely.
+    """
+    created, skipped = await bulk_create_user_profiles(db, [user.dict() for user in request.users])
+    return BulkCreateResponse(created=created, skipped=skipped)
+
+
 # ==============================================================
 # Get a user by UUID
 # ==============================================================
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user(user_id: UUID, db: Session = Depends(get_db)):
+async def get_user(user_id: UUID, db: AsyncSession = Depends(get_lazy_db)):
     """
     Retrieve a user profile by ID.
     This endpoint will be protected by the Gateway JWT middleware.
+    Served from the profile cache; the payload is already serialized.
     """
-    user = get_user_by_id(db, user_id)
-    if not user:
+    profile = await get_cached_profile(db, user_id)
+    if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found."
         )
-    return user
+    return Response(content=profile.payload, media_type="application/json")
 
 
 # ==============================================================
 # Update user profile
 # ==============================================================
 @router.patch("/{user_id}", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def update_user(user_id: UUID, request: UserUpdate, db: Session = Depends(get_db)):
+async def update_user(user_id: UUID, request: UserUpdate, db: AsyncSession = Depends(get_db)):
     """
     Update a user's profile information.
     The Gateway will verify token and user permissions before calling this.
     """
-    updated_user = update_user_profile(db, user_id, request.dict(exclude_unset=True))
+    updated_user = await update_user_profile(db, user_id, request.dict(exclude_unset=True))
     if not updated_user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -75,16 +150,17 @@ def update_user(user_id: UUID, request: UserUpdate, db: Session = Depends(get_db
 # Check profile completeness
 # ==============================================================
 @router.get("/{user_id}/status", response_model=ProfileStatus)
-def check_profile_status(user_id: UUID, db: Session = Depends(get_db)):
+async def check_profile_status(user_id: UUID, db: AsyncSession = Depends(get_lazy_db)):
     """
     Check if a user profile is complete.
     This can be used to guide onboarding steps in the frontend.
+    Completeness is precomputed in the profile cache.
     """
-    user = get_user_by_id(db, user_id)
-    if not user:
+    profile = await get_cached_profile(db, user_id)
+    if not profile:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found."
         )
 
-    return ProfileStatus(is_complete=is_profile_complete(user))
+    return ProfileStatus(is_complete=profile.is_complete)
@@ -1,8 +1,10 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import Any, Dict, List, Optional
 from uuid import UUID
 
-# Création de profil (appelé par AuthService ou Kafka)
+from app.config import dev_config
+
+# Création de profil (POST /users ou événement UserRegistered d'AuthService, voir app.events)
 class UserCreate(BaseModel):
     auth_id: UUID  # UUID généré par AuthService
     email: EmailStr
@@ -31,3 +33,31 @@ class UserResponse(UserCreate):
 # Vérification de complétion
 class ProfileStatus(BaseModel):
     is_complete: bool
+
+# Lecture groupée : ids OU auth_ids, l'ordre de la requête est conservé
+class BatchGetRequest(BaseModel):
+    ids: List[UUID] = Field(default_factory=list, max_length=dev_config.USERS_BATCH_MAX)
+    auth_ids: List[UUID] = Field(default_factory=list, max_length=dev_config.USERS_BATCH_MAX)
+
+    @model_validator(mode="after")
+    def one_kind_of_id(self):
+        if bool(self.ids) == bool(self.auth_ids):
+            raise ValueError("Provide either ids or auth_ids")
+        return self
+
+class BatchGetResponse(BaseModel):
+    users: List[UserResponse]
+    missing: List[UUID]
+
+# Création en masse (imports, rattrapage d'événements)
+class BulkCreateRequest(BaseModel):
+    users: List[UserCreate] = Field(min_length=1, max_length=dev_config.USERS_BATCH_MAX)
+
+class BulkCreateResponse(BaseModel):
+    created: int
+    skipped: List[UUID]  # auth_ids déjà existants (ou doublons dans la requête)
+
+# Liste paginée par curseur ; les items ne contiennent que les champs demandés
+class UserPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,96 @@
+# app/tracing.py
+# Request and SQL tracing of a service, on top of the shared app/spans.py.
+# authService and userService ship identical copies of this module.
+import uuid
+from typing import List
+
+from sqlalchemy import event
+
+from app.config import dev_config as settings
+from app.spans import ConsoleExporter, FileExporter, Span, Tracer, valid_request_id
+
+MAX_STATEMENT_LENGTH = 500
+
+
+def get_span_exporter():
+    """Exporter named by TRACE_EXPORTER; anything with an ``export(span)`` method can be plugged in."""
+    if settings.TRACE_EXPORTER == "file":
+        return FileExporter(settings.PROJECT_NAME, settings.TRACE_FILE_PATH)
+    if settings.TRACE_EXPORTER == "console":
+        return ConsoleExporter(settings.PROJECT_NAME)
+    return None
+
+
+tracer = Tracer(get_span_exporter(), settings.TRACE_SAMPLE_RATIO)
+
+
+# ==============================================================
+# Instrumentation
+# ==============================================================
+class TracingMiddleware:
+    """
+    Pure ASGI middleware opening the request's root span. It continues the
+    trace of an incoming traceparent, keeps the caller's X-Request-ID (a
+    new one is generated otherwise) and returns it on the response.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key: value for key, value in scope["headers"] if key in (b"traceparent", b"x-request-id")}
+        request_id = valid_request_id(headers.get(b"x-request-id", b"").decode("latin-1")) or uuid.uuid4().hex
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1")
+        span = tracer.start_trace(scope["method"], traceparent, request_id, **{"http.method": scope["method"]})
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+                if span is not None:
+                    span.attributes["http.status_code"] = message["status"]
+            await send(message)
+
+        with tracer.activate(span):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if span is not None:
+                    route = getattr(scope.get("route"), "path", None) or "unmatched"
+                    span.name = f"{scope['method']} {route}"
+                    span.attributes["http.route"] = route
+
+
+def _statement_attributes(statement: str) -> dict:
+    return {
+        "db.operation": statement.lstrip().split(" ", 1)[0].upper(),
+        "db.statement": statement[:MAX_STATEMENT_LENGTH],
+    }
+
+
+def trace_queries(engine) -> None:
+    """One span per SQL statement run for a traced request (bound parameters are not recorded)."""
+    target = engine.sync_engine
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.start_span("db.query", **_statement_attributes(statement))
+        if span is not None:
+            spans: List[Span] = conn.info.setdefault("trace_spans", [])
+            spans.append(span)
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        spans = conn.info.get("trace_spans")
+        if spans:
+            tracer.end_span(spans.pop())
+
+    def handle_error(context):
+        spans = context.connection.info.get("trace_spans") if context.connection is not None else None
+        if spans:
+            tracer.end_span(spans.pop(), context.original_exception)
+
+    event.listen(target, "before_cursor_execute", before_cursor_execute)
+    event.listen(target, "after_cursor_execute", after_cursor_execute)
+    event.listen(target, "handle_error", handle_error)
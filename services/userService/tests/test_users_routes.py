@@ -1,17 +1,26 @@
+import asyncio
+import json
 import os
 import sys
 import pytest
 from uuid import uuid4
+from unittest.mock import patch
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from dotenv import load_dotenv
 
 # Allow import from app directory
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from app.db.database import Base, get_db
+from app.db.database import Base, get_db, get_lazy_db
+from app.cache import get_profile_cache
+from app.events import ProfileEventConsumer
 from app.main import create_app
+from app.tracing import FileExporter, trace_queries, tracer
 
 load_dotenv(".env.test")
 
@@ -22,18 +31,21 @@ TEST_DB_FILE = "./test_user.db"
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB_FILE}"
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# The app uses an async session; TestClient starts a new event loop per request,
+# so connections must not be pooled across requests
+async_engine = create_async_engine(f"sqlite+aiosqlite:///{TEST_DB_FILE}", poolclass=NullPool)
+trace_queries(async_engine)
+AsyncTestingSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+async def override_get_db():
+    async with AsyncTestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 app = create_app()
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_lazy_db] = override_get_db
 client = TestClient(app)
 
 
@@ -123,6 +135,26 @@ def test_update_user_success():
     assert data["email"] == "john@example.com"
 
 
+def test_create_and_update_are_single_statements():
+    """✅ Create and update each cost one INSERT/UPDATE ... RETURNING"""
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        payload = {"auth_id": str(uuid4()), "email": "single@example.com", "first_name": "Single"}
+        user_id = client.post("/users/", json=payload).json()["id"]
+        response = client.patch(f"/users/{user_id}", json={"city": "Lyon"})
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert response.json()["city"] == "Lyon"
+    assert len(statements) == 2
+    assert statements[0].startswith("INSERT INTO users") and "RETURNING" in statements[0]
+    assert statements[1].startswith("UPDATE users") and "RETURNING" in statements[1]
+
+
 def test_update_user_not_found():
     """❌ Try updating a non-existent user"""
     fake_id = str(uuid4())
@@ -158,3 +190,203 @@ def test_check_profile_status_incomplete():
     response = client.get(f"/users/{user_id}/status")
     assert response.status_code == 200
     assert response.json()["is_complete"] is False
+
+
+def test_pool_exhaustion_returns_503():
+    """✅ An exhausted DB pool answers 503 + Retry-After instead of a 500"""
+    async def exhausted_db():
+        raise PoolTimeout("QueuePool limit reached")
+        yield
+
+    busy_app = create_app()
+    busy_app.dependency_overrides[get_db] = exhausted_db
+    response = TestClient(busy_app).patch(f"/users/{uuid4()}", json={"city": "Paris"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_profile_cache_hit_and_invalidation():
+    """✅ Reads are served from the profile cache and a PATCH invalidates it"""
+    payload = {"auth_id": str(uuid4()), "email": "cache@example.com", "first_name": "Cache"}
+    user_id = client.post("/users/", json=payload).json()["id"]
+    stats = get_profile_cache().stats
+
+    client.get(f"/users/{user_id}")
+    hits = stats.hits
+    assert client.get(f"/users/{user_id}/status").json()["is_complete"] is False
+    assert stats.hits == hits + 1
+
+    client.patch(f"/users/{user_id}", json={"last_name": "Hit"})
+    misses = stats.misses
+    response = client.get(f"/users/{user_id}")
+    assert stats.misses == misses + 1
+    assert response.json()["last_name"] == "Hit"
+    assert client.get(f"/users/{user_id}/status").json()["is_complete"] is True
+    assert client.get("/health/cache").json()["backend"] == "memory"
+
+
+def test_profile_read_is_traced_under_the_gateway_span(tmp_path):
+    """✅ The gateway's traceparent becomes the parent of the handler, cache and SQL spans"""
+    payload = {"auth_id": str(uuid4()), "email": "traced@example.com", "first_name": "Traced"}
+    user_id = client.post("/users/", json=payload).json()["id"]
+    trace_id, parent_id = "0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331"
+    spans_file = tmp_path / "spans.log"
+
+    with patch.object(tracer, "exporter", FileExporter("users", str(spans_file))):
+        response = client.get(f"/users/{user_id}", headers={"traceparent": f"00-{trace_id}-{parent_id}-01"})
+        tracer.flush()
+    assert response.status_code == 200
+    request_id = response.headers["x-request-id"]
+
+    spans = [json.loads(line) for line in spans_file.read_text().splitlines()]
+    root = next(span for span in spans if span["name"] == "GET /users/{user_id}")
+    assert root["parent_id"] == parent_id
+    assert {span["trace_id"] for span in spans} == {trace_id}
+    assert {span["request_id"] for span in spans} == {request_id}
+    children = [span for span in spans if span is not root]
+    assert {span["name"] for span in children} >= {"cache.get", "db.query"}
+    assert all(span["parent_id"] == root["span_id"] for span in children)
+
+def test_metrics_are_labelled_by_route_template():
+    """✅ /metrics counts requests per route template, never per raw path"""
+    payload = {"auth_id": str(uuid4()), "email": "metrics@example.com", "first_name": "Metrics"}
+    user_id = client.post("/users/", json=payload).json()["id"]
+    client.get(f"/users/{user_id}")
+    client.get(f"/users/{user_id}")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/users/{user_id}",status="200"}' in body
+    assert f"/users/{user_id}" not in body
+    assert 'profile_cache_lookups_total{result="hit"}' in body
+
+@pytest.mark.parametrize("module", ["metrics.py", "spans.py", "tracing.py"])
+def test_shared_module_is_the_same_as_authservice(module):
+    """✅ Shared instrumentation: both services ship the same copy"""
+    services = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    with open(os.path.join(services, "userService", "app", module), encoding="utf-8") as ours, \
+            open(os.path.join(services, "authService", "app", module), encoding="utf-8") as theirs:
+        assert ours.read() == theirs.read()
+
+
+def test_bulk_create_and_batch_get():
+    """✅ Bulk create skips existing auth_ids; batch-get keeps order and reports missing ids"""
+    existing = {"auth_id": str(uuid4()), "email": "bulk0@example.com", "first_name": "Zero"}
+    client.post("/users/", json=existing)
+    new = [{"auth_id": str(uuid4()), "email": f"bulk{i}@example.com", "first_name": f"B{i}"} for i in range(1, 4)]
+
+    response = client.post("/users/bulk", json={"users": [existing] + new + [new[0]]})
+    assert response.status_code == 201
+    assert response.json() == {"created": 3, "skipped": [existing["auth_id"], new[0]["auth_id"]]}
+
+    unknown = str(uuid4())
+    auth_ids = [new[2]["auth_id"], unknown, new[0]["auth_id"], existing["auth_id"]]
+    response = client.post("/users/batch-get", json={"auth_ids": auth_ids})
+    assert response.status_code == 200
+    data = response.json()
+    assert [u["auth_id"] for u in data["users"]] == [new[2]["auth_id"], new[0]["auth_id"], existing["auth_id"]]
+    assert data["missing"] == [unknown]
+
+    ids = [u["id"] for u in data["users"]]
+    response = client.post("/users/batch-get", json={"ids": ids[::-1]})
+    assert [u["id"] for u in response.json()["users"]] == ids[::-1]
+
+
+def test_batch_get_requires_one_kind_of_id():
+    """❌ batch-get accepts ids or auth_ids, not both or neither"""
+    assert client.post("/users/batch-get", json={}).status_code == 422
+    both = {"ids": [str(uuid4())], "auth_ids": [str(uuid4())]}
+    assert client.post("/users/batch-get", json=both).status_code == 422
+
+
+def test_list_users_cursor_pagination():
+    """✅ GET /users pages through a filtered listing without gaps or repeats"""
+    created = []
+    for i in range(7):
+        payload = {"auth_id": str(uuid4()), "email": f"page{i}@example.com", "country": "SN", "city": "Dakar"}
+        created.append(client.post("/users/", json=payload).json()["id"])
+
+    seen, cursor = [], None
+    while True:
+        params = {"country": "SN", "city": "Dakar", "limit": 3, "fields": "id,email"}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/users/", params=params)
+        assert response.status_code == 200
+        page = response.json()
+        assert all(set(item) == {"id", "email"} for item in page["items"])
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == created[::-1]
+
+
+def test_list_users_by_city_uses_an_index():
+    """✅ A city-only filter is an index range scan, not a full scan plus sort"""
+    with engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT id FROM users WHERE city = 'Lyon' ORDER BY created_at DESC, id DESC LIMIT 21"
+        ).all()
+    details = " ".join(row[-1] for row in plan)
+    assert "ix_users_city_created_at_id" in details
+    assert "TEMP B-TREE" not in details
+
+
+def test_list_users_rejects_bad_input():
+    """❌ Unknown projection fields and malformed cursors are 400s"""
+    assert client.get("/users/", params={"fields": "hashed_password"}).status_code == 400
+    assert client.get("/users/", params={"cursor": "not-a-cursor"}).status_code == 400
+
+
+def test_user_registered_events_create_profiles_idempotently():
+    """✅ Redelivered or malformed events never create duplicates or block the batch"""
+    class AckRecorder:
+        def __init__(self):
+            self.acked = []
+
+        async def xack(self, stream, group, *ids):
+            self.acked.extend(ids)
+
+    auth_id = str(uuid4())
+    event = {b"type": b"UserRegistered", b"payload": json.dumps({"auth_id": auth_id, "email": "event@example.com"}).encode()}
+    messages = [
+        (b"1-0", event),
+        (b"2-0", event),  # redelivery
+        (b"3-0", {b"type": b"UserRegistered", b"payload": b"{not json"}),
+        (b"4-0", {b"type": b"PasswordChanged", b"payload": b"{}"}),
+    ]
+    recorder = AckRecorder()
+    consumer = ProfileEventConsumer(recorder, AsyncTestingSessionLocal, "auth:events", "user-service", "test", 100, 0)
+
+    assert asyncio.run(consumer.handle(messages)) == 1
+    assert asyncio.run(consumer.handle(messages[:1])) == 0
+    assert recorder.acked == [b"1-0", b"2-0", b"3-0", b"4-0", b"1-0"]
+    response = client.post("/users/batch-get", json={"auth_ids": [auth_id]})
+    assert response.json()["users"][0]["email"] == "event@example.com"
+
+
+def test_trimmed_and_malformed_events_are_acknowledged_and_skipped():
+    """✅ Entries trimmed by MAXLEN (fields None) and undecodable payloads are skipped and acknowledged"""
+    class AckRecorder:
+        def __init__(self):
+            self.acked = []
+
+        async def xack(self, stream, group, *ids):
+            self.acked.extend(ids)
+
+    auth_id = str(uuid4())
+    messages = [
+        (b"1-0", None),  # trimmed from the stream before being acknowledged
+        (b"2-0", {b"type": b"UserRegistered", b"payload": b"[1, 2]"}),
+        (b"3-0", {b"type": b"UserRegistered", b"payload": b"\xff\xfe"}),
+        (b"4-0", {b"type": b"UserRegistered",
+                  b"payload": json.dumps({"auth_id": auth_id, "email": "trimmed@example.com"}).encode()}),
+    ]
+    recorder = AckRecorder()
+    consumer = ProfileEventConsumer(recorder, AsyncTestingSessionLocal, "auth:events", "user-service", "test", 100, 0)
+
+    assert asyncio.run(consumer.handle(messages)) == 1
+    assert recorder.acked == [b"1-0", b"2-0", b"3-0", b"4-0"]